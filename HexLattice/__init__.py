@@ -1,3 +1,18 @@
 from .coordinates import AxialCoordinate, RingCoordinate, DoubleWidthCoordinate, CartesianCoordinate, CubeCoordinate, Coordinate, ValidCoordinateType, ValidDirections
-from .plot_config import PlotConfig
-from .hex_lattice import HexCell, HexLattice
\ No newline at end of file
+from .plot_config import PlotConfig, register_text_color_func
+from .hex_lattice import HexCell, HexLattice
+from .profiling import RenderTimer, StageRecord
+from .transforms import LatticeTransform
+from .resampling import ResampleOperator, build_resampler
+from .render_cache import RenderCache, CacheStats
+from .render_server import RenderServer, RenderClient
+from .hex_z import HexZLattice
+from .categorical import CategoricalField
+from .ensemble import EnsembleAccumulator
+from .vtk_export import write_vtu, write_pvd, XdmfWriter
+from .frames import to_frame, from_frame, to_arrow, from_arrow, join_frame
+from .small_multiples import plot_grid
+from .atlas import AtlasWriter
+from .tiles import TilePyramid, TileServer
+from .field_codecs import FieldCodec, EncodedField
+from .pipeline import Pipeline, PipelineJob, PipelineError
\ No newline at end of file
@@ -0,0 +1,216 @@
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.collections import PathCollection
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+
+from .hex_lattice import HexLattice
+from .plot_config import PlotConfig
+from .small_multiples import hexagon_paths
+
+# Thumbnails of the contact sheet are drawn at this dpi, their size is set in pixels
+THUMBNAIL_DPI = 100
+
+@dataclass
+class AtlasStats:
+    """
+    Progress of an AtlasWriter
+
+    Attributes:
+        pages (int): Pages written
+        elapsed (float): Seconds since the writer was opened
+        pages_per_second (float): Pages written per second
+    """
+    pages:              int     = 0
+    elapsed:            float   = 0.
+    pages_per_second:   float   = 0.
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Atlas Writer
+# ---------------------------------------------------------------------------------------------------------------------
+class AtlasWriter:
+    """
+    Stream one map per page into a multipage PDF, e.g. the pin powers of every assembly of a core. One figure with
+    one collection of hexagons and one label per cell is built when the writer opens; a page only updates the
+    colours, the labels and the title and is written to the file at once, so that memory stays flat whatever the
+    number of pages.
+
+    A contact sheet PNG of thumbnails of all pages is written on close if `contact_sheet` is given. The thumbnails
+    are spooled to a temporary file, only the finished sheet is held in memory.
+
+    Args:
+        path (Path): Path of the PDF
+        lattice (HexLattice): The geometry of every page
+        pc (PlotConfig): Plot configuration of the pages, with figure_size as page size
+        norm (Normalize, optional): One colour scale for all pages, e.g. Normalize(0.5, 1.5); every page is scaled
+            to its own minimum and maximum if None
+        colorbar (bool): Add a colorbar to the pages
+        contact_sheet (Path, optional): Path of the contact sheet PNG
+        thumbnail_size (int): Width and height in pixels of a thumbnail of the contact sheet
+        sheet_columns (int): Number of thumbnails per row of the contact sheet
+
+    Example:
+        with AtlasWriter('report/pin_power.pdf', assembly, pc, norm=Normalize(0.6, 1.4), contact_sheet='report/all.png') as atlas:
+            for name, power in assemblies:
+                atlas.add_page(power, title=name)
+        print(atlas.stats.pages_per_second)
+    """
+
+    def __init__(
+            self,
+            path: Union[str, Path],
+            lattice: HexLattice,
+            pc: PlotConfig,
+            norm: Optional[Normalize] = None,
+            colorbar: bool = True,
+            contact_sheet: Union[str, Path, None] = None,
+            thumbnail_size: int = 96,
+            sheet_columns: int = 20
+        ) -> None:
+        self.path = Path(path)
+        self.lattice = lattice
+        self.pc = pc
+        self.fixed_norm = norm is not None
+        self.contact_sheet = None if contact_sheet is None else Path(contact_sheet)
+        self.thumbnail_size = thumbnail_size
+        self.sheet_columns = sheet_columns
+        self.pages = 0
+        self._start = time.perf_counter()
+        self._elapsed: Optional[float] = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._pdf = PdfPages(self.path)
+        self._colorbar = None
+        paths = hexagon_paths(lattice)
+        self.fig, self._collection, self._labels, self._title = self._page_figure(paths, Normalize() if norm is None else norm, colorbar)
+        self._thumbnail, self._thumbnail_collection, self._spool = None, None, None
+        if self.contact_sheet is not None:
+            self._thumbnail, self._thumbnail_collection = self._thumbnail_figure(paths)
+            self._spool = tempfile.TemporaryFile()
+
+    def __enter__(self) -> 'AtlasWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _page_figure(self, paths, norm: Normalize, colorbar: bool):
+        pc = self.pc
+        fig = pc.new_figure()
+        ax = fig.add_subplot()
+        self.lattice._setup_ax(pc, ax, global_style=False)
+        collection = PathCollection(paths, array=np.zeros(len(paths)), cmap=pc.color_map, norm=norm, edgecolors=pc.hex_edge_color, **pc.patch_props)
+        ax.add_collection(collection, autolim=False)
+        labels = list()
+        if pc.show_text:
+            text_props = pc.text_props
+            labels = [
+                ax.text(x, y, '', ha='center', va='center', fontsize=pc.text_size, **text_props)
+                for x, y in self.lattice.centre_array.tolist()
+            ]
+        if colorbar:
+            self._colorbar = fig.colorbar(collection, ax=ax, fraction=0.04, pad=0.02)
+            self._colorbar.ax.tick_params(labelsize=pc.text_size)
+        title = ax.set_title('', **pc.title_props)
+        return fig, collection, labels, title
+
+    def _thumbnail_figure(self, paths):
+        fig = Figure(figsize=(self.thumbnail_size / THUMBNAIL_DPI,) * 2, dpi=THUMBNAIL_DPI)
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes((0, 0, 1, 1))
+        self.lattice._setup_ax(self.pc, ax, global_style=False)
+        collection = PathCollection(paths, array=np.zeros(len(paths)), cmap=self.pc.color_map, norm=self._collection.norm, linewidths=0)
+        ax.add_collection(collection, autolim=False)
+        return fig, collection
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Pages
+    # -----------------------------------------------------------------------------------------------------------------
+    def add_page(self, values: np.ndarray, title: Optional[str] = None, labels: Optional[Sequence[str]] = None) -> None:
+        """
+        Write the page of one map
+
+        Args:
+            values (np.ndarray): (n,) values of the cells in the order of HexCells, nan for the cells left blank
+            title (str, optional): Title of the page, pc.image_name if None
+            labels (Sequence[str], optional): Labels of the cells, their rounded values if None
+
+        Raises:
+            ValueError: If the values or the labels do not match the cells, or the writer is closed
+        """
+        if self._elapsed is not None:
+            raise ValueError('The atlas is closed.')
+        values = np.asarray(self.lattice._field_values(values), dtype=float)
+        if labels is not None and len(labels) != len(values):
+            raise ValueError(f'Expected {len(values)} labels, one per cell, received {len(labels)}.')
+
+        masked = np.ma.masked_invalid(values)
+        if not self.fixed_norm and masked.count() > 0:
+            # Both limits change before the colorbar is told, which would otherwise rescale in between
+            norm = self._collection.norm
+            with norm.callbacks.blocked():
+                norm.vmin, norm.vmax = float(masked.min()), float(masked.max())
+        self._collection.set_array(masked)
+        self._collection.changed()
+        if self._colorbar is not None:
+            # The colorbar redraws its solids on every change of the collection. Rasterized solids would be an image
+            # per page, which the PDF backend keeps in memory until it is closed
+            self._colorbar.solids.set_rasterized(False)
+        self._title.set_text(self.pc.image_name if title is None else title)
+        if self._labels:
+            labels = [str(round(value, 2)) for value in values.tolist()] if labels is None else labels
+            text_color_func = self.pc.text_color_func
+            for text, label, color in zip(self._labels, labels, self._collection.to_rgba(masked)):
+                text.set_text(label)
+                text.set_color(text_color_func(color))
+        self._pdf.savefig(self.fig)
+
+        if self._thumbnail is not None:
+            self._thumbnail_collection.set_array(masked)
+            self._thumbnail.canvas.draw()
+            self._spool.write(np.asarray(self._thumbnail.canvas.buffer_rgba())[..., :3].tobytes())
+        self.pages += 1
+
+    @property
+    def stats(self) -> AtlasStats:
+        elapsed = time.perf_counter() - self._start if self._elapsed is None else self._elapsed
+        return AtlasStats(self.pages, elapsed, self.pages / elapsed if elapsed > 0 else 0.)
+
+    def close(self) -> AtlasStats:
+        """
+        Finish the PDF and write the contact sheet
+
+        Returns:
+            AtlasStats: The final statistics
+        """
+        if self._elapsed is None:
+            self._pdf.close()
+            if self._spool is not None:
+                self._write_contact_sheet()
+                self._spool.close()
+            self._elapsed = time.perf_counter() - self._start
+        return self.stats
+
+    def _write_contact_sheet(self) -> None:
+        if self.pages == 0:
+            return
+        height, width = np.asarray(self._thumbnail.canvas.buffer_rgba()).shape[:2]
+        self._spool.flush()
+        thumbnails = np.memmap(self._spool, dtype=np.uint8, mode='r', shape=(self.pages, height, width, 3))
+        columns = min(self.sheet_columns, self.pages)
+        rows = -(-self.pages // columns)
+        sheet = np.full((rows * height, columns * width, 3), 255, dtype=np.uint8)
+        for page in range(self.pages):
+            row, column = divmod(page, columns)
+            sheet[row * height:(row + 1) * height, column * width:(column + 1) * width] = thumbnails[page]
+        del thumbnails
+        self.contact_sheet.parent.mkdir(parents=True, exist_ok=True)
+        imsave(self.contact_sheet, sheet)
@@ -0,0 +1,234 @@
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Literal
+
+import numpy as np
+
+from .coordinates import AXIAL_DIRECTION_OFFSETS
+
+# Cartesian offsets (6, 2) of the neighbours at unit pitch in the order of DIRACTIONS: X = x + z / 2, Y = -sqrt(3) / 2 z
+CARTESIAN_DIRECTION_OFFSETS = np.stack(
+    (AXIAL_DIRECTION_OFFSETS[:, 0] + AXIAL_DIRECTION_OFFSETS[:, 1] / 2, -np.sqrt(3) / 2 * AXIAL_DIRECTION_OFFSETS[:, 1]),
+    axis=-1
+)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Axial Grid
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class AxialGrid:
+    """
+    A dense 2D array indexed by the axial coordinates (x, z) of a set of cells, which maps every axial position to the
+    index of its cell. It replaces searching the cell list with a single fancy-indexing lookup.
+
+    Attributes:
+        x_min (int): Axial x of the first row of the grid
+        z_min (int): Axial z of the first column of the grid
+        index (np.ndarray): (nx, nz) cell index of every axial position, -1 where there is no cell
+
+    Fields can be stored densely on the grid as well, as arrays (..., nx, nz) with any leading dimensions. Every
+    neighbour of every position is then a shifted slice of the array, so the six-neighbour stencils below are a few
+    array operations whatever the number of cells. Positions without a cell are ignored by the stencils.
+
+    Example:
+        Cells at axial (0,0), (1,0), (0,1) give x_min = 0, z_min = 0 and
+            index = [[ 0,  2],
+                     [ 1, -1]]
+
+        grid = lattice.axial_grid
+        dense = grid.scatter(power)
+        smoothed = grid.gather(grid.smooth(dense, iterations=10))
+    """
+    x_min:  int
+    z_min:  int
+    index:  np.ndarray = field(repr=False)
+
+    @staticmethod
+    def from_axial_array(axial: np.ndarray) -> 'AxialGrid':
+        """
+        Build the grid of the cells whose axial coordinates are the rows of `axial` (n, 2)
+        """
+        axial = np.asarray(axial, dtype=int).reshape(-1, 2)
+        if len(axial) == 0:
+            return AxialGrid(0, 0, np.full((0, 0), -1, dtype=np.int64))
+        x_min, z_min = axial.min(axis=0)
+        x_max, z_max = axial.max(axis=0)
+        index = np.full((x_max - x_min + 1, z_max - z_min + 1), -1, dtype=np.int64)
+        index[axial[:, 0] - x_min, axial[:, 1] - z_min] = np.arange(len(axial))
+        return AxialGrid(int(x_min), int(z_min), index)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.index.shape
+
+    def lookup(self, axial: np.ndarray) -> np.ndarray:
+        """
+        Cell indices of an array of axial coordinates (..., 2), -1 for the positions without a cell
+        """
+        axial = np.asarray(axial, dtype=int)
+        ix = axial[..., 0] - self.x_min
+        iz = axial[..., 1] - self.z_min
+        inside = (ix >= 0) & (ix < self.shape[0]) & (iz >= 0) & (iz < self.shape[1])
+        res = np.full(ix.shape, -1, dtype=np.int64)
+        res[inside] = self.index[ix[inside], iz[inside]]
+        return res
+
+    def neighbour_table(self, axial: np.ndarray) -> np.ndarray:
+        """
+        Cell indices (n, 6) of the neighbours of the cells at `axial` (n, 2) in the order of DIRACTIONS,
+        -1 where the neighbour is not a cell
+        """
+        axial = np.asarray(axial, dtype=int).reshape(-1, 2)
+        return self.lookup(axial[:, np.newaxis, :] + AXIAL_DIRECTION_OFFSETS[np.newaxis, :, :])
+
+    @cached_property
+    def mask(self) -> np.ndarray:
+        """
+        (nx, nz) bool array, True at the positions of the cells
+        """
+        return self.index >= 0
+
+    @cached_property
+    def _cell_positions(self) -> tuple[np.ndarray, np.ndarray]:
+        flat = np.flatnonzero(self.mask)
+        positions = np.empty(len(flat), dtype=np.int64)
+        positions[self.index.ravel()[flat]] = flat
+        return np.unravel_index(positions, self.shape)
+
+    @cached_property
+    def neighbour_count(self) -> np.ndarray:
+        """
+        (nx, nz) number of neighbours of every position which are cells
+        """
+        return self.neighbour_sum(self.mask.astype(np.int64))
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Gather & Scatter
+    # -----------------------------------------------------------------------------------------------------------------
+    def scatter(self, values: np.ndarray, fill_value: float = np.nan) -> np.ndarray:
+        """
+        Dense array (..., nx, nz) of cell ordered values (..., n), fill_value where there is no cell
+
+        Raises:
+            ValueError: If the last dimension of values is not the number of cells
+        """
+        values = np.asarray(values)
+        ix, iz = self._cell_positions
+        if values.shape[-1:] != ix.shape:
+            raise ValueError(f'Expected {len(ix)} values, one per cell, received an array of shape {values.shape}.')
+        dtype = np.result_type(values.dtype, np.asarray(fill_value).dtype)
+        dense = np.full(values.shape[:-1] + self.shape, fill_value, dtype=dtype)
+        dense[..., ix, iz] = values
+        return dense
+
+    def gather(self, dense: np.ndarray) -> np.ndarray:
+        """
+        Cell ordered values (..., n) of a dense array (..., nx, nz), the inverse of scatter
+        """
+        dense = np.asarray(dense)
+        if dense.shape[-2:] != self.shape:
+            raise ValueError(f'Expected an array of shape (..., {self.shape[0]}, {self.shape[1]}), received {dense.shape}.')
+        ix, iz = self._cell_positions
+        return dense[..., ix, iz]
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Stencils
+    # -----------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def _shift_slices(dx: int, dz: int) -> tuple[tuple[slice, slice], tuple[slice, slice]]:
+        """
+        Slices (target, source) such that target position (x, z) reads its neighbour at (x + dx, z + dz)
+        """
+        def pair(d: int) -> tuple[slice, slice]:
+            return (slice(0, -d), slice(d, None)) if d > 0 else (slice(-d, None), slice(0, d or None))
+        (target_x, source_x), (target_z, source_z) = pair(dx), pair(dz)
+        return (target_x, target_z), (source_x, source_z)
+
+    def _masked(self, dense: np.ndarray) -> np.ndarray:
+        dense = np.asarray(dense)
+        if dense.shape[-2:] != self.shape:
+            raise ValueError(f'Expected an array of shape (..., {self.shape[0]}, {self.shape[1]}), received {dense.shape}.')
+        return np.where(self.mask, dense, 0)
+
+    def neighbour_sum(self, dense: np.ndarray) -> np.ndarray:
+        """
+        Sum (..., nx, nz) of the values of the neighbours of every position which are cells
+        """
+        dense = self._masked(dense)
+        res = np.zeros_like(dense)
+        for dx, dz in AXIAL_DIRECTION_OFFSETS.tolist():
+            target, source = self._shift_slices(dx, dz)
+            res[(..., *target)] += dense[(..., *source)]
+        return res
+
+    def neighbour_mean(self, dense: np.ndarray) -> np.ndarray:
+        """
+        Mean (..., nx, nz) over the neighbours which are cells, nan at the positions without any
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.neighbour_sum(dense) / self.neighbour_count
+
+    def laplacian(
+            self,
+            dense: np.ndarray,
+            boundary: Literal['neumann', 'dirichlet'] = 'neumann',
+            boundary_value: float = 0.,
+            pitch: float = 1.
+        ) -> np.ndarray:
+        """
+        Six-point Laplacian (..., nx, nz): 2 / (3 * pitch ** 2) * sum over the neighbours of (neighbour - centre)
+
+        Args:
+            dense (np.ndarray): Dense field (..., nx, nz)
+            boundary ('neumann' | 'dirichlet'): Missing neighbours take the value of the centre, i.e. no flux through
+                the outer edges, or take boundary_value
+            boundary_value (float): Value of the missing neighbours for the Dirichlet boundary
+            pitch (float): Distance between the centres of neighbours
+
+        Returns:
+            np.ndarray: The Laplacian, nan at the positions without a cell
+        """
+        if boundary not in ('neumann', 'dirichlet'):
+            raise ValueError(f'Invalid boundary {boundary}, the valid boundaries are neumann and dirichlet.')
+        centre = self._masked(dense)
+        count = self.neighbour_count
+        difference = self.neighbour_sum(centre) - count * centre
+        if boundary == 'dirichlet':
+            difference = difference + (6 - count) * (boundary_value - centre)
+        return np.where(self.mask, 2 / (3 * pitch ** 2) * difference, np.nan)
+
+    def gradient(self, dense: np.ndarray, pitch: float = 1.) -> np.ndarray:
+        """
+        Cartesian gradient (..., 2, nx, nz), the x and y components, fitted by least squares to the differences with the neighbours which are
+        cells. It is exact for linear fields, and nan where fewer than two independent neighbours exist.
+        """
+        centre = self._masked(dense)
+        moment = np.zeros(self.shape + (2, 2))
+        rhs = np.zeros(centre.shape + (2,))
+        for (dx, dz), offset in zip(AXIAL_DIRECTION_OFFSETS.tolist(), pitch * CARTESIAN_DIRECTION_OFFSETS):
+            target, source = self._shift_slices(dx, dz)
+            exists = self.mask[source] & self.mask[target]
+            moment[target] += exists[..., np.newaxis, np.newaxis] * np.outer(offset, offset)
+            rhs[(..., *target, slice(None))] += (exists * (centre[(..., *source)] - centre[(..., *target)]))[..., np.newaxis] * offset
+
+        # Closed form inverse of the 2x2 moment matrices
+        a, b, c, d = moment[..., 0, 0], moment[..., 0, 1], moment[..., 1, 0], moment[..., 1, 1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            det = np.where(self.mask & (np.abs(a * d - b * c) > 1e-9 * pitch ** 4), a * d - b * c, np.nan)
+            gx = (d * rhs[..., 0] - b * rhs[..., 1]) / det
+            gy = (a * rhs[..., 1] - c * rhs[..., 0]) / det
+        return np.stack((gx, gy), axis=-3)
+
+    def smooth(self, dense: np.ndarray, iterations: int = 1, alpha: float = 0.5) -> np.ndarray:
+        """
+        Relax every cell towards the mean of its neighbours which are cells: value += alpha * (mean - value),
+        `iterations` times. alpha = 1 replaces every value by the neighbour mean, isolated cells are left unchanged.
+        """
+        if not 0 <= alpha <= 1:
+            raise ValueError(f'Invalid alpha {alpha}, it must be in [0, 1].')
+        dense = self._masked(dense).astype(float)
+        weight = np.where(self.neighbour_count > 0, alpha, 0.)
+        count = np.maximum(self.neighbour_count, 1)
+        for _ in range(iterations):
+            dense = dense + weight * (self.neighbour_sum(dense) / count - dense)
+        return np.where(self.mask, dense, np.nan)
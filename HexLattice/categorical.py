@@ -0,0 +1,182 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Mapping, Optional, Sequence, Union
+
+import matplotlib as mpl
+import matplotlib.colors as mcolors
+import numpy as np
+from matplotlib.patches import Patch
+
+# Qualitative colour maps, used in this order until one has enough colours; beyond that colours are sampled from the last
+DEFAULT_PALETTES = ('tab10', 'tab20', 'turbo')
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Categorical Field
+# ---------------------------------------------------------------------------------------------------------------------
+def _code_dtype(n_categories: int) -> np.dtype:
+    if n_categories <= 2 ** 8:
+        return np.dtype(np.uint8)
+    if n_categories <= 2 ** 16:
+        return np.dtype(np.uint16)
+    raise ValueError(f'At most {2 ** 16} categories are supported, received {n_categories}.')
+
+
+def default_palette(n_categories: int) -> np.ndarray:
+    """
+    RGBA colours (n_categories, 4) from the first of DEFAULT_PALETTES with enough colours
+    """
+    for name in DEFAULT_PALETTES:
+        cmap = mpl.colormaps[name]
+        if isinstance(cmap, mcolors.ListedColormap) and cmap.N >= n_categories and name != DEFAULT_PALETTES[-1]:
+            return cmap(np.arange(n_categories))
+    return mpl.colormaps[DEFAULT_PALETTES[-1]](np.linspace(0, 1, n_categories))
+
+
+@dataclass
+class CategoricalField:
+    """
+    Integer ids of the cells, e.g. material ids, stored as compact codes into a table of categories. The codes are
+    uint8 up to 256 categories and uint16 up to 65536. Codes of shape (..., n) hold several variants of a map, e.g.
+    loading patterns, which share one table.
+
+    Attributes:
+        codes (np.ndarray): (..., n) index of the category of every cell
+        ids (np.ndarray): (k,) id of every category
+        names (list[str]): (k,) name of every category, shown in the labels and the legend
+        palette (np.ndarray): (k, 4) RGBA colour of every category
+
+    Example:
+        materials = CategoricalField.from_ids(material_id, names={1: 'fuel', 2: 'reflector'}, colors={2: 'grey'})
+        lattice.add_field('material', materials)
+        lattice.plot_categories(pc, 'material')
+    """
+    codes:      np.ndarray  = field(repr=False)
+    ids:        np.ndarray
+    names:      list[str]
+    palette:    np.ndarray  = field(repr=False)
+
+    def __post_init__(self) -> None:
+        self.ids = np.asarray(self.ids)
+        self.names = [str(name) for name in self.names]
+        self.palette = np.asarray(mcolors.to_rgba_array(self.palette), dtype=float)
+        self.codes = np.asarray(self.codes).astype(_code_dtype(len(self.ids)), copy=False)
+        if not len(self.ids) == len(self.names) == len(self.palette):
+            raise ValueError(f'The {len(self.ids)} ids, {len(self.names)} names and {len(self.palette)} colours do not match.')
+        if self.codes.size and int(self.codes.max()) >= len(self.ids):
+            raise ValueError(f'The codes must be smaller than the {len(self.ids)} categories.')
+
+    @staticmethod
+    def from_ids(
+            ids: np.ndarray,
+            names: Optional[Mapping] = None,
+            colors: Optional[Mapping] = None,
+            categories: Optional[Sequence] = None
+        ) -> 'CategoricalField':
+        """
+        Encode an array of ids (..., n)
+
+        Args:
+            ids (np.ndarray): Id of every cell
+            names (Mapping, optional): Name of some ids, the others are named by their id
+            colors (Mapping, optional): Matplotlib colour of some ids, the others take default_palette colours
+            categories (Sequence, optional): All of the ids in the order of the table, e.g. to share one table
+                between fields, the sorted unique ids if None
+
+        Raises:
+            ValueError: If an id is not one of the categories
+        """
+        ids = np.asarray(ids)
+        table = np.unique(ids) if categories is None else np.asarray(categories)
+        names = dict() if names is None else names
+        colors = dict() if colors is None else colors
+        palette = default_palette(len(table))
+        for i, category in enumerate(table.tolist()):
+            if category in colors:
+                palette[i] = mcolors.to_rgba(colors[category])
+        res = CategoricalField(
+            np.zeros(ids.shape, dtype=_code_dtype(len(table))),
+            table,
+            [names.get(category, category) for category in table.tolist()],
+            palette
+        )
+        res.codes = res.encode(ids)
+        return res
+
+    def encode(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Codes of an array of ids in the table of this field
+
+        Raises:
+            ValueError: If an id is not one of the categories
+        """
+        ids = np.asarray(ids)
+        order = np.argsort(self.ids, kind='stable')
+        position = np.clip(np.searchsorted(self.ids, ids, sorter=order), 0, max(len(self.ids) - 1, 0))
+        codes = order[position] if len(self.ids) else np.zeros(ids.shape, dtype=np.int64)
+        unknown = ids != self.ids[codes] if len(self.ids) else np.ones(ids.shape, dtype=bool)
+        if np.any(unknown):
+            raise ValueError(f'The ids {np.unique(ids[unknown]).tolist()} are not categories of the field.')
+        return codes.astype(self.codes.dtype)
+
+    def variant(self, ids: np.ndarray) -> 'CategoricalField':
+        """
+        Another map of the same categories, sharing the table
+        """
+        return CategoricalField(self.encode(ids), self.ids, self.names, self.palette)
+
+    def __getitem__(self, index) -> 'CategoricalField':
+        """
+        Select variants of a stacked field, e.g. field[3] is the fourth map
+        """
+        return CategoricalField(self.codes[index], self.ids, self.names, self.palette)
+
+    @property
+    def n_categories(self) -> int:
+        return len(self.ids)
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        The ids (..., n) of the cells
+        """
+        return self.ids[self.codes]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.ids.nbytes + self.palette.nbytes
+
+    def rgba(self) -> np.ndarray:
+        """
+        Colours (..., n, 4) of the cells, looked up in the palette at once
+        """
+        return self.palette[self.codes]
+
+    def counts(self) -> np.ndarray:
+        """
+        Number of cells (k,) of every category, over all variants
+        """
+        return np.bincount(self.codes.ravel(), minlength=self.n_categories)
+
+    def legend_handles(self, present_only: bool = True, **patch_props) -> list[Patch]:
+        """
+        Legend entries of the categories, only of those present in the codes with `present_only`
+        """
+        present = self.counts() > 0 if present_only else np.ones(self.n_categories, dtype=bool)
+        return [
+            Patch(facecolor=self.palette[i], label=self.names[i], **patch_props)
+            for i in np.flatnonzero(present)
+        ]
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Storage
+    # -----------------------------------------------------------------------------------------------------------------
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Save the codes and the table to a compressed .npz file
+        """
+        np.savez_compressed(path, codes=self.codes, ids=self.ids, names=np.array(self.names, dtype=str), palette=self.palette)
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> 'CategoricalField':
+        with np.load(path) as data:
+            return CategoricalField(data['codes'], data['ids'], data['names'].tolist(), data['palette'])
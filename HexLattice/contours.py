@@ -0,0 +1,113 @@
+from typing import Sequence, Union
+
+import numpy as np
+
+from .zones import chain_segments
+
+# The two triangles of the dual mesh owned by every cell, as pairs of neighbour directions of DIRACTIONS: the cell,
+# its right and its bottom-right neighbour, and the cell, its bottom-right and its bottom-left neighbour. Every
+# triangle of the mesh is owned by exactly one cell, its top vertex.
+TRIANGLE_DIRECTIONS = np.array([(0, 1), (1, 2)])
+
+# Edges of a triangle, as pairs of its vertexes
+TRIANGLE_EDGES = np.array([(0, 1), (1, 2), (2, 0)])
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Dual Mesh
+# ---------------------------------------------------------------------------------------------------------------------
+def dual_triangles(neighbour_table: np.ndarray) -> np.ndarray:
+    """
+    Triangles (m, 3) of cell indices joining the centres of every three mutually neighbouring cells, the dual mesh
+    of the hexagons. The mesh covers the convex parts of the lattice between the cell centres.
+
+    Args:
+        neighbour_table (np.ndarray): (n, 6) neighbour indices of every cell, -1 for a missing neighbour
+    """
+    first = neighbour_table[:, TRIANGLE_DIRECTIONS[:, 0]]
+    second = neighbour_table[:, TRIANGLE_DIRECTIONS[:, 1]]
+    cell_index, triangle_index = np.nonzero((first >= 0) & (second >= 0))
+    return np.stack((
+        cell_index,
+        first[cell_index, triangle_index],
+        second[cell_index, triangle_index]
+    ), axis=-1)
+
+
+def contour_levels(values: np.ndarray, levels: Union[int, Sequence[float]]) -> np.ndarray:
+    """
+    The given levels, or `levels` equally spaced levels strictly between the minimum and the maximum of the values
+    """
+    if np.ndim(levels) > 0:
+        return np.asarray(levels, dtype=float)
+    if levels < 1:
+        raise ValueError(f'At least one contour level is required, received {levels}.')
+    low, high = np.nanmin(values), np.nanmax(values)
+    return np.linspace(low, high, levels + 2)[1:-1]
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Marching Triangles
+# ---------------------------------------------------------------------------------------------------------------------
+def contour_segments(
+        points: np.ndarray,
+        triangles: np.ndarray,
+        values: np.ndarray,
+        levels: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The segments of the isolines of all levels at once. A triangle with vertexes on both sides of a level is crossed
+    by one segment, joining the linearly interpolated crossings of its two edges with a sign change. Every edge is
+    interpolated from its lower to its higher cell index, so that the two triangles of an edge cross it at exactly
+    the same point. Vertexes on a level count as above it. Triangles with a nan vertex are skipped.
+
+    Args:
+        points (np.ndarray): (n, 2) cell centres
+        triangles (np.ndarray): (m, 3) cell indices of the triangles, see dual_triangles
+        values (np.ndarray): (n,) values of the cells
+        levels (np.ndarray): (k,) levels of the isolines
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Segments (s, 2, 2) and the index (s,) of the level of every segment, sorted
+            by level
+    """
+    values = np.asarray(values, dtype=float)
+    levels = np.asarray(levels, dtype=float).reshape(-1)
+    triangles = triangles[~np.any(np.isnan(values[triangles]), axis=-1)]
+
+    # Edges (m, 3, 2) with the lower cell index first
+    edges = np.sort(triangles[:, TRIANGLE_EDGES], axis=-1)
+    above = values[edges][np.newaxis] >= levels[:, np.newaxis, np.newaxis, np.newaxis]
+    crossing = above[..., 0] != above[..., 1]
+
+    # A crossed triangle has exactly two crossed edges, which np.nonzero returns next to each other
+    level_index, triangle_index, edge_index = np.nonzero(crossing)
+    start, end = edges[triangle_index, edge_index].T
+    t = (levels[level_index] - values[start]) / (values[end] - values[start])
+    crossings = points[start] + t[:, np.newaxis] * (points[end] - points[start])
+    crossings[t == 1] = points[end[t == 1]]
+    segments = crossings.reshape(-1, 2, 2)
+
+    # A vertex on the level, alone on its side of the triangle, gives a segment of length 0
+    degenerate = np.all(segments[:, 0] == segments[:, 1], axis=-1)
+    return segments[~degenerate], level_index[::2][~degenerate]
+
+
+def contour_lines(
+        points: np.ndarray,
+        triangles: np.ndarray,
+        values: np.ndarray,
+        levels: np.ndarray,
+        pitch: float = 1
+    ) -> dict[float, list[np.ndarray]]:
+    """
+    The isolines of every level as polylines, the segments of contour_segments chained at their shared crossings
+
+    Returns:
+        dict[float, list[np.ndarray]]: Polylines (k, 2) by level, closed ones with the first point repeated at the end
+    """
+    levels = np.asarray(levels, dtype=float).reshape(-1)
+    segments, level_index = contour_segments(points, triangles, values, levels)
+    bounds = np.searchsorted(level_index, np.arange(len(levels) + 1))
+    return {
+        level: chain_segments(segments[bounds[i]:bounds[i + 1]], pitch)
+        for i, level in enumerate(levels.tolist())
+    }
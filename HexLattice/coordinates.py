@@ -8,6 +8,8 @@ import numpy as np
 # The Six valid Directions of Hexagons
 ValidDirections = Literal['right', 'bottom-right', 'bottom-left', 'left', 'top-left', 'top-right']
 DIRACTIONS = ['right', 'bottom-right', 'bottom-left', 'left', 'top-left', 'top-right']
+# Axial (x, z) offsets of the six directions, in the order of DIRACTIONS
+AXIAL_DIRECTION_OFFSETS = np.array([(1, 0), (0, 1), (-1, 1), (-1, 0), (0, -1), (1, -1)])
 ValidCoordinateType = Literal['axial', 'ring', 'cube', 'double_width', 'cartesian']
 
 # ---------------------------------------------------------------------------------------------------------------------
@@ -410,7 +412,37 @@ class RingCoordinate(AbstractCoordinate):
         k = num_of_rotation * r + new_z
         
         return RingCoordinate(round(r), round(k))
-    
+
+    # Vectorized operations on arrays of ring coordinates, whose last axis is (r, k)
+    @staticmethod
+    def from_axial_array(axial: np.ndarray) -> np.ndarray:
+        """
+        Convert an array of axial coordinates (..., 2) to ring coordinates (..., 2), the same as converted_from_axial.
+        All six counterclockwise rotations are made at once and the first one ending with x >= 0 and z >= 0 is kept.
+        """
+        cube = CubeCoordinate.from_axial_array(np.asarray(axial, dtype=np.int64))
+        r = np.max(np.abs(cube), axis=-1)
+        rotations = [cube]
+        for _ in range(5):
+            # Counterclockwise rotation [x, y, z] --> [-y, -z, -x]
+            rotations.append(-rotations[-1][..., [1, 2, 0]])
+        rotations = np.stack(rotations)
+        num_of_rotation = np.argmax((rotations[..., 0] >= 0) & (rotations[..., 2] >= 0), axis=0)
+        new_z = np.take_along_axis(rotations[..., 2], num_of_rotation[np.newaxis], axis=0)[0]
+        return np.stack((r, num_of_rotation * r + new_z), axis=-1)
+
+    @staticmethod
+    def to_axial_array(ring: np.ndarray) -> np.ndarray:
+        """
+        Convert an array of ring coordinates (..., 2) to axial coordinates (..., 2), the same as convert_to_axial
+        """
+        ring = np.asarray(ring, dtype=np.int64)
+        r = ring[..., 0]
+        k = ring[..., 1]
+        x = (np.abs(k - 2 * r) + np.abs(k - 3 * r) - np.abs(k - 5 * r) - k) // 2 + r
+        z = (- np.abs(k - 1 * r) - np.abs(k - 2 * r) + np.abs(k - 4 * r) + np.abs(k - 5 * r)) // 2 + k - 3 * r
+        return np.stack((x, z), axis=-1)
+
     @staticmethod
     def get_all_coord_by_r(r_max: int) -> list['RingCoordinate']:
         """
@@ -480,6 +512,47 @@ class CubeCoordinate(AbstractCoordinate):
         y = - x - z
         return CubeCoordinate(x, y, z)
 
+    # Vectorized operations on arrays of cube coordinates, whose last axis is (x, y, z)
+    @staticmethod
+    def from_axial_array(axial: np.ndarray) -> np.ndarray:
+        """
+        Convert an array of axial coordinates (..., 2) to cube coordinates (..., 3)
+        """
+        axial = np.asarray(axial)
+        x = axial[..., 0]
+        z = axial[..., 1]
+        return np.stack((x, - x - z, z), axis=-1)
+    
+    @staticmethod
+    def to_axial_array(cube: np.ndarray) -> np.ndarray:
+        """
+        Convert an array of cube coordinates (..., 3) to axial coordinates (..., 2)
+        """
+        cube = np.asarray(cube)
+        return np.stack((cube[..., 0], cube[..., 2]), axis=-1)
+    
+    @staticmethod
+    def distance_array(cube_a: np.ndarray, cube_b: np.ndarray) -> np.ndarray:
+        """
+        Hex distance (the number of steps between two hexagons) of broadcastable arrays of cube coordinates
+        """
+        return np.max(np.abs(np.asarray(cube_a) - np.asarray(cube_b)), axis=-1)
+    
+    @staticmethod
+    def round_array(cube: np.ndarray) -> np.ndarray:
+        """
+        Round fractional cube coordinates (..., 3) to the cube coordinates of the hexagons containing them
+        """
+        cube = np.asarray(cube, dtype=float)
+        rounded = np.round(cube)
+        diff = np.abs(rounded - cube)
+        
+        # The component with the largest rounding error is recomputed from the other two to keep x + y + z == 0
+        largest = np.argmax(diff, axis=-1)[..., np.newaxis]
+        fixed = - (np.sum(rounded, axis=-1, keepdims=True) - np.take_along_axis(rounded, largest, axis=-1))
+        np.put_along_axis(rounded, largest, fixed, axis=-1)
+        return rounded.astype(int)
+
 # ---------------------------------------------------------------------------------------------------------------------
 #                                                           Double Width Coordinate
 # ---------------------------------------------------------------------------------------------------------------------
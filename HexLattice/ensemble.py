@@ -0,0 +1,281 @@
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from .hex_lattice import HexLattice
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Ensemble Accumulator
+# ---------------------------------------------------------------------------------------------------------------------
+class EnsembleAccumulator:
+    """
+    Streaming statistics over many runs of one field on the same lattice, e.g. perturbed solver runs for uncertainty
+    quantification. Runs are added one at a time or in chunks and only O(n_cells) numbers are kept, plus a reservoir
+    of runs for the quantiles:
+
+        mean, variance      Welford updates, chunks and partial accumulators combined with the parallel formula
+        min, max            running extrema
+        correlation         Pearson correlation of every cell with a scalar reference of the runs, e.g. k-eff
+        quantiles           from a uniform reservoir sample of reservoir_size runs, shared by all cells, exact
+                            while no more runs than reservoir_size were added
+
+    Accumulators of the same lattice are merged with `merge`, e.g. after accumulating disjoint runs in several
+    processes.
+
+    Args:
+        lattice (HexLattice): The geometry of the runs, whose values follow lattice.HexCells
+        reservoir_size (int): Number of runs kept for the quantiles, 0 disables the quantiles
+        seed (int, optional): Seed of the reservoir sampling
+
+    Example:
+        acc = EnsembleAccumulator(lattice, reservoir_size=512)
+        for power, keff in read_runs():
+            acc.add(power, reference=keff)
+        lattice.plot_hex(PlotConfig('relative std'), values=acc.std / acc.mean)
+    """
+
+    def __init__(self, lattice: HexLattice, reservoir_size: int = 256, seed: Optional[int] = None) -> None:
+        self.lattice = lattice
+        self.n_cells = len(lattice.HexCells)
+        self.reservoir_size = reservoir_size
+        self._rng = np.random.default_rng(seed)
+        self.count = 0
+        self.mean = np.zeros(self.n_cells)
+        self._m2 = np.zeros(self.n_cells)
+        self.min = np.full(self.n_cells, np.inf)
+        self.max = np.full(self.n_cells, -np.inf)
+
+        # Co-moments with the reference, None until the first run with a reference
+        self._reference_mean: Optional[float] = None
+        self._reference_m2 = 0.
+        self._comoment: Optional[np.ndarray] = None
+
+        self._reservoir = np.empty((reservoir_size, self.n_cells))
+
+    @property
+    def has_reference(self) -> bool:
+        return self._comoment is not None
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Updates
+    # -----------------------------------------------------------------------------------------------------------------
+    def add(self, run: np.ndarray, reference: Optional[float] = None) -> None:
+        """
+        Add one run (n_cells,), with the scalar reference of the run if correlations are wanted
+        """
+        self.add_chunk(np.asarray(run)[np.newaxis], None if reference is None else [reference])
+
+    def add_chunk(self, runs: np.ndarray, references: Optional[Sequence[float]] = None) -> None:
+        """
+        Add runs (k, n_cells), with their references (k,)
+
+        Raises:
+            ValueError: If the runs do not match the lattice, or references are given for some runs only
+        """
+        runs = np.asarray(runs, dtype=float)
+        if runs.ndim != 2 or runs.shape[1] != self.n_cells:
+            raise ValueError(f'Expected runs of shape (k, {self.n_cells}), received {runs.shape}.')
+        if len(runs) == 0:
+            return
+        if references is not None:
+            references = np.asarray(references, dtype=float)
+            if references.shape != (len(runs),):
+                raise ValueError(f'Expected {len(runs)} references, one per run, received {references.shape}.')
+        self._check_reference(references is not None)
+
+        chunk = EnsembleAccumulator.__new__(EnsembleAccumulator)
+        chunk.n_cells = self.n_cells
+        chunk.count = len(runs)
+        chunk.mean = runs.mean(axis=0)
+        chunk._m2 = ((runs - chunk.mean) ** 2).sum(axis=0)
+        chunk.min = runs.min(axis=0)
+        chunk.max = runs.max(axis=0)
+        if references is None:
+            chunk._reference_mean, chunk._reference_m2, chunk._comoment = None, 0., None
+        else:
+            chunk._reference_mean = float(references.mean())
+            chunk._reference_m2 = float(((references - chunk._reference_mean) ** 2).sum())
+            chunk._comoment = (references - chunk._reference_mean) @ (runs - chunk.mean)
+
+        self._sample(runs)
+        self._combine(chunk)
+
+    def merge(self, other: 'EnsembleAccumulator') -> 'EnsembleAccumulator':
+        """
+        Add the runs of another accumulator of the same lattice, in place
+
+        Returns:
+            EnsembleAccumulator: self
+
+        Raises:
+            ValueError: If the accumulators belong to different lattices, have different reservoir sizes or only one of
+                them has references
+        """
+        if other.n_cells != self.n_cells:
+            raise ValueError(f'Cannot merge accumulators of {self.n_cells} and {other.n_cells} cells.')
+        if other.reservoir_size != self.reservoir_size:
+            raise ValueError(f'Cannot merge reservoirs of {self.reservoir_size} and {other.reservoir_size} runs.')
+        if other.count == 0:
+            return self
+        self._check_reference(other.has_reference)
+        self._merge_reservoir(other)
+        self._combine(other)
+        return self
+
+    def _check_reference(self, has_reference: bool) -> None:
+        if self.count > 0 and has_reference != self.has_reference:
+            raise ValueError('Either all runs or none of the runs must have a reference.')
+
+    def _combine(self, other: 'EnsembleAccumulator') -> None:
+        """
+        Combine the moments with the parallel formula of Chan et al.
+        """
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        weight = other.count / count
+        self._m2 = self._m2 + other._m2 + delta ** 2 * self.count * weight
+        if other.has_reference:
+            if self.count == 0:
+                self._reference_mean, self._reference_m2, self._comoment = 0., 0., np.zeros(self.n_cells)
+            reference_delta = other._reference_mean - self._reference_mean
+            self._comoment = self._comoment + other._comoment + reference_delta * delta * self.count * weight
+            self._reference_m2 = self._reference_m2 + other._reference_m2 + reference_delta ** 2 * self.count * weight
+            self._reference_mean = self._reference_mean + reference_delta * weight
+        self.mean = self.mean + delta * weight
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.count = count
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Reservoir
+    # -----------------------------------------------------------------------------------------------------------------
+    @property
+    def _n_sampled(self) -> int:
+        return min(self.count, self.reservoir_size)
+
+    def _sample(self, runs: np.ndarray) -> None:
+        """
+        Reservoir sampling (algorithm R) of whole runs, before self.count is updated
+        """
+        if self.reservoir_size == 0:
+            return
+        free = min(max(self.reservoir_size - self.count, 0), len(runs))
+        self._reservoir[self.count:self.count + free] = runs[:free]
+        rest = np.arange(self.count + free, self.count + len(runs))
+        slots = (self._rng.random(len(rest)) * (rest + 1)).astype(np.int64)
+        for i in np.flatnonzero(slots < self.reservoir_size).tolist():
+            self._reservoir[slots[i]] = runs[free + i]
+
+    def _merge_reservoir(self, other: 'EnsembleAccumulator') -> None:
+        """
+        A uniform sample of the union of the runs: the number of runs drawn from each side is hypergeometric
+        """
+        if self.reservoir_size == 0:
+            return
+        size = min(self.reservoir_size, self.count + other.count)
+        from_self = int(self._rng.hypergeometric(self.count, other.count, size)) if self.count else 0
+        own = self._reservoir[self._rng.permutation(self._n_sampled)[:from_self]]
+        theirs = other._reservoir[self._rng.permutation(other._n_sampled)[:size - from_self]]
+        self._reservoir[:size] = np.concatenate((own, theirs))
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Statistics
+    # -----------------------------------------------------------------------------------------------------------------
+    def variance(self, ddof: int = 1) -> np.ndarray:
+        """
+        Variance (n_cells,) of the runs, nan without more than ddof runs
+        """
+        if self.count <= ddof:
+            return np.full(self.n_cells, np.nan)
+        return self._m2 / (self.count - ddof)
+
+    @property
+    def std(self) -> np.ndarray:
+        """
+        Sample standard deviation (n_cells,)
+        """
+        return np.sqrt(self.variance())
+
+    def quantile(self, q: Union[float, Sequence[float]]) -> np.ndarray:
+        """
+        Quantiles (n_cells,) or (len(q), n_cells) of the runs, estimated from the reservoir
+
+        Raises:
+            ValueError: If there are no runs or the reservoir is disabled
+        """
+        if self._n_sampled == 0:
+            raise ValueError('Quantiles need at least one run and a reservoir_size larger than 0.')
+        return np.quantile(self._reservoir[:self._n_sampled], q, axis=0)
+
+    def correlation(self) -> np.ndarray:
+        """
+        Pearson correlation (n_cells,) of every cell with the reference of the runs, nan for constant cells
+
+        Raises:
+            ValueError: If the runs have no reference
+        """
+        if not self.has_reference:
+            raise ValueError('Correlations need a reference for every run, see add.')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._comoment / np.sqrt(self._m2 * self._reference_m2)
+
+    def fields(self, quantiles: Sequence[float] = (0.05, 0.5, 0.95)) -> dict[str, np.ndarray]:
+        """
+        The statistics as fields of the cells: 'mean', 'std', 'min', 'max', 'p05', 'p50', ... for the quantiles if
+        the reservoir is enabled, and 'correlation' if the runs have references
+        """
+        res_dict = {'mean': self.mean.copy(), 'std': self.std, 'min': self.min.copy(), 'max': self.max.copy()}
+        if self.reservoir_size > 0 and len(quantiles) > 0:
+            for q, values in zip(quantiles, self.quantile(quantiles)):
+                res_dict[f'p{round(100 * q):02d}'] = values
+        if self.has_reference:
+            res_dict['correlation'] = self.correlation()
+        return res_dict
+
+    def add_to_lattice(self, prefix: str = '', quantiles: Sequence[float] = (0.05, 0.5, 0.95)) -> dict[str, np.ndarray]:
+        """
+        Store the statistics as fields of the lattice, named prefix + name, see fields and HexLattice.add_field
+        """
+        res_dict = {prefix + name: values for name, values in self.fields(quantiles).items()}
+        for name, values in res_dict.items():
+            self.lattice.add_field(name, values)
+        return res_dict
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Storage
+    # -----------------------------------------------------------------------------------------------------------------
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Save the state to an .npz file, e.g. to merge the accumulators of several processes
+        """
+        np.savez(
+            path,
+            count=self.count,
+            mean=self.mean,
+            m2=self._m2,
+            min=self.min,
+            max=self.max,
+            reference=np.array([] if not self.has_reference else [self._reference_mean, self._reference_m2]),
+            comoment=np.zeros(0) if self._comoment is None else self._comoment,
+            reservoir=self._reservoir[:self._n_sampled],
+            reservoir_size=self.reservoir_size
+        )
+
+    @staticmethod
+    def load(path: Union[str, Path], lattice: HexLattice, seed: Optional[int] = None) -> 'EnsembleAccumulator':
+        """
+        Raises:
+            ValueError: If the saved state belongs to a lattice of another size
+        """
+        with np.load(path) as data:
+            acc = EnsembleAccumulator(lattice, int(data['reservoir_size']), seed)
+            if len(data['mean']) != acc.n_cells:
+                raise ValueError(f'The saved state has {len(data["mean"])} cells, the lattice {acc.n_cells}.')
+            acc.count = int(data['count'])
+            acc.mean, acc._m2, acc.min, acc.max = data['mean'], data['m2'], data['min'], data['max']
+            if len(data['reference']):
+                acc._reference_mean, acc._reference_m2 = data['reference'].tolist()
+                acc._comoment = data['comoment']
+            acc._reservoir[:len(data['reservoir'])] = data['reservoir']
+        return acc
@@ -0,0 +1,375 @@
+"""
+Compact storage of long stacks of fields, e.g. the pin powers of every time step and plane of a depletion campaign.
+A FieldCodec encodes an array (steps, ..., n) step by step into independently compressed chunks of chunk_steps
+steps; an EncodedField decodes only the chunks of the steps it is asked for. The codecs combine
+
+    - storage as float64, float32 or float16, or as integers quantized to a declared absolute tolerance
+    - delta encoding, every step of a chunk stored as the difference to the previous one, exactly reversible:
+      integer differences of the quantized values, bitwise XOR of the floats
+    - byte shuffling and zlib compression of every chunk
+
+    codec = FieldCodec(tolerance=5e-4, delta=True)
+    power = lattice.add_field('power', codec.encode(power))
+    lattice.plot_hex(pc, values=power[120])                     # decodes the chunk of step 120 only
+    power.save('campaign/power.npz')
+"""
+import json
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Iterator, Literal, Optional, Union
+
+import numpy as np
+
+# Version of the chunk layout, stored with every saved field
+CODEC_VERSION = 1
+
+# Quantized code of nan
+_NAN_CODE = -1
+
+# Largest quantized code: beyond 2^53 neither the codes nor offset + code * step are exact in float64
+_MAX_CODE = 2 ** 53
+
+FloatDType = Literal['float64', 'float32', 'float16']
+
+_UNSIGNED = {2: np.uint16, 4: np.uint32, 8: np.uint64}
+
+def _shuffle(array: np.ndarray) -> bytes:
+    """
+    The bytes of an array grouped by significance, first byte of every element, then the second, ... which
+    compresses far better: the high bytes of neighbouring values are mostly equal
+    """
+    return np.ascontiguousarray(array.reshape(-1).view(np.uint8).reshape(-1, array.itemsize).T).tobytes()
+
+
+def _unshuffle(data: bytes, dtype: np.dtype, shape: tuple[int, ...]) -> np.ndarray:
+    return np.ascontiguousarray(np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1).T).view(dtype).reshape(shape)
+
+
+def _integer_dtype(low: int, high: int) -> np.dtype:
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Codec
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass(frozen=True)
+class FieldCodec:
+    """
+    How a stack of fields is stored
+
+    Attributes:
+        dtype ('float64' | 'float32' | 'float16'): Storage type of unquantized values, float16 keeps about 3
+            significant digits up to 65504
+        tolerance (float, optional): Quantize the values to integer multiples of 2 * tolerance, so that no decoded
+            value is further than tolerance from the original; dtype is then ignored
+        delta (bool): Store every step as the difference to the previous step of its chunk, which compresses well
+            when the steps change slowly
+        level (int): zlib compression level of the chunks, 0 stores them uncompressed
+        chunk_steps (int): Number of steps per chunk, the unit of decoding
+
+    Raises:
+        ValueError: If a setting is invalid
+    """
+    dtype:          FloatDType          = 'float32'
+    tolerance:      Optional[float]     = None
+    delta:          bool                = False
+    level:          int                 = 6
+    chunk_steps:    int                 = 16
+
+    def __post_init__(self) -> None:
+        if self.dtype not in ('float64', 'float32', 'float16'):
+            raise ValueError(f'Invalid dtype {self.dtype!r}. The valid dtypes are \'float64\', \'float32\' and \'float16\'.')
+        if self.tolerance is not None and not self.tolerance > 0:
+            raise ValueError(f'The tolerance must be positive, received {self.tolerance}.')
+        if not 0 <= self.level <= 9:
+            raise ValueError(f'The compression level must be between 0 and 9, received {self.level}.')
+        if self.chunk_steps < 1:
+            raise ValueError(f'A chunk holds at least one step, received {self.chunk_steps}.')
+
+    @property
+    def quantized(self) -> bool:
+        return self.tolerance is not None
+
+    def encode(self, values: np.ndarray) -> 'EncodedField':
+        """
+        Encode a stack of fields (steps, ..., n), e.g. (steps, n) or (steps, planes, n); a single field (n,) is one
+        step
+
+        Raises:
+            ValueError: If the values are infinite, out of the range of float16, or span more than 2^53 quantization
+                steps of 2 * tolerance
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 0:
+            raise ValueError('Expected a field of the cells, received a scalar.')
+        if np.any(np.isinf(values)):
+            raise ValueError('Infinite values cannot be encoded.')
+        offset, step = 0., 1.
+        if self.quantized:
+            finite = values[~np.isnan(values)]
+            offset, step = (float(finite.min()) if finite.size else 0.), 2 * self.tolerance
+            if finite.size and (float(finite.max()) - offset) / step > _MAX_CODE:
+                raise ValueError(
+                    f'The values span {float(finite.max()) - offset:g}, more than 2^53 steps of 2 * tolerance = {step:g}. '
+                    f'Use a larger tolerance or no quantization.'
+                )
+        elif self.dtype == 'float16' and np.nanmax(np.abs(values), initial=0) > np.finfo(np.float16).max:
+            raise ValueError(f'Values beyond {np.finfo(np.float16).max} do not fit into float16.')
+
+        steps = values.reshape(1, -1) if values.ndim == 1 else values.reshape(len(values), -1)
+        chunks, dtypes = list(), list()
+        for start in range(0, len(steps), self.chunk_steps):
+            data, dtype = self._encode_chunk(steps[start:start + self.chunk_steps], offset, step)
+            chunks.append(data)
+            dtypes.append(dtype.str)
+        return EncodedField(self, values.shape, offset, step, chunks, dtypes)
+
+    def _encode_chunk(self, block: np.ndarray, offset: float, step: float) -> tuple[bytes, np.dtype]:
+        if self.quantized:
+            codes = np.where(np.isnan(block), _NAN_CODE, np.rint((np.nan_to_num(block, nan=offset) - offset) / step)).astype(np.int64)
+            if self.delta:
+                codes[1:] = np.diff(codes, axis=0)
+            stored = codes.astype(_integer_dtype(int(codes.min()), int(codes.max())))
+        else:
+            stored = block.astype(self.dtype)
+            if self.delta:
+                bits = stored.view(_UNSIGNED[stored.itemsize])
+                bits[1:] = bits[1:] ^ bits[:-1]
+        data = _shuffle(stored)
+        return (zlib.compress(data, self.level) if self.level else data), stored.dtype
+
+    def _decode_chunk(self, data: bytes, dtype: np.dtype, shape: tuple[int, ...], offset: float, step: float) -> np.ndarray:
+        stored = _unshuffle(zlib.decompress(data) if self.level else data, dtype, shape)
+        if self.quantized:
+            codes = np.cumsum(stored, axis=0, dtype=np.int64) if self.delta else stored
+            values = offset + codes * step
+            values[codes == _NAN_CODE] = np.nan
+            return values
+        if self.delta:
+            bits = stored.view(_UNSIGNED[stored.itemsize])
+            np.bitwise_xor.accumulate(bits, axis=0, out=bits)
+        return stored.astype(float)
+
+    def error_bound(self, values: np.ndarray) -> float:
+        """
+        The largest absolute error of the decoded values: the tolerance, or half a unit in the last place of the
+        largest value for the floats
+        """
+        if self.quantized:
+            return float(self.tolerance)
+        largest = np.nanmax(np.abs(values), initial=0)
+        return float(np.spacing(np.asarray(largest, dtype=self.dtype)) / 2)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Encoded Field
+# ---------------------------------------------------------------------------------------------------------------------
+class EncodedField:
+    """
+    A stack of fields stored in compressed chunks of steps. Indexing the first axis decodes only the chunks holding
+    the requested steps, and the most recently decoded chunks are kept for the next requests. np.asarray decodes
+    everything. Encoded fields can be stored in HexLattice.fields like arrays.
+
+    Args:
+        codec (FieldCodec): The codec the field was encoded with
+        shape (tuple[int, ...]): Shape of the decoded field
+        offset (float): Value of the quantized code 0
+        step (float): Value of one quantized unit
+        chunks (list[bytes]): The encoded chunks, or a lazy sequence of them
+        dtypes (list[str]): The storage type of every chunk
+
+    Example:
+        power = FieldCodec(tolerance=1e-4, delta=True).encode(power_steps)
+        print(power.compression_ratio)
+        for start, block in power.iter_chunks():                # reductions one chunk at a time
+            peak = np.maximum(peak, block.max(axis=0))
+    """
+
+    def __init__(
+            self,
+            codec: FieldCodec,
+            shape: tuple[int, ...],
+            offset: float,
+            step: float,
+            chunks,
+            dtypes: list[str],
+            cache_chunks: int = 2
+        ) -> None:
+        self.codec = codec
+        self.shape = tuple(shape)
+        self.offset = offset
+        self.step = step
+        self.dtype = np.dtype(float)
+        self._chunks = chunks
+        self._dtypes = [np.dtype(dtype) for dtype in dtypes]
+        self._cache: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._cache_chunks = cache_chunks
+
+    def __repr__(self) -> str:
+        return f'EncodedField(shape={self.shape}, codec={self.codec}, nbytes={self.nbytes})'
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def n_steps(self) -> int:
+        return 1 if self.ndim == 1 else self.shape[0]
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def n_chunks(self) -> int:
+        return len(self._dtypes)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the encoded chunks
+        """
+        return sum(len(self._chunks[index]) for index in range(self.n_chunks))
+
+    @property
+    def raw_nbytes(self) -> int:
+        """
+        Size of the decoded float64 field
+        """
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.raw_nbytes / max(1, self.nbytes)
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Decoding
+    # -----------------------------------------------------------------------------------------------------------------
+    def chunk(self, index: int) -> np.ndarray:
+        """
+        The decoded steps (chunk_steps, ..., n) of one chunk, the last one possibly shorter
+        """
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+        start = index * self.codec.chunk_steps
+        n_steps = min(self.codec.chunk_steps, self.n_steps - start)
+        step_shape = self.shape[-1:] if self.ndim == 1 else self.shape[1:]
+        block = self.codec._decode_chunk(
+            self._chunks[index], self._dtypes[index], (n_steps, int(np.prod(step_shape))), self.offset, self.step
+        ).reshape((n_steps,) + step_shape)
+        block.setflags(write=False)
+        self._cache[index] = block
+        while len(self._cache) > self._cache_chunks:
+            self._cache.popitem(last=False)
+        return block
+
+    def iter_chunks(self) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        The decoded chunks one after the other as (first step, steps), holding one chunk in memory at a time
+        """
+        for index in range(self.n_chunks):
+            yield index * self.codec.chunk_steps, self.chunk(index)
+
+    def __getitem__(self, key) -> np.ndarray:
+        """
+        Decode the requested steps, e.g. field[12], field[10:20, 3] or field[[0, 5, 9]]; further indices select
+        within the steps
+        """
+        if self.ndim == 1:
+            return self.chunk(0)[0][key]
+        key = key if isinstance(key, tuple) else (key,)
+        step_key, rest = key[0], key[1:]
+        if isinstance(step_key, (int, np.integer)):
+            if not -self.n_steps <= step_key < self.n_steps:
+                raise IndexError(f'Step {step_key} is out of range for {self.n_steps} steps.')
+            step = int(step_key) % self.n_steps
+            return self.chunk(step // self.codec.chunk_steps)[(step % self.codec.chunk_steps,) + rest]
+        steps = np.arange(self.n_steps)[step_key]
+        chunk_steps = self.codec.chunk_steps
+        res = np.empty((len(steps),) + self.shape[1:])
+        for index in np.unique(steps // chunk_steps).tolist():
+            selected = np.flatnonzero(steps // chunk_steps == index)
+            res[selected] = self.chunk(index)[steps[selected] - index * chunk_steps]
+        return res[(slice(None),) + rest]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        res = np.concatenate([block for _, block in self.iter_chunks()]).reshape(self.shape)
+        return res if dtype is None else res.astype(dtype)
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Files
+    # -----------------------------------------------------------------------------------------------------------------
+    def close(self) -> None:
+        """
+        Close the file of a loaded field; the chunks decoded last stay readable. Does nothing for an encoded field.
+        """
+        if hasattr(self._chunks, 'close'):
+            self._chunks.close()
+
+    def __enter__(self) -> 'EncodedField':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Write the encoded chunks as they are to an uncompressed .npz file, see load
+        """
+        header = {
+            'version': CODEC_VERSION,
+            'codec': asdict(self.codec),
+            'shape': list(self.shape),
+            'offset': self.offset,
+            'step': self.step,
+            'dtypes': [dtype.str for dtype in self._dtypes],
+        }
+        arrays = {f'chunk_{index}': np.frombuffer(self._chunks[index], dtype=np.uint8) for index in range(self.n_chunks)}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8), **arrays)
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> 'EncodedField':
+        """
+        Open a field written by save. The chunks are read from the file when they are decoded, so the file must stay
+        in place and open until the field is closed:
+
+            with EncodedField.load(path) as power:
+                peak = power[-1].max()
+
+        Raises:
+            ValueError: If the file was written by another version of the codecs
+        """
+        archive = np.load(path)
+        try:
+            header = json.loads(archive['header'].tobytes())
+            if header['version'] != CODEC_VERSION:
+                raise ValueError(f'The field was saved with codec version {header["version"]}, expected {CODEC_VERSION}.')
+        except BaseException:
+            archive.close()
+            raise
+        chunks = _ArchiveChunks(archive)
+        return EncodedField(FieldCodec(**header['codec']), tuple(header['shape']), header['offset'], header['step'], chunks, header['dtypes'])
+
+
+class _ArchiveChunks:
+    """
+    The chunks of a .npz archive, read on access
+    """
+
+    def __init__(self, archive) -> None:
+        self.archive = archive
+
+    def __getitem__(self, index: int) -> bytes:
+        if self.archive is None:
+            raise ValueError('The file of the field is closed.')
+        return self.archive[f'chunk_{index}'].tobytes()
+
+    def close(self) -> None:
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
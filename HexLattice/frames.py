@@ -0,0 +1,375 @@
+import json
+from typing import Any, Optional, Sequence, Union
+
+import numpy as np
+
+from .categorical import CategoricalField, default_palette
+from .coordinates import AxialCoordinate, RingCoordinate
+from .hex_lattice import HexCell, HexLattice
+
+# Column names of the coordinate systems; the axial columns are the index of the frames
+COORDINATE_COLUMNS = {
+    'axial':        ('x', 'z'),
+    'ring':         ('r', 'k'),
+    'cartesian':    ('cartesian_x', 'cartesian_y'),
+}
+# Key of the ids of categorical columns whose categories are the names: DataFrame.attrs maps it to {column: ids},
+# the metadata of an Arrow field to the JSON list of the ids
+CATEGORICAL_IDS = 'hexlattice.categorical_ids'
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Optional Dependencies
+# ---------------------------------------------------------------------------------------------------------------------
+def _import_pandas():
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError('DataFrame conversions require pandas, install it with `pip install pandas`.') from None
+    return pandas
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('Arrow conversions require pyarrow, install it with `pip install pyarrow`.') from None
+    return pyarrow
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Columns
+# ---------------------------------------------------------------------------------------------------------------------
+# Columns are built from the geometry arrays and the fields of the lattice, never cell by cell. 1D float and integer
+# fields are handed over as they are, so pandas and Arrow wrap their buffers instead of copying them; stacked fields
+# (k, n) are split into the columns name[0] ... name[k - 1], which are views of the rows.
+def _coordinate_columns(lattice: HexLattice, coordinates: Sequence[str]) -> dict[str, np.ndarray]:
+    unknown = set(coordinates) - set(COORDINATE_COLUMNS)
+    if unknown:
+        raise ValueError(f'Unknown coordinates {sorted(unknown)}, expected some of {list(COORDINATE_COLUMNS)}.')
+    arrays = {
+        'axial':        lambda: lattice.axial_array,
+        'ring':         lambda: RingCoordinate.from_axial_array(lattice.axial_array),
+        'cartesian':    lambda: lattice.centre_array,
+    }
+    res_dict = dict()
+    for name in coordinates:
+        array = arrays[name]()
+        for i, column in enumerate(COORDINATE_COLUMNS[name]):
+            res_dict[column] = array[:, i]
+    return res_dict
+
+
+def _field_columns(lattice: HexLattice, fields: Optional[Sequence[str]]) -> dict[str, Union[np.ndarray, CategoricalField]]:
+    names = list(lattice.fields) if fields is None else list(fields)
+    missing = [name for name in names if name not in lattice.fields]
+    if missing:
+        raise KeyError(f'No fields {missing}, the fields are {list(lattice.fields)}.')
+    res_dict = dict()
+    for name in names:
+        field = lattice.fields[name]
+        if isinstance(field, CategoricalField):
+            shape = field.codes.shape
+            stacked = [CategoricalField(codes, field.ids, field.names, field.palette) for codes in field.codes.reshape(-1, shape[-1])]
+        else:
+            shape = np.shape(field)
+            stacked = list(np.asarray(field).reshape(-1, shape[-1]))
+        if len(shape) == 1:
+            res_dict[name] = stacked[0]
+        else:
+            res_dict.update({f'{name}[{i}]': column for i, column in enumerate(stacked)})
+    return res_dict
+
+
+def _categories(field: CategoricalField) -> np.ndarray:
+    """
+    The categories of a categorical column: the ids if the names are only the ids, otherwise the names
+    """
+    if _names_are_ids(field):
+        return field.ids
+    return np.array(field.names, dtype=object)
+
+
+def _names_are_ids(field: CategoricalField) -> bool:
+    return field.names == [str(category) for category in field.ids.tolist()]
+
+
+def _categorical_field(codes: np.ndarray, categories: np.ndarray, column: str, ids: Optional[Sequence[int]] = None) -> CategoricalField:
+    """
+    The CategoricalField of a pandas Categorical or an Arrow dictionary column. Integer categories become the ids,
+    other categories the names of the ids, which are read from the column metadata, or 0 ... k - 1 without it.
+
+    Raises:
+        ValueError: If the column has missing values or the ids of the metadata do not match the categories
+    """
+    if np.any(codes < 0):
+        raise ValueError(f'The categorical column {column!r} has missing values.')
+    categories = np.asarray(categories)
+    names = [str(category) for category in categories.tolist()]
+    if np.issubdtype(categories.dtype, np.integer):
+        ids = categories
+    elif ids is not None:
+        ids = np.asarray(ids)
+        if len(ids) != len(categories):
+            raise ValueError(f'The metadata of the categorical column {column!r} has {len(ids)} ids for {len(categories)} categories.')
+    else:
+        ids = np.arange(len(categories))
+    return CategoricalField(codes, ids, names, default_palette(len(ids)))
+
+
+def _lattice_from_columns(
+        columns: dict[str, Any],
+        pitch: float,
+        value: Optional[str],
+        fields: Optional[Sequence[str]],
+        coordinates: str
+    ) -> HexLattice:
+    if coordinates not in ('axial', 'ring'):
+        raise ValueError(f'The cells are located by their axial or ring coordinates, received {coordinates!r}.')
+    coordinate_columns = COORDINATE_COLUMNS[coordinates]
+    missing = [column for column in coordinate_columns if column not in columns]
+    if missing:
+        raise KeyError(f'The {coordinates} coordinate columns {missing} are missing.')
+    located = np.stack([np.asarray(columns[column], dtype=np.int64) for column in coordinate_columns], axis=-1)
+    axial = located if coordinates == 'axial' else RingCoordinate.to_axial_array(located)
+    if len(np.unique(axial, axis=0)) != len(axial):
+        raise ValueError('Every cell must appear once, the coordinates have duplicates.')
+
+    values = [None] * len(axial) if value is None else np.asarray(columns[value], dtype=float).tolist()
+    lattice = HexLattice(
+        [HexCell(AxialCoordinate(x, z), value=v) for (x, z), v in zip(axial.tolist(), values)],
+        pitch
+    )
+    # The rows are the cells in order, so the axial array is known already
+    lattice.__dict__['axial_array'] = axial
+
+    reserved = {column for names in COORDINATE_COLUMNS.values() for column in names}
+    names = [name for name in columns if name not in reserved and name != value] if fields is None else list(fields)
+    for name in names:
+        if name not in columns:
+            raise KeyError(f'No column {name!r}.')
+        column = columns[name]
+        if isinstance(column, CategoricalField):
+            lattice.add_field(name, column)
+        elif np.issubdtype(np.asarray(column).dtype, np.number) or np.asarray(column).dtype == bool:
+            lattice.add_field(name, np.asarray(column))
+        elif fields is not None:
+            raise TypeError(f'The column {name!r} is neither numeric nor categorical.')
+    return lattice
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           pandas
+# ---------------------------------------------------------------------------------------------------------------------
+def to_frame(
+        lattice: HexLattice,
+        fields: Optional[Sequence[str]] = None,
+        coordinates: Sequence[str] = ('axial', 'ring', 'cartesian'),
+        index: bool = True
+    ):
+    """
+    A DataFrame with a row per cell, in the order of lattice.HexCells
+
+    Args:
+        lattice (HexLattice): The cells and their fields
+        fields (Sequence[str], optional): Names of the fields to include, all of lattice.fields if None
+        coordinates (Sequence[str]): Coordinate columns, of 'axial', 'ring' and 'cartesian'
+        index (bool): Index the rows by the axial coordinates (x, z) instead of adding x and z columns
+
+    Returns:
+        pandas.DataFrame: Float and integer fields share the memory of the lattice fields, categorical fields become
+            pandas Categoricals; the ids of categories shown by name are kept in frame.attrs
+
+    Raises:
+        ImportError: If pandas is not installed
+        KeyError: If a field does not exist
+    """
+    pd = _import_pandas()
+    if index:
+        coordinates = [name for name in coordinates if name != 'axial']
+    columns: dict[str, Any] = _coordinate_columns(lattice, coordinates)
+    categorical_ids = dict()
+    for name, field in _field_columns(lattice, fields).items():
+        if isinstance(field, CategoricalField):
+            if not _names_are_ids(field):
+                categorical_ids[name] = field.ids.tolist()
+            field = pd.Categorical.from_codes(field.codes, categories=_categories(field))
+        columns[name] = field
+
+    frame_index = None
+    if index:
+        axial = lattice.axial_array
+        frame_index = pd.MultiIndex.from_arrays((axial[:, 0], axial[:, 1]), names=COORDINATE_COLUMNS['axial'])
+    # With copy=False the arrays of a dict are not consolidated into one block, each column keeps its own buffer
+    frame = pd.DataFrame(columns, index=frame_index, copy=False)
+    if categorical_ids:
+        frame.attrs[CATEGORICAL_IDS] = categorical_ids
+    return frame
+
+
+def _frame_columns(frame) -> dict[str, Any]:
+    """
+    The index levels and the columns of a DataFrame as arrays, categorical columns as CategoricalField
+    """
+    pd = _import_pandas()
+    categorical_ids = frame.attrs.get(CATEGORICAL_IDS, dict())
+    res_dict = dict()
+    for name in frame.index.names:
+        if name is not None:
+            res_dict[name] = frame.index.get_level_values(name).to_numpy()
+    for name in frame.columns:
+        column = frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            res_dict[name] = _categorical_field(
+                column.cat.codes.to_numpy(), column.cat.categories.to_numpy(), name, categorical_ids.get(name)
+            )
+        else:
+            res_dict[name] = column.to_numpy()
+    return res_dict
+
+
+def from_frame(
+        frame,
+        pitch: float = 1,
+        value: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        coordinates: str = 'axial'
+    ) -> HexLattice:
+    """
+    A lattice with a cell per row of a DataFrame and its numeric and categorical columns as fields, the inverse of
+    to_frame. The coordinate columns may be index levels or plain columns.
+
+    Args:
+        frame (pandas.DataFrame): One row per cell
+        pitch (float): Pitch of the lattice
+        value (str, optional): Column stored as HexCell.value, e.g. for plot_hex without values
+        fields (Sequence[str], optional): Columns to store as fields, all numeric and categorical columns if None
+        coordinates ('axial' | 'ring'): Locate the cells by the columns (x, z) or (r, k)
+
+    Raises:
+        ImportError: If pandas is not installed
+        KeyError: If a coordinate column or a field is missing
+        ValueError: If a cell appears twice or a categorical column has missing values
+    """
+    return _lattice_from_columns(_frame_columns(frame), pitch, value, fields, coordinates)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Arrow
+# ---------------------------------------------------------------------------------------------------------------------
+def to_arrow(
+        lattice: HexLattice,
+        fields: Optional[Sequence[str]] = None,
+        coordinates: Sequence[str] = ('axial', 'ring', 'cartesian')
+    ):
+    """
+    An Arrow table with a row per cell, see to_frame. Arrow has no index, the axial coordinates are the columns x
+    and z. Contiguous numeric fields are wrapped without a copy and categorical fields become dictionary arrays of
+    their uint8/uint16 codes; the ids of categories shown by name are kept in the metadata of the field.
+
+    Raises:
+        ImportError: If pyarrow is not installed
+        KeyError: If a field does not exist
+    """
+    pa = _import_pyarrow()
+    columns = {name: pa.array(array) for name, array in _coordinate_columns(lattice, coordinates).items()}
+    metadata = dict()
+    for name, field in _field_columns(lattice, fields).items():
+        if isinstance(field, CategoricalField):
+            columns[name] = pa.DictionaryArray.from_arrays(pa.array(field.codes), pa.array(_categories(field)))
+            if not _names_are_ids(field):
+                metadata[name] = {CATEGORICAL_IDS: json.dumps(field.ids.tolist())}
+        else:
+            columns[name] = pa.array(np.ascontiguousarray(field))
+    schema = pa.schema([pa.field(name, array.type, metadata=metadata.get(name)) for name, array in columns.items()])
+    return pa.table(columns, schema=schema)
+
+
+def _arrow_columns(table) -> dict[str, Any]:
+    pa = _import_pyarrow()
+    res_dict = dict()
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_dictionary(column.type):
+            metadata = table.schema.field(name).metadata or dict()
+            ids = metadata.get(CATEGORICAL_IDS.encode())
+            column = column.combine_chunks()
+            res_dict[name] = _categorical_field(
+                column.indices.to_numpy(zero_copy_only=False),
+                column.dictionary.to_numpy(zero_copy_only=False),
+                name,
+                None if ids is None else json.loads(ids)
+            )
+        else:
+            res_dict[name] = column.to_numpy()
+    return res_dict
+
+
+def from_arrow(
+        table,
+        pitch: float = 1,
+        value: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        coordinates: str = 'axial'
+    ) -> HexLattice:
+    """
+    A lattice with a cell per row of an Arrow table, the inverse of to_arrow, see from_frame
+    """
+    return _lattice_from_columns(_arrow_columns(table), pitch, value, fields, coordinates)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Joins
+# ---------------------------------------------------------------------------------------------------------------------
+def join_frame(
+        lattice: HexLattice,
+        table,
+        columns: Optional[Sequence[str]] = None,
+        coordinates: str = 'axial',
+        prefix: str = '',
+        fill_value: float = np.nan
+    ) -> dict[str, np.ndarray]:
+    """
+    Store columns of an external DataFrame or Arrow table as fields of the lattice, matching the rows to the cells
+    by their coordinates, whatever the order of the rows. Rows of positions outside the lattice are ignored and cells
+    without a row take fill_value.
+
+    Args:
+        lattice (HexLattice): The cells receiving the fields
+        table (pandas.DataFrame | pyarrow.Table): The rows, with the coordinate columns as columns or index levels
+        columns (Sequence[str], optional): Columns to join, all numeric columns besides the coordinates if None
+        coordinates ('axial' | 'ring'): Match the rows by the columns (x, z) or (r, k)
+        prefix (str): Prefix of the field names
+        fill_value (float): Value of the cells without a row
+
+    Returns:
+        dict[str, np.ndarray]: The joined fields (n,), by field name
+
+    Raises:
+        KeyError: If a coordinate column or a column is missing
+        ValueError: If a position appears in several rows
+    """
+    table_columns = _arrow_columns(table) if hasattr(table, 'column_names') else _frame_columns(table)
+    if coordinates not in ('axial', 'ring'):
+        raise ValueError(f'The rows are matched by their axial or ring coordinates, received {coordinates!r}.')
+    coordinate_columns = COORDINATE_COLUMNS[coordinates]
+    missing = [column for column in coordinate_columns if column not in table_columns]
+    if missing:
+        raise KeyError(f'The {coordinates} coordinate columns {missing} are missing.')
+    located = np.stack([np.asarray(table_columns[column], dtype=np.int64) for column in coordinate_columns], axis=-1)
+    axial = located if coordinates == 'axial' else RingCoordinate.to_axial_array(located)
+
+    cells = lattice.axial_grid.lookup(axial)
+    inside = cells >= 0
+    if len(np.unique(cells[inside])) != np.count_nonzero(inside):
+        raise ValueError('A cell of the lattice matches several rows.')
+
+    reserved = {column for names in COORDINATE_COLUMNS.values() for column in names}
+    if columns is None:
+        columns = [
+            name for name, column in table_columns.items()
+            if name not in reserved and not isinstance(column, CategoricalField) and np.issubdtype(column.dtype, np.number)
+        ]
+    res_dict = dict()
+    for name in columns:
+        if name not in table_columns:
+            raise KeyError(f'No column {name!r}.')
+        column = np.asarray(table_columns[name], dtype=float)
+        joined = np.full(len(lattice.HexCells), fill_value, dtype=float)
+        joined[cells[inside]] = column[inside]
+        res_dict[prefix + name] = lattice.add_field(prefix + name, joined)
+    return res_dict
@@ -1,17 +1,40 @@
-from typing import Optional, Literal, Callable
+from typing import Optional, Literal, Callable, Sequence, Union
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
 
 import matplotlib.pyplot as plt
 from matplotlib.axes._axes import Axes
-from matplotlib.patches import Polygon, Circle
-from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from matplotlib.colors import Normalize, is_color_like
 from matplotlib.cm import ScalarMappable
+from matplotlib.transforms import AffineDeltaTransform
+from matplotlib.collections import EllipseCollection, LineCollection, PolyCollection
 import numpy as np
 
 from HexLattice.coordinates import AbstractCoordinate
 
-from .coordinates import Coordinate, ValidDirections, CartesianCoordinate
+from . import queries
+from .axial_grid import AxialGrid
+from .categorical import CategoricalField
+from .contours import dual_triangles, contour_levels, contour_lines
+from .field_codecs import FieldCodec, EncodedField
+from .zones import EdgeSet, unique_edges, label_regions, boundary_polylines, chain_segments
+from .coordinates import Coordinate, ValidDirections, CartesianCoordinate, AxialCoordinate, CubeCoordinate
 from .plot_config import PlotConfig
+from .profiling import RenderTimer, resolve_timer, profile_render
+from .render_cache import RenderCache
+from .transforms import LatticeTransform, POINT_SYMMETRIES
+
+# Vertexes of a pointy hexagon of circumradius 1, at 30, 90, ..., 330 degrees
+POINTY_UNIT_VERTEXES = np.stack((np.cos(np.radians(np.arange(30, 360, 60))), np.sin(np.radians(np.arange(30, 360, 60)))), axis=-1)
+
+# Number of transform permutations kept by each HexLattice
+TRANSFORM_CACHE_SIZE = 64
+
+# Cells can be selected by index, by an index array, by a bool mask over the cells or by coordinate objects
+CellSelector = Union[int, Sequence[int], np.ndarray, AbstractCoordinate, AxialCoordinate, Sequence[AbstractCoordinate]]
 
 @dataclass
 class HexCell(Coordinate):
@@ -60,17 +83,23 @@ class HexLattice:
     def __init__(self, HexCells: list[HexCell], pitch: float = 1) -> None:
         self.pitch = pitch
         real_hex_cells: list[HexCell] = list()
-        record = list()
+        
+        # Cells are equal when their axial coordinates are, so a set of axial tuples finds the duplicates in O(n)
+        record = set()
         for hex_cell in HexCells:
-            if hex_cell in record:
+            axial = hex_cell.axial.as_tuple()
+            if axial in record:
                 continue
             else:
-                record.append(hex_cell)
+                record.add(axial)
                 
                 # Only hex_cell.real_cartesian is changed when pitch multiply hex_cell
                 real_hex_cells.append(pitch * hex_cell)
                 
         self.HexCells = real_hex_cells
+        
+        # Named fields of the cells, see add_field
+        self.fields: dict[str, Union[np.ndarray, CategoricalField, EncodedField]] = dict()
     
     @property
     def value_list(self) -> np.array:
@@ -87,8 +116,77 @@ class HexLattice:
         value_max  = np.max(value_list)
         return (value_list - value_min) / (value_max - value_min)
     
-    def mappable(self, pc: PlotConfig) -> ScalarMappable:
-        norm = Normalize(vmin=np.min(self.value_list), vmax=np.max(self.value_list))
+    def _field_values(self, values: Optional[np.ndarray]) -> np.ndarray:
+        """
+        The given values of the cells, or the values stored in the cells if None
+        
+        Raises:
+            ValueError: If the number of values does not match the number of cells
+        """
+        if values is None:
+            return self.value_list
+        values = np.asarray(values)
+        if values.shape != (len(self.HexCells),):
+            raise ValueError(f'Expected {len(self.HexCells)} values, one per cell, received an array of shape {values.shape}.')
+        return values
+    
+    def add_field(self, name: str, field: Union[np.ndarray, CategoricalField, EncodedField]) -> Union[np.ndarray, CategoricalField, EncodedField]:
+        """
+        Store a field (..., n) of the cells under a name, e.g. a CategoricalField of material ids or an EncodedField
+        of many time steps
+        
+        Raises:
+            ValueError: If the last dimension of the field is not the number of cells
+        """
+        shape = field.codes.shape if isinstance(field, CategoricalField) else np.shape(field)
+        if shape[-1:] != (len(self.HexCells),):
+            raise ValueError(f'Expected a field of {len(self.HexCells)} values, one per cell, received the shape {shape}.')
+        self.fields[name] = field
+        return field
+    
+    def encode_field(self, name: str, codec: FieldCodec) -> EncodedField:
+        """
+        Replace a stored field (steps, ..., n) by its compact encoding, see field_codecs
+        
+        Raises:
+            KeyError: If there is no field of that name
+            TypeError: If the field is categorical
+        """
+        if name not in self.fields:
+            raise KeyError(f'No field {name!r}, the fields are {list(self.fields)}.')
+        field = self.fields[name]
+        if isinstance(field, CategoricalField):
+            raise TypeError(f'The field {name!r} is categorical, its codes are already compact.')
+        if not isinstance(field, EncodedField):
+            self.fields[name] = codec.encode(field)
+        elif field.codec != codec:
+            self.fields[name] = codec.encode(np.asarray(field))
+        return self.fields[name]
+    
+    def _categorical_field(self, categories: Union[str, CategoricalField, None]) -> Optional[CategoricalField]:
+        """
+        Resolve a field name to its CategoricalField
+        
+        Raises:
+            KeyError: If there is no field of that name
+            TypeError: If the field is not categorical
+            ValueError: If the field is not a single map of the cells
+        """
+        if isinstance(categories, str):
+            if categories not in self.fields:
+                raise KeyError(f'No field {categories!r}, the fields are {list(self.fields)}.')
+            categories = self.fields[categories]
+        if categories is None:
+            return None
+        if not isinstance(categories, CategoricalField):
+            raise TypeError(f'Expected a CategoricalField, received {type(categories).__name__}.')
+        if categories.codes.shape != (len(self.HexCells),):
+            raise ValueError(f'Expected one code per cell, received codes of shape {categories.codes.shape}; select a variant first.')
+        return categories
+    
+    def mappable(self, pc: PlotConfig, values: Optional[np.ndarray] = None) -> ScalarMappable:
+        values = self._field_values(values)
+        norm = Normalize(vmin=np.min(values), vmax=np.max(values))
         cmap = pc.color_map
         return ScalarMappable(norm, cmap)
         
@@ -103,70 +201,718 @@ class HexLattice:
         for cell in self.HexCells:
             cell.ObjectRelatedCoordinate = assigner(cell)
             
-    def _plot_cells(self, ax: Axes, pc: PlotConfig, shape_func: Callable, text_mode: Literal['value', 'text']) -> Axes:
-        for i, hex_cell in enumerate(self.HexCells):
-            if text_mode == 'value':
-                color = pc.color_map(self.normed_value_list[i])
-                label = round(hex_cell.value, 2)
-                text_color = pc.text_color_func(color)
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Geometry Arrays
+    # -----------------------------------------------------------------------------------------------------------------
+    # The arrays are computed on first use and follow the order of HexCells. Cells must not be added, removed or moved
+    # afterwards; values and texts may change freely.
+    @cached_property
+    def axial_array(self) -> np.ndarray:
+        """
+        Axial coordinates (n, 2) of the cells
+        """
+        return np.array([hex_cell.axial.as_tuple() for hex_cell in self.HexCells], dtype=np.int64).reshape(-1, 2)
+    
+    @cached_property
+    def cube_array(self) -> np.ndarray:
+        """
+        Cube coordinates (n, 3) of the cells
+        """
+        return CubeCoordinate.from_axial_array(self.axial_array)
+    
+    @cached_property
+    def centre_array(self) -> np.ndarray:
+        """
+        Real cartesian coordinates (n, 2) of the cell centres, scaled by the pitch
+        """
+        return np.array([(hex_cell.real_cartesian.x, hex_cell.real_cartesian.y) for hex_cell in self.HexCells], dtype=float).reshape(-1, 2)
+    
+    @cached_property
+    def radius_array(self) -> np.ndarray:
+        """
+        Circumradii (n,) of the cells
+        """
+        return np.array([hex_cell.radius for hex_cell in self.HexCells], dtype=float)
+    
+    @cached_property
+    def vertex_array(self) -> np.ndarray:
+        """
+        Vertexes (n, 6, 2) of the pointy hexagons in counterclockwise order, the same as HexCell.vertexes_pointy
+        """
+        return self.centre_array[:, np.newaxis, :] + self.radius_array[:, np.newaxis, np.newaxis] * POINTY_UNIT_VERTEXES
+    
+    @cached_property
+    def area_array(self) -> np.ndarray:
+        """
+        Areas (n,) of the hexagons
+        """
+        return 3 * np.sqrt(3) / 2 * self.radius_array ** 2
+    
+    @cached_property
+    def axial_grid(self) -> AxialGrid:
+        return AxialGrid.from_axial_array(self.axial_array)
+    
+    @cached_property
+    def neighbour_table(self) -> np.ndarray:
+        """
+        Indices (n, 6) of the neighbours of every cell in the order of DIRACTIONS, -1 for a missing neighbour
+        """
+        return self.axial_grid.neighbour_table(self.axial_array)
+    
+    def index_of(self, coords: Union[AbstractCoordinate, AxialCoordinate, Sequence, np.ndarray]) -> Union[int, np.ndarray]:
+        """
+        Index of a coordinate in HexCells, -1 if it is not a cell of the lattice.
+
+        Args:
+            coords: A coordinate object, a sequence of coordinate objects or an array of axial coordinates (..., 2)
+
+        Returns:
+            int for a single coordinate object, otherwise an array of indices
+        """
+        if isinstance(coords, (AxialCoordinate, AbstractCoordinate)):
+            return int(self.axial_grid.lookup(coords.convert_to_axial().as_tuple()))
+        if len(coords) > 0 and all(isinstance(coord, (AxialCoordinate, AbstractCoordinate)) for coord in coords):
+            coords = [coord.convert_to_axial().as_tuple() for coord in coords]
+        return self.axial_grid.lookup(np.asarray(coords, dtype=np.int64))
+    
+    def _cell_indices(self, cells: CellSelector) -> np.ndarray:
+        """
+        Normalise a cell selector (an index, an index array, a bool mask or coordinate objects) to an index array
+        
+        Raises:
+            IndexError: If an index is out of range or a coordinate is not a cell of the lattice
+        """
+        if isinstance(cells, (AxialCoordinate, AbstractCoordinate)):
+            cells = [cells]
+        if isinstance(cells, (list, tuple)) and len(cells) > 0 and isinstance(cells[0], (AxialCoordinate, AbstractCoordinate)):
+            indices = self.index_of(cells)
+            if np.any(indices < 0):
+                raise IndexError(f'The coordinates {[cells[i] for i in np.flatnonzero(indices < 0)]} are not cells of the lattice.')
+            return indices
+        
+        cells = np.asarray(cells)
+        if cells.dtype == bool:
+            if cells.shape != (len(self.HexCells),):
+                raise IndexError(f'The mask of shape {cells.shape} does not match the {len(self.HexCells)} cells.')
+            return np.flatnonzero(cells)
+        indices = np.atleast_1d(cells).astype(np.int64, copy=False)
+        if np.any((indices < 0) | (indices >= len(self.HexCells))):
+            raise IndexError(f'Cell indices must be in [0, {len(self.HexCells)}).')
+        return indices
+    
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Queries
+    # -----------------------------------------------------------------------------------------------------------------
+    def distance_matrix(self, rows: Optional[CellSelector] = None, cols: Optional[CellSelector] = None) -> np.ndarray:
+        """
+        Hex distances (n_rows, n_cols) between two sets of cells, all cells by default
+        """
+        rows = slice(None) if rows is None else self._cell_indices(rows)
+        cols = slice(None) if cols is None else self._cell_indices(cols)
+        return queries.distance_matrix(self.cube_array[rows], self.cube_array[cols])
+    
+    def nearest(self, sources: CellSelector, targets: Optional[CellSelector] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The nearest source of every target by hex distance, regardless of the cells in between.
+
+        Args:
+            sources (CellSelector): The candidate cells, e.g. the fuel cells
+            targets (CellSelector, optional): The query cells, e.g. the reflector cells. All cells by default
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (distance, nearest_source) for every target, nearest_source being the
+                cell index of the source
+        """
+        sources = self._cell_indices(sources)
+        targets = slice(None) if targets is None else self._cell_indices(targets)
+        distance, argmin = queries.nearest(self.cube_array[targets], self.cube_array[sources])
+        return distance, sources[argmin]
+    
+    def distance_to(self, cells: CellSelector) -> np.ndarray:
+        """
+        Hex distance of every cell to the nearest of the given cells
+        """
+        return self.nearest(cells)[0]
+    
+    def cells_within(self, centres: CellSelector, distance: int) -> np.ndarray:
+        """
+        Sorted indices of all cells within `distance` steps of any of the centres, e.g. all assemblies within 3 cells
+        of a control rod
+        """
+        centres = self._cell_indices(centres)
+        offsets = queries.range_offsets(int(distance))
+        
+        # Probing the hexagons around each centre is cheaper than measuring every cell unless there are many centres
+        if len(centres) * len(offsets) <= len(self.HexCells):
+            indices = self.axial_grid.lookup(self.axial_array[centres][:, np.newaxis, :] + offsets[np.newaxis, :, :])
+            return np.unique(indices[indices >= 0])
+        return np.flatnonzero(self.distance_to(centres) <= distance)
+    
+    def line_between(self, start: CellSelector, end: CellSelector) -> np.ndarray:
+        """
+        Indices of the hexagons on the straight line from `start` to `end`, both included, in order. Hexagons of the
+        line which are not cells of the lattice are -1.
+        """
+        start, end = self._cell_indices(start)[0], self._cell_indices(end)[0]
+        return queries.lookup_cells(self.axial_grid, queries.line(self.cube_array[start], self.cube_array[end]))
+    
+    def line_of_sight(self, start: CellSelector, end: CellSelector, blocking: Optional[np.ndarray] = None) -> bool:
+        """
+        Whether the straight line between two cells only crosses cells of the lattice which are not blocking.
+
+        Args:
+            blocking (np.ndarray, optional): (n,) bool mask of the blocking cells. The end points never block
+        """
+        between = self.line_between(start, end)[1:-1]
+        if np.any(between < 0):
+            return False
+        return blocking is None or not np.any(np.asarray(blocking, dtype=bool)[between])
+    
+    def distance_field(self, sources: CellSelector, passable: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Number of steps from every cell to the nearest source, walking through neighbouring cells of the lattice only.
+        It differs from `distance_to` when the lattice has holes or when `passable` excludes cells.
+
+        Args:
+            sources (CellSelector): The source cells
+            passable (np.ndarray, optional): (n,) bool mask of the cells which can be walked through
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (distance, nearest_source) of every cell, -1 for unreachable cells
+        """
+        passable = None if passable is None else np.asarray(passable, dtype=bool)
+        return queries.bfs_distance_field(self.neighbour_table, self._cell_indices(sources), passable)
+    
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Transforms
+    # -----------------------------------------------------------------------------------------------------------------
+    @cached_property
+    def _permutation_cache(self) -> OrderedDict:
+        return OrderedDict()
+    
+    def transform_permutation(self, transform: LatticeTransform) -> np.ndarray:
+        """
+        The permutation of the cell index under a transform: cell `i` of the transformed lattice takes the content
+        of cell `permutation[i]`, -1 if the transform brings no cell there. The last TRANSFORM_CACHE_SIZE
+        permutations are cached by transform.
+        """
+        cache = self._permutation_cache
+        if transform in cache:
+            cache.move_to_end(transform)
+            return cache[transform]
+        permutation = self.axial_grid.lookup(transform.inverse().apply(self.axial_array))
+        permutation.setflags(write=False)
+        cache[transform] = permutation
+        if len(cache) > TRANSFORM_CACHE_SIZE:
+            cache.popitem(last=False)
+        return permutation
+    
+    def apply_transform(self, field: np.ndarray, transform: LatticeTransform, fill_value: float = np.nan) -> np.ndarray:
+        """
+        Rotate, reflect or translate a field (..., n) over the cells, e.g. a whole loading pattern.
+
+        Args:
+            field (np.ndarray): Values of the cells along the last axis, possibly stacked
+            transform (LatticeTransform): The transform, see LatticeTransform.rotation/reflection/translation
+            fill_value (float): Value of the cells which no cell is transformed to
+
+        Returns:
+            np.ndarray: The transformed field
+        """
+        field = np.asarray(field)
+        permutation = self.transform_permutation(transform)
+        if len(permutation) == 0 or permutation.min() >= 0:
+            return np.take(field, permutation, axis=-1)
+        res = np.take(field, np.maximum(permutation, 0), axis=-1).astype(np.result_type(field.dtype, fill_value), copy=False)
+        res[..., permutation < 0] = fill_value
+        return res
+    
+    def symmetries(self) -> list[LatticeTransform]:
+        """
+        The rotations and reflections around the origin which map the lattice onto itself
+        """
+        return [transform for transform in POINT_SYMMETRIES if self.transform_permutation(transform).min(initial=0) >= 0]
+    
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Stencils
+    # -----------------------------------------------------------------------------------------------------------------
+    # Fields of the cells are scattered to the dense axial_grid, where the six-neighbour stencils are slice arithmetic.
+    # Every method takes values (..., n) in the order of HexCells, the values of the cells if None.
+    def to_grid(self, values: Optional[np.ndarray] = None, fill_value: float = np.nan) -> np.ndarray:
+        """
+        Dense array (..., nx, nz) of the values on axial_grid, fill_value where there is no cell
+        """
+        return self.axial_grid.scatter(self.value_list if values is None else values, fill_value)
+    
+    def from_grid(self, dense: np.ndarray) -> np.ndarray:
+        """
+        Values (..., n) of the cells from a dense array on axial_grid, the inverse of to_grid
+        """
+        return self.axial_grid.gather(dense)
+    
+    def laplacian(
+            self,
+            values: Optional[np.ndarray] = None,
+            boundary: Literal['neumann', 'dirichlet'] = 'neumann',
+            boundary_value: float = 0.
+        ) -> np.ndarray:
+        """
+        Six-point Laplacian (..., n) of the values at the pitch of the lattice, see AxialGrid.laplacian
+        """
+        return self.from_grid(self.axial_grid.laplacian(self.to_grid(values, 0.), boundary, boundary_value, self.pitch))
+    
+    def gradient(self, values: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cartesian gradient (..., n, 2) of the values, see AxialGrid.gradient
+        """
+        return np.moveaxis(self.from_grid(self.axial_grid.gradient(self.to_grid(values, 0.), self.pitch)), -2, -1)
+    
+    def smooth(self, values: Optional[np.ndarray] = None, iterations: int = 1, alpha: float = 0.5) -> np.ndarray:
+        """
+        Values (..., n) relaxed towards the mean of their neighbours, see AxialGrid.smooth
+        """
+        return self.from_grid(self.axial_grid.smooth(self.to_grid(values, 0.), iterations, alpha))
+    
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Zones
+    # -----------------------------------------------------------------------------------------------------------------
+    @cached_property
+    def edge_set(self) -> EdgeSet:
+        """
+        The edges of the cells, each shared edge once
+        """
+        return unique_edges(self.vertex_array, self.neighbour_table)
+    
+    def label_regions(self, categories: np.ndarray) -> np.ndarray:
+        """
+        Region (n,) of every cell, the regions being the connected groups of cells of equal category, e.g. of a
+        material id. See zones.label_regions
+        """
+        return label_regions(self.neighbour_table, categories)
+    
+    def region_outlines(self, categories: np.ndarray) -> dict[int, list[np.ndarray]]:
+        """
+        Closed outlines of the regions of a categorical field, see label_regions and zones.boundary_polylines
+        """
+        return boundary_polylines(self.vertex_array, self.neighbour_table, self.label_regions(categories), self.pitch)
+    
+    def _edge_collection(self, segments: np.ndarray, color, linewidth: float, antialiased: bool) -> LineCollection:
+        """
+        One collection stroking all of the segments, chained into polylines so that the corners are joined. The
+        polylines are separated by nan rows within a single line, which the backends draw as one path with breaks
+        instead of a path element per polyline.
+        """
+        polylines = chain_segments(segments, self.pitch)
+        gap = np.full((1, 2), np.nan)
+        line = np.concatenate([part for polyline in polylines for part in (polyline, gap)][:-1]) if polylines else np.empty((0, 2))
+        return LineCollection(
+            [line],
+            colors=color,
+            linewidths=linewidth,
+            antialiaseds=antialiased,
+            capstyle='round',
+            joinstyle='round'
+        )
+    
+    def _cell_collection(self, ax: Axes, facecolors, edgecolor, **kwargs) -> PolyCollection:
+        """
+        One collection filling all of the hexagons. Cells of one size share a single hexagon path shifted to every
+        centre, which vector backends write once and reference per cell.
+        """
+        radii = self.radius_array
+        if len(radii) and np.all(radii == radii[0]):
+            return PolyCollection(
+                [radii[0] * POINTY_UNIT_VERTEXES],
+                offsets=self.centre_array,
+                offset_transform=ax.transData,
+                transform=AffineDeltaTransform(ax.transData),
+                facecolors=facecolors,
+                edgecolors=edgecolor,
+                **kwargs
+            )
+        return PolyCollection(self.vertex_array, facecolors=facecolors, edgecolors=edgecolor, **kwargs)
+
+    def _plot_edges(self, ax: Axes, pc: PlotConfig, categories: Optional[np.ndarray] = None) -> None:
+        """
+        Draw every edge once, as one collection for the grid and one for the borders between categories
+        """
+        edges = self.edge_set
+        borders = np.zeros(len(edges), dtype=bool) if categories is None else edges.borders(categories)
+        patch_props = pc.patch_props
+        ax.add_collection(self._edge_collection(edges.segments[~borders], pc.hex_edge_color, **patch_props), autolim=False)
+        if categories is not None:
+            ax.add_collection(self._edge_collection(
+                edges.segments[borders],
+                pc.zone_edge_color,
+                pc.zone_edge_width,
+                patch_props['antialiased']
+            ), autolim=False)
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Contours
+    # -----------------------------------------------------------------------------------------------------------------
+    @cached_property
+    def dual_triangles(self) -> np.ndarray:
+        """
+        Triangles (m, 3) of cell indices between neighbouring cell centres, see contours.dual_triangles
+        """
+        return dual_triangles(self.neighbour_table)
+    
+    def contour_lines(self, values: Optional[np.ndarray] = None, levels: Union[int, Sequence[float]] = 10) -> dict[float, list[np.ndarray]]:
+        """
+        Isolines of the values of the cells by marching triangles over the dual mesh of the cell centres
+        
+        Args:
+            values (np.ndarray, optional): Values of the cells in the order of HexCells, the values stored in the
+                cells if None
+            levels (int | Sequence[float]): The levels, or the number of equally spaced levels between the minimum
+                and the maximum
+        
+        Returns:
+            dict[float, list[np.ndarray]]: Polylines (k, 2) by level
+        """
+        values = self._field_values(values).astype(float)
+        return contour_lines(self.centre_array, self.dual_triangles, values, contour_levels(values, levels), self.pitch)
+    
+    def plot_contours(
+            self,
+            pc: PlotConfig,
+            ax: Optional[Axes] = None,
+            values: Optional[np.ndarray] = None,
+            levels: Union[int, Sequence[float]] = 10,
+            colors: Union[str, Sequence, None] = None,
+            global_style: bool = True
+        ) -> LineCollection:
+        """
+        Draw the isolines of the values as one LineCollection, e.g. over the hexagons of plot_hex:
+        
+            ax = lattice.plot_hex(pc, values=power)
+            lattice.plot_contours(pc, ax, values=power, levels=[0.8, 1.0, 1.2])
+        
+        For an animation, keep the collection and pass the polylines of every frame to its set_segments.
+        
+        Args:
+            pc (PlotConfig): Plot configuration, the lines are drawn with contour_color and contour_width
+            ax (Axes, optional): Target axes, a new one is set up as in plot_hex if None
+            values, levels: See contour_lines
+            colors (str | Sequence, optional): One colour for all lines, e.g. 'red' or (1, 0, 0), or a colour per
+                level instead of pc.contour_color
+            global_style (bool): See plot_hex, only used when a new axes is set up
+        """
+        if ax is None:
+            ax = self._setup_ax(pc, ax, global_style)
+        lines = self.contour_lines(values, levels)
+        colors = pc.contour_color if colors is None else colors
+        # An RGB(A) tuple is one colour even when there are three or four levels
+        if not is_color_like(colors) and len(colors) == len(lines):
+            colors = [color for color, polylines in zip(colors, lines.values()) for _ in polylines]
+        collection = LineCollection(
+            [polyline for polylines in lines.values() for polyline in polylines],
+            colors=colors,
+            linewidths=pc.contour_width,
+            capstyle='round',
+            joinstyle='round'
+        )
+        ax.add_collection(collection)
+        return collection
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Tables
+    # -----------------------------------------------------------------------------------------------------------------
+    # pandas and pyarrow are optional, frames imports them on first use
+    def to_frame(self, fields: Optional[Sequence[str]] = None, coordinates: Sequence[str] = ('axial', 'ring', 'cartesian'), index: bool = True):
+        """
+        A pandas DataFrame of the coordinates and the fields, indexed by the axial coordinates, see frames.to_frame
+        """
+        from .frames import to_frame
+        return to_frame(self, fields, coordinates, index)
+
+    @staticmethod
+    def from_frame(frame, pitch: float = 1, value: Optional[str] = None, fields: Optional[Sequence[str]] = None, coordinates: str = 'axial') -> 'HexLattice':
+        """
+        A lattice of the rows of a pandas DataFrame, see frames.from_frame
+        """
+        from .frames import from_frame
+        return from_frame(frame, pitch, value, fields, coordinates)
+
+    def to_arrow(self, fields: Optional[Sequence[str]] = None, coordinates: Sequence[str] = ('axial', 'ring', 'cartesian')):
+        """
+        A pyarrow Table of the coordinates and the fields, see frames.to_arrow
+        """
+        from .frames import to_arrow
+        return to_arrow(self, fields, coordinates)
+
+    @staticmethod
+    def from_arrow(table, pitch: float = 1, value: Optional[str] = None, fields: Optional[Sequence[str]] = None, coordinates: str = 'axial') -> 'HexLattice':
+        """
+        A lattice of the rows of a pyarrow Table, see frames.from_arrow
+        """
+        from .frames import from_arrow
+        return from_arrow(table, pitch, value, fields, coordinates)
+
+    def join_frame(self, table, columns: Optional[Sequence[str]] = None, coordinates: str = 'axial', prefix: str = '', fill_value: float = np.nan) -> dict[str, np.ndarray]:
+        """
+        Store columns of an external DataFrame or Arrow table as fields, matching rows to cells by their coordinates,
+        see frames.join_frame
+        """
+        from .frames import join_frame
+        return join_frame(self, table, columns, coordinates, prefix, fill_value)
+
+    def _plot_cells(
+            self,
+            ax: Axes,
+            pc: PlotConfig,
+            cells_func: Callable[[Axes, Sequence], None],
+            text_mode: Literal['value', 'text'],
+            timer: Optional[RenderTimer] = None,
+            values: Optional[np.ndarray] = None,
+            categories: Optional[CategoricalField] = None
+        ) -> Axes:
+        timer = resolve_timer(timer)
+        with timer.stage('colour mapping'):
+            if categories is not None:
+                colors      = categories.rgba()
+                # Labels and text colours are looked up per category like the colours, not computed per cell
+                labels      = np.array(categories.names)[categories.codes]
+                text_colors = np.array([pc.text_color_func(color) for color in categories.palette])[categories.codes]
+            elif text_mode == 'value':
+                if values is None:
+                    normed_values = self.normed_value_list
+                    labels        = [round(hex_cell.value, 2) for hex_cell in self.HexCells]
+                else:
+                    values        = self._field_values(values)
+                    normed_values = (values - np.min(values)) / (np.max(values) - np.min(values))
+                    labels        = [round(value, 2) for value in values.tolist()]
+                colors      = pc.color_map(normed_values)
+                text_colors = [pc.text_color_func(color) for color in colors]
             elif text_mode == 'text':
-                color = pc.hex_face_color
-                label = hex_cell.text
-                text_color = pc.text_color
+                colors      = [pc.hex_face_color] * len(self.HexCells)
+                labels      = [hex_cell.text for hex_cell in self.HexCells]
+                text_colors = [pc.text_color] * len(self.HexCells)
             else:
                 raise TypeError('Wrong Plot Type!')
 
-            patch = shape_func(hex_cell, color, pc.hex_edge_color)
-            ax.add_patch(patch)
-            ax.text(
-                hex_cell.real_cartesian.x,
-                hex_cell.real_cartesian.y,
-                label,
-                ha='center',
-                va='center',
-                fontsize=pc.text_size,
-                color=text_color
-            )
-        ax.set_title(pc.image_name)
+        with timer.stage('artist creation'):
+            cells_func(ax, colors)
+            if pc.show_text:
+                text_props = pc.text_props
+                for (x, y), label, text_color in zip(self.centre_array.tolist(), labels, text_colors):
+                    ax.text(x, y, label, ha='center', va='center', fontsize=pc.text_size, color=text_color, **text_props)
+            if categories is not None and pc.show_legend:
+                self._plot_legend(ax, pc, categories)
+            ax.set_title(pc.image_name, **pc.title_props)
         return ax
 
-    def _setup_ax(self, pc: PlotConfig, ax: Optional[Axes]) -> Axes:
-        pc.set_plot_config()
+    def _plot_legend(self, ax: Axes, pc: PlotConfig, categories: CategoricalField) -> None:
+        legend = ax.legend(
+            handles=categories.legend_handles(edgecolor=pc.hex_edge_color, **pc.patch_props),
+            # The corners of a hexagonal core are empty
+            loc='upper right',
+            frameon=False,
+            fontsize=pc.text_size
+        )
+        for text in legend.get_texts():
+            text.set(**pc.text_props)
+
+    def _setup_ax(self, pc: PlotConfig, ax: Optional[Axes], global_style: bool = True) -> Axes:
+        if global_style:
+            pc.set_plot_config()
         if ax is None:
+            if not global_style:
+                raise ValueError('An axes is required when the global pyplot style is not used.')
             ax = plt.subplot()
-        all_x = [[v[0] for v in cell.vertexes_pointy] for cell in self.HexCells]
-        all_z = [[v[1] for v in cell.vertexes_pointy] for cell in self.HexCells]
-        ax.set_xlim((np.min(all_x) - pc.figure_expand, np.max(all_x) + pc.figure_expand))
-        ax.set_ylim((np.min(all_z) - pc.figure_expand, np.max(all_z) + pc.figure_expand))
+        vertexes = self.vertex_array
+        ax.set_xlim((np.min(vertexes[..., 0]) - pc.figure_expand, np.max(vertexes[..., 0]) + pc.figure_expand))
+        ax.set_ylim((np.min(vertexes[..., 1]) - pc.figure_expand, np.max(vertexes[..., 1]) + pc.figure_expand))
         ax.set_aspect('equal')
         ax.axis('off')
         return ax
 
-    def plot_hex(self, pc: PlotConfig, ax: Axes = None) -> Axes:
-        ax = self._setup_ax(pc, ax)
+    def plot_hex(
+            self,
+            pc: PlotConfig,
+            ax: Axes = None,
+            timer: Optional[RenderTimer] = None,
+            global_style: bool = True,
+            values: Optional[np.ndarray] = None,
+            zones: Optional[np.ndarray] = None,
+            categories: Union[str, CategoricalField, None] = None
+        ) -> Axes:
+        """
+        Plot the cells as hexagons, labelled with their text if every cell has one and with their value otherwise.
 
-        def polygon_func(cell: HexCell, facecolor, edgecolor):
-            return Polygon(
-                cell.vertexes_pointy,
-                closed=True,
-                facecolor=facecolor,
-                edgecolor=edgecolor
-            )
+        Args:
+            pc (PlotConfig): Plot configuration
+            ax (Axes, optional): Target axes, a new pyplot subplot is created if None
+            timer (RenderTimer, optional): Records the time and allocations of the 'setup', 'colour mapping' and
+                'artist creation' stages
+            global_style (bool): Apply pc.set_plot_config to the global plt.style and mpl.rcParams. With False the
+                style is only set on the artists, which requires `ax`; see also `render`
+            values (np.ndarray, optional): Values of the cells in the order of HexCells, plotted instead of the
+                values stored in the cells. The cells are then coloured and labelled by value even if they have texts
+            zones (np.ndarray, optional): Category of every cell, e.g. a material id. The borders between categories
+                are drawn with zone_edge_color and zone_edge_width, and the edges are merged as with pc.merge_edges
+            categories (str | CategoricalField, optional): Colour the cells by the palette of a categorical field, or
+                of the field of that name, label them by category name and add a legend with pc.show_legend
+        """
+        with profile_render(f'plot_hex-{pc.image_name}'):
+            with resolve_timer(timer).stage('setup'):
+                ax = self._setup_ax(pc, ax, global_style)
 
-        text_mode = 'text' if all(cell.text is not None for cell in self.HexCells) else 'value'
-        return self._plot_cells(ax, pc, polygon_func, text_mode)
+            # Merged edges are stroked once by _plot_edges instead of once by each of the two cells sharing them
+            merge_edges = pc.merge_edges or zones is not None
 
-    def plot_circle(self, pc: PlotConfig, ax: Axes = None, plot_type: Literal['value', 'text'] = 'value') -> Axes:
-        ax = self._setup_ax(pc, ax)
+            def polygons_func(ax: Axes, facecolors) -> None:
+                edgecolor = 'none' if merge_edges else pc.hex_edge_color
+                ax.add_collection(self._cell_collection(ax, facecolors, edgecolor, **pc.patch_props), autolim=False)
 
-        def circle_func(cell: HexCell, facecolor, edgecolor):
-            return Circle(
-                cell.real_cartesian.as_tuple(),
-                radius=cell.radius * np.sqrt(3) / 2,
-                facecolor=facecolor,
-                edgecolor=edgecolor
-            )
+            text_mode = 'text' if values is None and all(cell.text is not None for cell in self.HexCells) else 'value'
+            ax = self._plot_cells(ax, pc, polygons_func, text_mode, timer, values, self._categorical_field(categories))
+            if merge_edges:
+                with resolve_timer(timer).stage('artist creation'):
+                    self._plot_edges(ax, pc, zones)
+            return ax
 
-        return self._plot_cells(ax, pc, circle_func, plot_type)
+    def plot_circle(
+            self,
+            pc: PlotConfig,
+            ax: Axes = None,
+            plot_type: Literal['value', 'text'] = 'value',
+            timer: Optional[RenderTimer] = None,
+            global_style: bool = True,
+            values: Optional[np.ndarray] = None,
+            categories: Union[str, CategoricalField, None] = None
+        ) -> Axes:
+        """
+        Plot the cells as circles inscribed in their hexagons.
 
-        
+        Args:
+            pc (PlotConfig): Plot configuration
+            ax (Axes, optional): Target axes, a new pyplot subplot is created if None
+            plot_type ('value' | 'text'): Colour and label the cells by their value or by their text
+            timer (RenderTimer, optional): Records the time and allocations of the 'setup', 'colour mapping' and
+                'artist creation' stages
+            global_style (bool): Apply pc.set_plot_config to the global plt.style and mpl.rcParams. With False the
+                style is only set on the artists, which requires `ax`; see also `render`
+            values (np.ndarray, optional): Values of the cells in the order of HexCells, plotted instead of the
+                values stored in the cells
+            categories (str | CategoricalField, optional): Colour the cells by category instead, see plot_hex
+        """
+        with profile_render(f'plot_circle-{pc.image_name}'):
+            with resolve_timer(timer).stage('setup'):
+                ax = self._setup_ax(pc, ax, global_style)
+
+            def circles_func(ax: Axes, facecolors) -> None:
+                # One collection of all circles, sized in data units like the hexagons they are inscribed in
+                diameters = self.radius_array * np.sqrt(3)
+                ax.add_collection(EllipseCollection(
+                    diameters,
+                    diameters,
+                    np.zeros(len(diameters)),
+                    units='xy',
+                    offsets=self.centre_array,
+                    offset_transform=ax.transData,
+                    facecolors=facecolors,
+                    edgecolors=pc.hex_edge_color,
+                    **pc.patch_props
+                ), autolim=False)
+
+            return self._plot_cells(ax, pc, circles_func, plot_type, timer, values, self._categorical_field(categories))
+
+    def plot_categories(
+            self,
+            pc: PlotConfig,
+            categories: Union[str, CategoricalField],
+            ax: Axes = None,
+            shape: Literal['hex', 'circle'] = 'hex',
+            timer: Optional[RenderTimer] = None,
+            global_style: bool = True,
+            zones: bool = False
+        ) -> Axes:
+        """
+        Plot a categorical field, e.g. a material map, with a legend of its categories
+
+        Args:
+            categories (str | CategoricalField): The field, or the name of a field added with add_field
+            zones (bool): Emphasize the borders between categories, hexagons only
+            See plot_hex for the other arguments
+        """
+        categories = self._categorical_field(categories)
+        if shape == 'hex':
+            return self.plot_hex(pc, ax, timer, global_style, zones=categories.codes if zones else None, categories=categories)
+        return self.plot_circle(pc, ax, timer=timer, global_style=global_style, categories=categories)
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Rendering
+    # -----------------------------------------------------------------------------------------------------------------
+    def render(
+            self,
+            pc: PlotConfig,
+            shape: Literal['hex', 'circle'] = 'hex',
+            plot_type: Literal['value', 'text'] = 'value',
+            timer: Optional[RenderTimer] = None,
+            values: Optional[np.ndarray] = None,
+            zones: Optional[np.ndarray] = None,
+            categories: Union[str, CategoricalField, None] = None
+        ) -> Figure:
+        """
+        Plot the lattice on a new figure with its own Agg canvas. Neither pyplot nor the global rcParams are touched,
+        so several threads can render at once; the figure is freed with its last reference, no plt.close is needed.
+
+        Args:
+            pc (PlotConfig): Plot configuration
+            shape ('hex' | 'circle'): Plot with plot_hex or plot_circle
+            plot_type ('value' | 'text'): Colour and label the circles by their value or by their text. Hexagons
+                choose by themselves, see plot_hex
+            values (np.ndarray, optional): Values of the cells plotted instead of the values stored in the cells. As
+                the cells are left untouched, threads can render different values on one shared lattice
+            zones (np.ndarray, optional): Category of every cell whose borders are emphasized, hexagons only, see
+                plot_hex
+            categories (str | CategoricalField, optional): Colour the cells by category, see plot_hex
+
+        Raises:
+            ValueError: If the shape is invalid
+        """
+        fig = pc.new_figure()
+        ax = fig.add_subplot()
+        if shape == 'hex':
+            self.plot_hex(pc, ax, timer, global_style=False, values=values, zones=zones, categories=categories)
+        elif shape == 'circle':
+            self.plot_circle(pc, ax, plot_type, timer, global_style=False, values=values, categories=categories)
+        else:
+            raise ValueError(f'Invalid shape \'{shape}\'. The valid shapes are \'hex\' and \'circle\'.')
+        return fig
+
+    def export(
+            self,
+            pc: PlotConfig,
+            shape: Literal['hex', 'circle'] = 'hex',
+            plot_type: Literal['value', 'text'] = 'value',
+            timer: Optional[RenderTimer] = None,
+            cache: Optional[RenderCache] = None,
+            values: Optional[np.ndarray] = None,
+            zones: Optional[np.ndarray] = None,
+            categories: Union[str, CategoricalField, None] = None
+        ) -> Path:
+        """
+        Render the lattice without pyplot (see `render`) and save it to pc.image_path
+
+        Args:
+            cache (RenderCache, optional): Copy the image from the cache if the same lattice, values and PlotConfig
+                were rendered before, without invoking matplotlib; otherwise render and add the image to the cache
+            values (np.ndarray, optional): Values of the cells plotted instead of the values stored in the cells
+            zones (np.ndarray, optional): Category of every cell whose borders are emphasized, see plot_hex
+            categories (str | CategoricalField, optional): Colour the cells by category, see plot_hex
+
+        Returns:
+            Path: pc.image_path
+        """
+        categories = self._categorical_field(categories)
+        if cache is not None:
+            key = cache.key(self, pc, shape, plot_type, values, zones, categories)
+            if cache.fetch(key, pc.image_type, pc.image_path):
+                return pc.image_path
+        path = pc.save_figure(self.render(pc, shape, plot_type, timer, values, zones, categories), timer)
+        if cache is not None:
+            cache.put(key, pc.image_type, path)
+        return path
@@ -0,0 +1,265 @@
+from typing import Literal, Optional, Sequence, Union
+
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+
+from .coordinates import AbstractCoordinate, AxialCoordinate
+from .hex_lattice import CellSelector, HexLattice
+from .plot_config import PlotConfig
+from .profiling import RenderTimer
+from .small_multiples import plot_grid
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Hex-Z Lattice
+# ---------------------------------------------------------------------------------------------------------------------
+class HexZLattice:
+    """
+    A stack of axial planes over one 2D HexLattice. The cells exist once, in the 2D lattice; the fields are arrays
+    (n_planes, n_cells) whose columns follow lattice.HexCells and whose rows go upwards through the planes.
+
+    Args:
+        lattice (HexLattice): The geometry shared by all planes
+        plane_boundaries (Sequence[float]): The n_planes + 1 strictly increasing heights bounding the planes
+
+    Raises:
+        ValueError: If there is no plane or the boundaries are not strictly increasing
+
+    Example:
+        core = HexZLattice(lattice, np.linspace(0, 160, 7))
+        core.add_field('flux', flux, order='cell')       # six axial nodes per cell, cell after cell
+        lattice.export(pc, values=core.average('flux'))
+        core.render_plane(pc, 'flux', core.plane_at(81.3))
+    """
+
+    def __init__(self, lattice: HexLattice, plane_boundaries: Sequence[float]) -> None:
+        boundaries = np.asarray(plane_boundaries, dtype=float)
+        if boundaries.ndim != 1 or len(boundaries) < 2:
+            raise ValueError('At least two plane boundaries are required.')
+        if np.any(np.diff(boundaries) <= 0):
+            raise ValueError('The plane boundaries must be strictly increasing.')
+        self.lattice = lattice
+        self.plane_boundaries = boundaries
+        self.fields: dict[str, np.ndarray] = dict()
+
+    @staticmethod
+    def uniform(lattice: HexLattice, n_planes: int, height: float, bottom: float = 0) -> 'HexZLattice':
+        """
+        n_planes planes of equal height from bottom to bottom + height
+        """
+        return HexZLattice(lattice, np.linspace(bottom, bottom + height, n_planes + 1))
+
+    @property
+    def n_planes(self) -> int:
+        return len(self.plane_boundaries) - 1
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.lattice.HexCells)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.n_planes, self.n_cells
+
+    @property
+    def plane_heights(self) -> np.ndarray:
+        return np.diff(self.plane_boundaries)
+
+    @property
+    def plane_centres(self) -> np.ndarray:
+        return (self.plane_boundaries[:-1] + self.plane_boundaries[1:]) / 2
+
+    def plane_at(self, z: Union[float, np.ndarray]) -> Union[int, np.ndarray]:
+        """
+        Index of the plane containing the height z, planes include their lower boundary
+
+        Raises:
+            ValueError: If a height is outside of the planes
+        """
+        z_array = np.asarray(z, dtype=float)
+        if np.any((z_array < self.plane_boundaries[0]) | (z_array > self.plane_boundaries[-1])):
+            raise ValueError(f'The heights must be in [{self.plane_boundaries[0]}, {self.plane_boundaries[-1]}].')
+        planes = np.minimum(np.searchsorted(self.plane_boundaries, z_array, side='right') - 1, self.n_planes - 1)
+        return int(planes) if planes.ndim == 0 else planes
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Fields
+    # -----------------------------------------------------------------------------------------------------------------
+    def add_field(self, name: str, values: np.ndarray, order: Literal['plane', 'cell'] = 'plane') -> np.ndarray:
+        """
+        Store a field of the lattice
+
+        Args:
+            name (str): Name of the field
+            values (np.ndarray): (n_planes, n_cells), or flat with n_planes * n_cells values
+            order ('plane' | 'cell'): Order of flat values: all cells of a plane after each other, or all planes of
+                a cell after each other, as in a list of nodes sorted by cell
+
+        Returns:
+            np.ndarray: The stored (n_planes, n_cells) float array
+
+        Raises:
+            ValueError: If the number of values does not match the lattice
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1 and values.size == self.n_planes * self.n_cells:
+            values = values.reshape(self.shape) if order == 'plane' else values.reshape(self.n_cells, self.n_planes).T
+        elif order == 'cell' and values.shape == (self.n_cells, self.n_planes):
+            values = values.T
+        if values.shape != self.shape:
+            raise ValueError(f'Expected a field of shape {self.shape}, received {values.shape}.')
+        self.fields[name] = np.ascontiguousarray(values)
+        return self.fields[name]
+
+    def field(self, name: str) -> np.ndarray:
+        """
+        Raises:
+            KeyError: If there is no field of that name
+        """
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise KeyError(f'No field {name!r}, the fields are {list(self.fields)}.') from None
+
+    def _field(self, field: Union[str, np.ndarray]) -> np.ndarray:
+        if isinstance(field, str):
+            return self.field(field)
+        field = np.asarray(field, dtype=float)
+        if field.shape != self.shape:
+            raise ValueError(f'Expected a field of shape {self.shape}, received {field.shape}.')
+        return field
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Axial Reductions
+    # -----------------------------------------------------------------------------------------------------------------
+    def axial_weights(self, z_range: Optional[tuple[float, float]] = None) -> np.ndarray:
+        """
+        Length (n_planes,) of every plane inside z_range, all of the plane heights if None
+        """
+        if z_range is None:
+            return self.plane_heights
+        z_low, z_high = z_range
+        if z_low > z_high:
+            raise ValueError(f'Invalid axial range {z_range}.')
+        low = np.maximum(self.plane_boundaries[:-1], z_low)
+        high = np.minimum(self.plane_boundaries[1:], z_high)
+        return np.clip(high - low, 0, None)
+
+    def integrate(self, field: Union[str, np.ndarray], z_range: Optional[tuple[float, float]] = None) -> np.ndarray:
+        """
+        Axial integral (n_cells,) of a field over z_range, the planes cut by the range contributing in proportion
+        """
+        return self.axial_weights(z_range) @ self._field(field)
+
+    def average(self, field: Union[str, np.ndarray], z_range: Optional[tuple[float, float]] = None) -> np.ndarray:
+        """
+        Height weighted axial average (n_cells,) of a field over z_range
+
+        Raises:
+            ValueError: If z_range does not overlap the planes
+        """
+        weights = self.axial_weights(z_range)
+        if weights.sum() <= 0:
+            raise ValueError(f'The axial range {z_range} does not overlap the planes.')
+        return weights @ self._field(field) / weights.sum()
+
+    def axial_profile(self, field: Union[str, np.ndarray], cells: CellSelector) -> np.ndarray:
+        """
+        Values (n_planes,) of a field along one cell, or (n_planes, k) along several cells
+        """
+        indices = self.lattice._cell_indices(cells)
+        profile = self._field(field)[:, indices]
+        single = isinstance(cells, (int, np.integer, AxialCoordinate, AbstractCoordinate))
+        return profile[:, 0] if single else profile
+
+    def peak_plane(self, field: Union[str, np.ndarray]) -> np.ndarray:
+        """
+        Index (n_cells,) of the plane where every cell reaches its maximum, the lowest plane on ties
+        """
+        return np.argmax(self._field(field), axis=0)
+
+    def peak(self, field: Union[str, np.ndarray]) -> tuple[int, int, float]:
+        """
+        The maximum of a field as (plane, cell, value)
+        """
+        values = self._field(field)
+        plane, cell = np.unravel_index(np.argmax(values), values.shape)
+        return int(plane), int(cell), float(values[plane, cell])
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Plot
+    # -----------------------------------------------------------------------------------------------------------------
+    def _map(self, field: Union[str, np.ndarray], plane: Union[int, Literal['integrated', 'average']], z_range) -> np.ndarray:
+        if plane == 'integrated':
+            return self.integrate(field, z_range)
+        if plane == 'average':
+            return self.average(field, z_range)
+        if not -self.n_planes <= plane < self.n_planes:
+            raise IndexError(f'Plane {plane} is out of range for {self.n_planes} planes.')
+        return self._field(field)[plane]
+
+    def plot_plane(
+            self,
+            pc: PlotConfig,
+            field: Union[str, np.ndarray],
+            plane: Union[int, Literal['integrated', 'average']],
+            shape: Literal['hex', 'circle'] = 'hex',
+            ax: Optional[Axes] = None,
+            z_range: Optional[tuple[float, float]] = None,
+            timer: Optional[RenderTimer] = None,
+            global_style: bool = True
+        ) -> Axes:
+        """
+        Plot one plane of a field, or its axial integral or average over z_range, on the shared 2D lattice.
+        See HexLattice.plot_hex for the other arguments.
+        """
+        values = self._map(field, plane, z_range)
+        if shape == 'hex':
+            return self.lattice.plot_hex(pc, ax, timer, global_style, values=values)
+        return self.lattice.plot_circle(pc, ax, 'value', timer, global_style, values=values)
+
+    def plot_integrated(
+            self,
+            pc: PlotConfig,
+            field: Union[str, np.ndarray],
+            average: bool = False,
+            shape: Literal['hex', 'circle'] = 'hex',
+            ax: Optional[Axes] = None,
+            z_range: Optional[tuple[float, float]] = None,
+            timer: Optional[RenderTimer] = None,
+            global_style: bool = True
+        ) -> Axes:
+        """
+        Plot the axial integral of a field, or its average with `average`, see plot_plane
+        """
+        return self.plot_plane(pc, field, 'average' if average else 'integrated', shape, ax, z_range, timer, global_style)
+
+    def render_plane(
+            self,
+            pc: PlotConfig,
+            field: Union[str, np.ndarray],
+            plane: Union[int, Literal['integrated', 'average']],
+            shape: Literal['hex', 'circle'] = 'hex',
+            z_range: Optional[tuple[float, float]] = None,
+            timer: Optional[RenderTimer] = None
+        ) -> Figure:
+        """
+        The pyplot-free counterpart of plot_plane, see HexLattice.render
+        """
+        return self.lattice.render(pc, shape, 'value', timer, values=self._map(field, plane, z_range))
+
+    def render_planes(
+            self,
+            pc: PlotConfig,
+            field: Union[str, np.ndarray],
+            ncols: Optional[int] = None,
+            norm: Literal['common', 'row'] = 'common',
+            timer: Optional[RenderTimer] = None
+        ) -> Figure:
+        """
+        All planes of a field side by side from the top plane down, on one colour scale by default, see
+        small_multiples.plot_grid
+        """
+        values = self._field(field)[::-1]
+        titles = [f'z = {centre:g}' for centre in self.plane_centres[::-1].tolist()]
+        return plot_grid(self.lattice, pc, values, ncols, titles, norm, timer=timer)
@@ -0,0 +1,531 @@
+"""
+A pipelined batch of renders: solver output files are read, fields are computed from them and the maps are rendered
+and saved, every stage overlapping the others. Reader threads parse the files of the cases, one thread evaluates
+the field expressions with numpy and a pool of processes renders the images through HexLattice.export. Bounded
+queues between the stages hold the readers back when the computation lags, and the computation when the renderers
+lag, so that memory stays bounded whatever the number of cases.
+
+A job is a JSON file, paths are relative to it:
+
+    {
+        "geometry": {"rings": 16, "pitch": 5.8929, "order": "ring"},
+        "read": {"column": 0, "skip_rows": 1, "scale": 0.98121},
+        "cases": [
+            {"name": "zone", "inputs": {"v1": "data/ver1_SA.csv", "v2": "data/ver2.5_SA.csv"}},
+            {"name": "nodal", "inputs": {"v1": {"path": "data/ver1_XY.csv", "column": 1, "every": 6}, "v2": ...}}
+        ],
+        "fields": {"flux_ratio": "v2 / v1", "flux_diff": "100 * (flux_ratio - 1)"},
+        "plot": {"image_root_dir": "plot/EBR-II", "image_type": "svg", "figure_dpi": 400, "text_usetex": false},
+        "readers": 4,
+        "renderers": 8,
+        "queue_size": 8
+    }
+
+and is run with
+
+    python -m HexLattice.pipeline job.json
+
+which saves one image per case and field, named <case>_<field>.
+"""
+import argparse
+import ast
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from functools import partial
+from typing import Callable, Literal, Optional, Union
+
+import numpy as np
+
+from .coordinates import RingCoordinate
+from .hex_lattice import HexCell, HexLattice
+from .plot_config import PlotConfig
+
+# Functions available to the field expressions, element-wise or reducing over the cells
+EXPRESSION_FUNCTIONS = {
+    name: getattr(np, name) for name in (
+        'abs', 'sqrt', 'exp', 'log', 'log10', 'minimum', 'maximum', 'where', 'clip', 'isnan',
+        'nan_to_num', 'mean', 'sum', 'min', 'max', 'nanmean', 'nansum', 'nanmin', 'nanmax'
+    )
+}
+
+_EXPRESSION_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.BoolOp, ast.IfExp, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.operator, ast.unaryop, ast.cmpop, ast.boolop
+)
+
+class PipelineError(RuntimeError):
+    """
+    Some cases failed, the others were rendered
+
+    Attributes:
+        stats (PipelineStats): Statistics of the whole run, with the errors
+    """
+
+    def __init__(self, stats: 'PipelineStats') -> None:
+        super().__init__(f'{len(stats.errors)} of the jobs failed: ' + '; '.join(f'{name}: {error}' for name, error in stats.errors))
+        self.stats = stats
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Job Description
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class InputSpec:
+    """
+    One column of numbers of a text file, one value per cell in the order of the geometry, or a .npy array
+
+    Attributes:
+        path (Path): The file
+        column (int): Index of the column of a text file
+        skip_rows (int): Number of header lines
+        every (int): Keep every `every`th row, e.g. one axial node out of six
+        offset (int): Index of the first row kept, after the header
+        scale (float): Factor applied to the values, e.g. a normalization
+        delimiter (str): Column delimiter of a text file
+    """
+    path:       Path
+    column:     int     = 0
+    skip_rows:  int     = 0
+    every:      int     = 1
+    offset:     int     = 0
+    scale:      float   = 1.
+    delimiter:  str     = ','
+
+    def read(self) -> np.ndarray:
+        if self.path.suffix == '.npy':
+            values = np.load(self.path)
+        else:
+            values = np.loadtxt(self.path, delimiter=self.delimiter, skiprows=self.skip_rows, usecols=self.column, ndmin=1)
+        return np.asarray(values, dtype=float)[self.offset::self.every] * self.scale
+
+
+@dataclass
+class CaseSpec:
+    """
+    A case of the job, whose inputs are named by the variables of the field expressions
+    """
+    name:   str
+    inputs: dict[str, InputSpec]
+
+
+@dataclass
+class PipelineJob:
+    """
+    A batch of renders, see the module documentation for its JSON form
+
+    Attributes:
+        cases (list[CaseSpec]): The cases, in the order they are read
+        fields (dict[str, str]): Expressions of the rendered fields by name. They combine the inputs of a case and
+            the fields defined before them with arithmetic, comparisons and EXPRESSION_FUNCTIONS
+        geometry (dict): The lattice: all cells up to ring `rings`, with `pitch`, in `order` 'ring' (ring after
+            ring, counterclockwise) or 'axial' (as RingCoordinate.get_all_coord_by_r)
+        plot (dict): Keyword arguments of the PlotConfig of every image, see PlotConfig.from_dict
+        shape ('hex' | 'circle'): Shape of the cells
+        readers (int): Number of reader threads
+        renderers (int): Number of render processes
+        queue_size (int): Maximal number of read cases waiting for the computation, and of images waiting for a
+            renderer
+        processes (bool): Render in processes, or in threads of this process, which starts faster for small jobs
+    """
+    cases:      list[CaseSpec]
+    fields:     dict[str, str]
+    geometry:   dict
+    plot:       dict                        = field(default_factory=dict)
+    shape:      Literal['hex', 'circle']    = 'hex'
+    readers:    int                         = 2
+    renderers:  int                         = os.cpu_count() or 1
+    queue_size: int                         = 8
+    processes:  bool                        = True
+
+    @staticmethod
+    def from_dict(config: dict, base_dir: Union[str, Path] = '.') -> 'PipelineJob':
+        """
+        Parse a job description, resolving the relative paths against base_dir
+
+        Raises:
+            KeyError: If a required entry is missing
+            ValueError: If a field expression is invalid or the job has no case or no field
+        """
+        base_dir = Path(base_dir)
+        config = dict(config)
+        defaults = config.pop('read', dict())
+
+        def input_spec(spec: Union[str, dict]) -> InputSpec:
+            spec = {'path': spec} if isinstance(spec, str) else spec
+            spec = {**defaults, **spec}
+            spec['path'] = base_dir / spec['path']
+            return InputSpec(**spec)
+
+        cases = [CaseSpec(str(case['name']), {name: input_spec(spec) for name, spec in case['inputs'].items()}) for case in config.pop('cases')]
+        plot = dict(config.pop('plot', dict()))
+        plot['image_root_dir'] = str(base_dir / plot.get('image_root_dir', 'plot'))
+        job = PipelineJob(cases, dict(config.pop('fields')), dict(config.pop('geometry')), plot, **config)
+        job.validate()
+        return job
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> 'PipelineJob':
+        """
+        Read a job description from a JSON file
+        """
+        path = Path(path)
+        return PipelineJob.from_dict(json.loads(path.read_text()), path.parent)
+
+    def validate(self) -> None:
+        """
+        Raises:
+            ValueError: If the job has no case or no field, a case misses an input of the expressions, an
+                expression is invalid or the plot options are not those of PlotConfig
+        """
+        if not self.cases:
+            raise ValueError('The job has no case.')
+        if not self.fields:
+            raise ValueError('The job has no field.')
+        if min(self.readers, self.renderers, self.queue_size) < 1:
+            raise ValueError('At least one reader, one renderer and a queue of one are required.')
+        try:
+            PlotConfig.from_dict({**self.plot, 'image_name': 'validate'})
+        except TypeError as e:
+            raise ValueError(f'Invalid plot options: {e}.') from None
+        for case in self.cases:
+            known = set(case.inputs)
+            for name, expression in self.fields.items():
+                missing = _expression_names(expression) - known - set(EXPRESSION_FUNCTIONS)
+                if missing:
+                    raise ValueError(f'The expression {expression!r} of {name!r} uses {sorted(missing)}, which case {case.name!r} does not define.')
+                known.add(name)
+
+
+def _expression_names(expression: str) -> set[str]:
+    """
+    The variables of a field expression
+
+    Raises:
+        ValueError: If the expression is not a plain arithmetic expression of variables and EXPRESSION_FUNCTIONS
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f'Invalid expression {expression!r}: {e.msg}.') from None
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _EXPRESSION_NODES):
+            raise ValueError(f'Invalid expression {expression!r}: {type(node).__name__} is not allowed.')
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in EXPRESSION_FUNCTIONS):
+            raise ValueError(f'Invalid expression {expression!r}: only the functions {sorted(EXPRESSION_FUNCTIONS)} can be called.')
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+    return names
+
+
+def evaluate_fields(fields: dict[str, str], inputs: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Evaluate the field expressions in order over whole arrays, every field joining the variables of the next ones
+    """
+    namespace = {**EXPRESSION_FUNCTIONS, **inputs}
+    res_dict = dict()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, expression in fields.items():
+            _expression_names(expression)
+            values = eval(compile(expression, f'<field {name}>', 'eval'), {'__builtins__': dict()}, namespace)
+            res_dict[name] = namespace[name] = np.asarray(values, dtype=float)
+    return res_dict
+
+
+def build_lattice(geometry: dict) -> HexLattice:
+    """
+    The lattice of a job geometry, see PipelineJob.geometry
+
+    Raises:
+        ValueError: If the order is invalid
+    """
+    coords = RingCoordinate.get_all_coord_by_r(geometry['rings'])
+    order = geometry.get('order', 'ring')
+    if order == 'ring':
+        coords = sorted(coords, key=lambda ring_coord: (ring_coord.r, ring_coord.k))
+    elif order != 'axial':
+        raise ValueError(f'Invalid order {order!r}. The valid orders are \'ring\' and \'axial\'.')
+    return HexLattice([HexCell(ring_coord) for ring_coord in coords], pitch=geometry.get('pitch', 1))
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Statistics
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class StageStats:
+    """
+    Counters of one stage of the pipeline
+
+    Attributes:
+        items (int): Items finished: cases read, cases computed or images rendered
+        failed (int): Items which raised an error
+        busy (float): Seconds spent working, summed over the threads or processes of the stage
+        blocked (float): Seconds spent waiting for the next stage to accept an item, the back-pressure
+    """
+    items:      int     = 0
+    failed:     int     = 0
+    busy:       float   = 0.
+    blocked:    float   = 0.
+
+
+@dataclass
+class PipelineStats:
+    """
+    A snapshot of the progress of a Pipeline
+
+    Attributes:
+        read (StageStats): Cases read
+        compute (StageStats): Cases whose fields were computed
+        render (StageStats): Images rendered and saved
+        elapsed (float): Seconds since the run started
+        errors (list[tuple[str, str]]): (case or image, error message) of every failure
+    """
+    read:       StageStats              = field(default_factory=StageStats)
+    compute:    StageStats              = field(default_factory=StageStats)
+    render:     StageStats              = field(default_factory=StageStats)
+    elapsed:    float                   = 0.
+    errors:     list[tuple[str, str]]   = field(default_factory=list)
+
+    @property
+    def images_per_second(self) -> float:
+        return self.render.items / self.elapsed if self.elapsed > 0 else 0.
+
+    def report(self) -> str:
+        """
+        One line per stage: items, failures, throughput, busy and blocked seconds
+        """
+        lines = list()
+        for name in ('read', 'compute', 'render'):
+            stage = getattr(self, name)
+            rate = stage.items / self.elapsed if self.elapsed > 0 else 0.
+            lines.append(f'{name:<8} {stage.items:6d} done {stage.failed:4d} failed {rate:9.2f}/s   busy {stage.busy:8.2f} s   blocked {stage.blocked:8.2f} s')
+        lines.append(f'elapsed  {self.elapsed:.2f} s')
+        return '\n'.join(lines)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Renderers
+# ---------------------------------------------------------------------------------------------------------------------
+# The lattice of a render process, built once by its initializer. Only the processes of the spawn pool set it, each
+# runs the renderers of a single pipeline; render threads share the lattice of their own Pipeline instead
+_RENDER_LATTICE: Optional[HexLattice] = None
+
+def _init_renderer(geometry: dict) -> None:
+    global _RENDER_LATTICE
+    _RENDER_LATTICE = build_lattice(geometry)
+    _RENDER_LATTICE.vertex_array
+
+
+def _render_image(lattice: HexLattice, config: dict, shape: str, values: np.ndarray) -> tuple[str, float]:
+    start = time.perf_counter()
+    path = lattice.export(PlotConfig.from_dict(config), shape, values=values)
+    return str(path), time.perf_counter() - start
+
+
+def _render_in_process(config: dict, shape: str, values: np.ndarray) -> tuple[str, float]:
+    return _render_image(_RENDER_LATTICE, config, shape, values)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Pipeline
+# ---------------------------------------------------------------------------------------------------------------------
+class Pipeline:
+    """
+    Run a PipelineJob with its stages overlapping. A failing case or image is recorded in the statistics and the
+    others go on.
+
+    Args:
+        job (PipelineJob): The job
+        log (Callable, optional): Called with the path of every saved image
+
+    Example:
+        pipeline = Pipeline(PipelineJob.load('jobs/ebr.json'))
+        threading.Thread(target=pipeline.run).start()
+        print(pipeline.stats.report())                        # progress, from any thread
+    """
+
+    def __init__(self, job: PipelineJob, log=None) -> None:
+        self.job = job
+        self.log = log
+        self.lattice = build_lattice(job.geometry)
+        self.n_cells = len(self.lattice.HexCells)
+        self._stats = PipelineStats()
+        self._lock = threading.Lock()
+        self._start: Optional[float] = None
+
+    @property
+    def stats(self) -> PipelineStats:
+        with self._lock:
+            stats = PipelineStats(
+                StageStats(**vars(self._stats.read)),
+                StageStats(**vars(self._stats.compute)),
+                StageStats(**vars(self._stats.render)),
+                self._stats.elapsed if self._start is None else time.perf_counter() - self._start,
+                list(self._stats.errors)
+            )
+        return stats
+
+    def _record(self, stage: str, busy: float = 0., blocked: float = 0., error: Optional[tuple[str, str]] = None) -> None:
+        with self._lock:
+            stage_stats = getattr(self._stats, stage)
+            stage_stats.busy += busy
+            stage_stats.blocked += blocked
+            if error is None:
+                stage_stats.items += 1
+            else:
+                stage_stats.failed += 1
+                self._stats.errors.append(error)
+
+    def _executor(self) -> tuple[Executor, Callable]:
+        """
+        The pool of renderers and the function rendering one image on it
+        """
+        if self.job.processes:
+            # Forking a process with running threads is unsafe, the renderers start from a fresh interpreter
+            return ProcessPoolExecutor(
+                self.job.renderers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_renderer,
+                initargs=(self.job.geometry,)
+            ), _render_in_process
+        self.lattice.vertex_array
+        return ThreadPoolExecutor(self.job.renderers, thread_name_prefix='pipeline-renderer'), partial(_render_image, self.lattice)
+
+    def run(self) -> PipelineStats:
+        """
+        Read, compute and render all cases
+
+        Returns:
+            PipelineStats: The final statistics
+
+        Raises:
+            PipelineError: If any case or image failed, after all the others were done
+        """
+        job = self.job
+        self._start = time.perf_counter()
+        cases: queue.Queue = queue.Queue()
+        for case in job.cases:
+            cases.put(case)
+        read: queue.Queue = queue.Queue(maxsize=job.queue_size)
+        readers = [threading.Thread(target=self._read, args=(cases, read), name=f'pipeline-reader-{i}', daemon=True) for i in range(job.readers)]
+        for reader in readers:
+            reader.start()
+
+        # At most queue_size images wait for a renderer, beyond those in the hands of the renderers
+        slots = threading.Semaphore(job.renderers + job.queue_size)
+        pending: list[Future] = list()
+        executor, render = self._executor()
+        with executor:
+            finished_readers = 0
+            while finished_readers < job.readers:
+                item = read.get()
+                if item is None:
+                    finished_readers += 1
+                    continue
+                for name, config, values in self._compute(*item):
+                    start = time.perf_counter()
+                    slots.acquire()
+                    self._record_blocked('compute', time.perf_counter() - start)
+                    future = executor.submit(render, config, job.shape, values)
+                    future.add_done_callback(lambda future, name=name: self._rendered(future, name, slots))
+                    pending.append(future)
+            for future in pending:
+                future.exception()
+        for reader in readers:
+            reader.join()
+
+        with self._lock:
+            self._stats.elapsed = time.perf_counter() - self._start
+            self._start = None
+        stats = self.stats
+        if stats.errors:
+            raise PipelineError(stats)
+        return stats
+
+    def _record_blocked(self, stage: str, blocked: float) -> None:
+        with self._lock:
+            getattr(self._stats, stage).blocked += blocked
+
+    def _read(self, cases: queue.Queue, read: queue.Queue) -> None:
+        while True:
+            try:
+                case = cases.get_nowait()
+            except queue.Empty:
+                break
+            start = time.perf_counter()
+            try:
+                inputs = {name: spec.read() for name, spec in case.inputs.items()}
+            except Exception as e:
+                self._record('read', time.perf_counter() - start, error=(case.name, f'{type(e).__name__}: {e}'))
+                continue
+            busy = time.perf_counter() - start
+            start = time.perf_counter()
+            read.put((case, inputs))
+            self._record('read', busy, time.perf_counter() - start)
+        read.put(None)
+
+    def _compute(self, case: CaseSpec, inputs: dict[str, np.ndarray]) -> list[tuple[str, dict, np.ndarray]]:
+        """
+        The images (name, plot configuration, values) of a case
+        """
+        start = time.perf_counter()
+        try:
+            for name, values in inputs.items():
+                if values.shape != (self.n_cells,):
+                    raise ValueError(f'Input {name!r} has {values.size} values, the lattice has {self.n_cells} cells.')
+            fields = evaluate_fields(self.job.fields, inputs)
+        except Exception as e:
+            self._record('compute', time.perf_counter() - start, error=(case.name, f'{type(e).__name__}: {e}'))
+            return list()
+        images = list()
+        for name, values in fields.items():
+            image_name = f'{case.name}_{name}'
+            values = np.broadcast_to(values, (self.n_cells,))
+            images.append((image_name, {**self.job.plot, 'image_name': image_name}, values))
+        self._record('compute', time.perf_counter() - start)
+        return images
+
+    def _rendered(self, future: Future, name: str, slots: threading.Semaphore) -> None:
+        slots.release()
+        error = future.exception()
+        if error is not None:
+            self._record('render', error=(name, f'{type(error).__name__}: {error}'))
+            return
+        path, busy = future.result()
+        self._record('render', busy)
+        if self.log is not None:
+            self.log(path)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Command Line
+# ---------------------------------------------------------------------------------------------------------------------
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m HexLattice.pipeline', description='Read, compute and render a batch of HexLattice maps.')
+    parser.add_argument('job', type=Path, help='path of the JSON job description')
+    parser.add_argument('--readers', type=int, help='number of reader threads')
+    parser.add_argument('--renderers', type=int, help='number of render processes')
+    parser.add_argument('--queue-size', type=int, help='maximal number of items waiting between two stages')
+    parser.add_argument('--threads', action='store_true', help='render in threads instead of processes')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the path of every image')
+    args = parser.parse_args(argv)
+
+    job = PipelineJob.load(args.job)
+    job.readers = job.readers if args.readers is None else args.readers
+    job.renderers = job.renderers if args.renderers is None else args.renderers
+    job.queue_size = job.queue_size if args.queue_size is None else args.queue_size
+    job.processes = job.processes and not args.threads
+    job.validate()
+    pipeline = Pipeline(job, log=print if args.verbose else None)
+    try:
+        stats = pipeline.run()
+    except PipelineError as e:
+        print(e.stats.report())
+        raise SystemExit(str(e))
+    print(stats.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
-from dataclasses import dataclass
+import io
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Literal, Callable
+from typing import Literal, Callable, Optional
 
 import matplotlib.pyplot as plt
 import matplotlib as mpl
+import matplotlib.style
 import matplotlib.colors as mcolors
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .profiling import RenderTimer, resolve_timer, profile_render
 
 AllowedImageType = Literal['jpg', 'png', 'eps', 'svg']
 
@@ -21,6 +27,18 @@ purple_gradient_colors = ['#FDF2EE', '#FDF2EE', '#FABFBE', '#F598B3', '#F0659F',
 # Color list
 COLOR_LIST = purple_gradient_colors
 
+# Text colour functions which PlotConfig.from_dict resolves, by the 'module:qualname' name written by to_dict. A
+# configuration received from elsewhere, e.g. by the render server, can only select one of these.
+TEXT_COLOR_FUNCS: dict[str, Callable] = dict()
+
+def register_text_color_func(func: Callable) -> Callable:
+    """
+    Allow PlotConfig.from_dict to resolve a text colour function, usable as a decorator
+    """
+    TEXT_COLOR_FUNCS[f'{func.__module__}:{func.__qualname__}'] = func
+    return func
+
+@register_text_color_func
 def text_color_based_on_bgcolor(bg_color):
     """return proper text color based on background color
     """
@@ -43,11 +61,26 @@ class PlotConfig:
     text_size       : float         = 20
     text_color_func : Callable      = text_color_based_on_bgcolor
     text_color      : str           = 'black'
+    text_usetex     : bool          = True
+    show_text       : bool          = True
     
     # hex
     plot_style      : str           = 'bmh'
     hex_face_color  : str           = high_contrast_colors[0]
     hex_edge_color  : str           = 'black'
+    hex_edge_width  : Optional[float] = None
+    merge_edges     : bool          = False
+
+    # legend
+    show_legend     : bool          = True
+
+    # zone
+    zone_edge_color : str           = 'black'
+    zone_edge_width : float         = 3
+
+    # contour
+    contour_color   : str           = 'black'
+    contour_width   : float         = 1.5
 
     # figure
     figure_dpi      : float         = 400
@@ -59,24 +92,151 @@ class PlotConfig:
     axes_titleweight: str           = 'normal'
     axes_titley     : float         = 0.95
     
+    def to_dict(self) -> dict:
+        """
+        The fields as JSON serializable values: paths as strings, tuples as lists and functions by their qualified name
+        """
+        res_dict = dict()
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, Path):
+                value = str(value)
+            elif isinstance(value, tuple):
+                value = list(value)
+            elif callable(value):
+                value = f'{value.__module__}:{value.__qualname__}'
+            res_dict[f.name] = value
+        return res_dict
+
+    @staticmethod
+    def from_dict(config: dict) -> 'PlotConfig':
+        """
+        The inverse of to_dict. Text colour functions are only resolved from TEXT_COLOR_FUNCS, see
+        register_text_color_func, so that a dict received from elsewhere cannot call arbitrary code.
+
+        Raises:
+            ValueError: If a text colour function is not registered
+        """
+        config = dict(config)
+        types = {f.name: f.type for f in fields(PlotConfig)}
+        for name, value in config.items():
+            if types.get(name) is Path:
+                config[name] = Path(value)
+            elif isinstance(value, list):
+                config[name] = tuple(value)
+            elif types.get(name) is Callable:
+                if value not in TEXT_COLOR_FUNCS:
+                    raise ValueError(f'Cannot resolve {value}, the registered text colour functions are {list(TEXT_COLOR_FUNCS)}.')
+                config[name] = TEXT_COLOR_FUNCS[value]
+        return PlotConfig(**config)
+
     @property
     def color_map(self):
         return LinearSegmentedColormap.from_list("my_cmap", COLOR_LIST)
 
-    def set_plot_config(self):
-        # picture style
-        plt.style.use(self.plot_style)
-
-        # rcParams
-        rc = {
+    @property
+    def rc_params(self) -> dict:
+        """
+        The rcParams applied by set_plot_config on top of plot_style
+        """
+        return {
             'font.family'                   : 'Times New Roman',
             'mathtext.fontset'              : 'stix',
-            'text.usetex'                   : True,
+            'text.usetex'                   : self.text_usetex,
             'figure.dpi'                    : self.figure_dpi,
             'figure.figsize'                : self.figure_size,
             'axes.titlesize'                : self.axes_titlesize,
             'axes.titleweight'              : self.axes_titleweight,
             'axes.titley'                   : self.axes_titley
         }
-        mpl.rcParams.update(rc)
 
+    def set_plot_config(self):
+        # picture style
+        plt.style.use(self.plot_style)
+
+        # rcParams
+        mpl.rcParams.update(self.rc_params)
+
+    # The properties below carry the settings of set_plot_config to the artists explicitly, so that figures can be
+    # styled without changing the global plt.style and mpl.rcParams, e.g. when rendering from several threads
+    def _style_param(self, key: str):
+        params = {**mpl.style.library.get(self.plot_style, dict()), **self.rc_params}
+        return params.get(key, mpl.rcParamsDefault[key])
+
+    @property
+    def text_props(self) -> dict:
+        """
+        Properties of the cell labels
+        """
+        return {
+            'fontfamily'        : self._style_param('font.family'),
+            'math_fontfamily'   : self._style_param('mathtext.fontset'),
+            'usetex'            : self._style_param('text.usetex'),
+        }
+
+    @property
+    def title_props(self) -> dict:
+        """
+        Keyword arguments of Axes.set_title
+        """
+        return {
+            'fontsize'          : self._style_param('axes.titlesize'),
+            'fontweight'        : self._style_param('axes.titleweight'),
+            'y'                 : self._style_param('axes.titley'),
+            **self.text_props
+        }
+
+    @property
+    def patch_props(self) -> dict:
+        """
+        Properties of the cell patches
+        """
+        return {
+            'linewidth'         : self._style_param('patch.linewidth') if self.hex_edge_width is None else self.hex_edge_width,
+            'antialiased'       : self._style_param('patch.antialiased'),
+        }
+
+    def new_figure(self) -> Figure:
+        """
+        A figure with its own Agg canvas, which is neither registered in nor styled through pyplot. Unlike plt.figure,
+        it is safe to create and draw such figures from several threads at once.
+        """
+        fig = Figure(figsize=self.figure_size, dpi=self.figure_dpi)
+        FigureCanvasAgg(fig)
+        return fig
+
+    @property
+    def _savefig_kwargs(self) -> dict:
+        # No creation date, so that the same figure always gives the same bytes
+        metadata = {'svg': {'Date': None}, 'eps': {'CreationDate': None}}.get(self.image_type)
+        return {'format': self.image_type, 'dpi': self.figure_dpi, 'metadata': metadata}
+
+    def figure_to_bytes(self, fig: Figure) -> bytes:
+        """
+        Encode the figure as image_type in memory
+        """
+        buffer = io.BytesIO()
+        fig.savefig(buffer, **self._savefig_kwargs)
+        return buffer.getvalue()
+
+    def save_figure(self, fig: Figure, timer: Optional[RenderTimer] = None) -> Path:
+        """
+        Save the figure to image_path, creating image_root_dir if needed.
+
+        Args:
+            fig (Figure): The figure to save
+            timer (RenderTimer, optional): Records the 'draw' and 'savefig' stages. The figure is only drawn
+                separately from the encoding when a timer is given, so that the two can be told apart
+
+        Returns:
+            Path: image_path
+        """
+        timer = resolve_timer(timer)
+        with profile_render(f'savefig-{self.image_name}'):
+            self.image_root_dir.mkdir(parents=True, exist_ok=True)
+            if timer.enabled:
+                with timer.stage('draw'):
+                    fig.canvas.draw()
+            with timer.stage('savefig'):
+                fig.savefig(self.image_path, **self._savefig_kwargs)
+        return self.image_path
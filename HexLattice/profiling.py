@@ -0,0 +1,290 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, Optional, ContextManager, Union
+
+# Environment switch of the per render profile report, e.g. HEXLATTICE_PROFILE=cprofile,tracemalloc
+PROFILE_ENV         = 'HEXLATTICE_PROFILE'
+PROFILE_DIR_ENV     = 'HEXLATTICE_PROFILE_DIR'
+ValidProfilers      = ('cprofile', 'tracemalloc')
+
+# The stages of the plot pipeline
+RENDER_STAGES = ('setup', 'colour mapping', 'artist creation', 'draw', 'savefig')
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Render Timer
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class StageRecord:
+    """
+    The measurement of one stage of a render
+
+    Attributes:
+        name (str): Name of the stage, see RENDER_STAGES
+        wall_time (float): Wall time in seconds
+        allocated_blocks (int): Net number of memory blocks allocated by the interpreter during the stage
+        allocated_bytes (int, optional): Net traced bytes, only recorded when the timer traces memory
+        peak_bytes (int, optional): Peak traced bytes during the stage, only recorded when the timer traces memory
+    """
+    name:               str
+    wall_time:          float
+    allocated_blocks:   int
+    allocated_bytes:    Optional[int] = None
+    peak_bytes:         Optional[int] = None
+
+
+@dataclass
+class RenderTimer:
+    """
+    Records the wall time and the allocations of every stage of a render. Pass it to `HexLattice.plot_hex`,
+    `HexLattice.plot_circle` and `PlotConfig.save_figure`; the same timer can be reused over many renders.
+
+    Attributes:
+        trace_memory (bool): Also trace the allocated and peak bytes with tracemalloc, which slows the stage down
+        callback (Callable, optional): Called with every StageRecord as soon as its stage finishes
+        records (list[StageRecord]): All records in order
+
+    Example:
+        timer = RenderTimer()
+        hl.plot_hex(pc, ax, timer=timer)
+        pc.save_figure(fig, timer=timer)
+        print(timer.report())
+    """
+    trace_memory:   bool                                    = False
+    callback:       Optional[Callable[[StageRecord], None]] = field(default=None, repr=False)
+    records:        list[StageRecord]                       = field(default_factory=list)
+
+    enabled = True
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self.trace_memory:
+            _acquire_tracemalloc()
+            watch = _watch_peak()
+            bytes_before = tracemalloc.get_traced_memory()[0]
+        blocks_before = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            record = StageRecord(name, wall_time, sys.getallocatedblocks() - blocks_before)
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()[0], _peak_since(watch)
+                record.allocated_bytes = current - bytes_before
+                record.peak_bytes = peak - bytes_before
+                _release_tracemalloc()
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(record)
+
+    def summary(self) -> dict[str, StageRecord]:
+        """
+        Sum up the records by stage name, keeping the order in which the stages first appeared
+        """
+        res_dict: dict[str, StageRecord] = dict()
+        for record in self.records:
+            if record.name not in res_dict:
+                res_dict[record.name] = StageRecord(record.name, 0., 0,
+                                                    None if record.allocated_bytes is None else 0,
+                                                    None if record.peak_bytes is None else 0)
+            total = res_dict[record.name]
+            total.wall_time += record.wall_time
+            total.allocated_blocks += record.allocated_blocks
+            if record.allocated_bytes is not None:
+                total.allocated_bytes = (total.allocated_bytes or 0) + record.allocated_bytes
+                total.peak_bytes = max(total.peak_bytes or 0, record.peak_bytes)
+        return res_dict
+
+    def report(self) -> str:
+        """
+        A human readable table of the summary
+        """
+        lines = [f'{"stage":<20}{"wall time [ms]":>16}{"blocks":>12}{"bytes":>14}{"peak bytes":>14}']
+        for total in self.summary().values():
+            lines.append(
+                f'{total.name:<20}{total.wall_time * 1e3:>16.3f}{total.allocated_blocks:>12}'
+                f'{"-" if total.allocated_bytes is None else total.allocated_bytes:>14}'
+                f'{"-" if total.peak_bytes is None else total.peak_bytes:>14}'
+            )
+        return '\n'.join(lines)
+
+
+class NullTimer:
+    """
+    Stands in for a RenderTimer when no instrumentation is requested
+    """
+    enabled = False
+
+    def stage(self, name: str) -> ContextManager[None]:
+        return nullcontext()
+
+
+NULL_TIMER = NullTimer()
+
+def resolve_timer(timer: Optional[RenderTimer]) -> Union[RenderTimer, NullTimer]:
+    return NULL_TIMER if timer is None else timer
+
+# tracemalloc is process wide: the renders of several threads share one trace, which is started by the first user and
+# stopped by the last one. A trace started outside of HexLattice is never stopped here.
+_tracemalloc_lock   = threading.Lock()
+_tracemalloc_users  = 0
+_tracemalloc_owned  = False
+
+def _acquire_tracemalloc(nframe: int = 1) -> None:
+    """
+    Register a user of tracemalloc, starting the trace if nobody traces yet
+    """
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(nframe)
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc() -> None:
+    """
+    Unregister a user of tracemalloc, stopping the trace when the last user of a trace started here leaves
+    """
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+# tracemalloc keeps a single peak, so a stage resetting it would hide the earlier peak from the stages and profiles
+# enclosing it, in this thread or another. Every reset first folds the peak so far into all open measurements.
+_peak_watches: dict[int, int] = dict()
+_peak_watch_ids = itertools.count()
+
+def _watch_peak() -> int:
+    """
+    Start measuring the peak traced memory, returns the id of the measurement for _peak_since
+    """
+    with _tracemalloc_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        for watch in _peak_watches:
+            _peak_watches[watch] = max(_peak_watches[watch], peak)
+        tracemalloc.reset_peak()
+        watch = next(_peak_watch_ids)
+        _peak_watches[watch] = 0
+        return watch
+
+
+def _peak_since(watch: int) -> int:
+    """
+    The peak traced memory since _watch_peak returned watch, which ends the measurement
+    """
+    with _tracemalloc_lock:
+        return max(_peak_watches.pop(watch), tracemalloc.get_traced_memory()[1])
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Profile Report
+# ---------------------------------------------------------------------------------------------------------------------
+def enabled_profilers() -> set[str]:
+    """
+    Parse the HEXLATTICE_PROFILE environment variable. '1' or 'all' enables every profiler.
+
+    Raises:
+        ValueError: If an unknown profiler is requested
+    """
+    value = os.environ.get(PROFILE_ENV, '').strip().lower()
+    if value in ('', '0'):
+        return set()
+    if value in ('1', 'all'):
+        return set(ValidProfilers)
+    profilers = {name.strip() for name in value.split(',') if name.strip()}
+    invalid = profilers - set(ValidProfilers)
+    if invalid:
+        raise ValueError(f'Invalid profilers {sorted(invalid)} in ${PROFILE_ENV}. The valid profilers are {ValidProfilers}')
+    return profilers
+
+
+def profile_render(label: str) -> ContextManager[None]:
+    """
+    Profile the enclosed render if requested by $HEXLATTICE_PROFILE, otherwise do nothing. The reports are written
+    to $HEXLATTICE_PROFILE_DIR (default: the working directory) as '<label>-<time>.prof' (cProfile, readable with
+    pstats or snakeviz) and '<label>-<time>.tracemalloc.txt'. Nested renders are only profiled by the outermost one.
+    Only one cProfile can be active in the process, so a render that starts while another thread, or a profiler
+    outside of HexLattice, is profiling skips the cProfile report.
+    """
+    profilers = enabled_profilers()
+    if not profilers or getattr(_profile_state, 'active', False):
+        return nullcontext()
+    return _profile(label, profilers)
+
+
+# cProfile only sees the thread it is enabled in, so the nesting is tracked per thread
+_profile_state = threading.local()
+# Since Python 3.12 only one cProfile can be enabled at a time in the whole process
+_cprofile_lock = threading.Lock()
+
+@contextmanager
+def _profile(label: str, profilers: set[str]) -> Iterator[None]:
+    out_dir = Path(os.environ.get(PROFILE_DIR_ENV, '.'))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = out_dir / f'{"".join(c if c.isalnum() or c in "-_" else "_" for c in label)}-{datetime.now():%Y%m%d-%H%M%S-%f}'
+
+    profiler = _enable_cprofile() if 'cprofile' in profilers else None
+    if 'tracemalloc' in profilers:
+        _acquire_tracemalloc(25)
+        watch = _watch_peak()
+    _profile_state.active = True
+    try:
+        yield
+    finally:
+        _profile_state.active = False
+        if profiler is not None:
+            profiler.disable()
+            _cprofile_lock.release()
+            profiler.dump_stats(f'{stem}.prof')
+        if 'tracemalloc' in profilers:
+            snapshot = tracemalloc.take_snapshot()
+            peak = _peak_since(watch)
+            _release_tracemalloc()
+            Path(f'{stem}.tracemalloc.txt').write_text(_format_snapshot(snapshot, peak))
+
+
+def _enable_cprofile() -> Optional[cProfile.Profile]:
+    """
+    Enable a new cProfile, or return None if another one is already active
+    """
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # 'Another profiling tool is already active', e.g. a cProfile run around the whole program
+        _cprofile_lock.release()
+        return None
+    return profiler
+
+
+def _format_snapshot(snapshot: tracemalloc.Snapshot, peak: int, limit: int = 30) -> str:
+    buffer = io.StringIO()
+    buffer.write(f'peak traced memory: {peak} bytes\n\n')
+    for stat in snapshot.statistics('lineno')[:limit]:
+        buffer.write(f'{stat}\n')
+    return buffer.getvalue()
+
+
+def format_profile(path: Path, limit: int = 30, sort: str = 'cumulative') -> str:
+    """
+    Format a '.prof' report written by `profile_render`
+    """
+    buffer = io.StringIO()
+    pstats.Stats(str(path), stream=buffer).sort_stats(sort).print_stats(limit)
+    return buffer.getvalue()
@@ -0,0 +1,113 @@
+from typing import Optional
+
+import numpy as np
+
+from .axial_grid import AxialGrid
+from .coordinates import CubeCoordinate
+
+# Upper bound of the number of pairwise distances evaluated at once, which bounds the memory of the distance queries
+CHUNK_SIZE = 2 ** 22
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Distance
+# ---------------------------------------------------------------------------------------------------------------------
+def distance_matrix(cube_a: np.ndarray, cube_b: np.ndarray) -> np.ndarray:
+    """
+    Hex distances (n_a, n_b) between two arrays of cube coordinates (n_a, 3) and (n_b, 3)
+    """
+    return CubeCoordinate.distance_array(cube_a[:, np.newaxis, :], cube_b[np.newaxis, :, :])
+
+
+def nearest(cube_targets: np.ndarray, cube_sources: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For every target, the hex distance to the nearest source and the position of that source in `cube_sources`.
+    Ties are resolved to the first source. The targets are processed in chunks of at most CHUNK_SIZE distances.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (distance, argmin), both of shape (n_targets,)
+    """
+    if len(cube_sources) == 0:
+        raise ValueError('At least one source is required.')
+    distance = np.empty(len(cube_targets), dtype=np.int64)
+    argmin = np.empty(len(cube_targets), dtype=np.int64)
+    step = max(1, CHUNK_SIZE // len(cube_sources))
+    for start in range(0, len(cube_targets), step):
+        chunk = distance_matrix(cube_targets[start:start + step], cube_sources)
+        argmin[start:start + step] = np.argmin(chunk, axis=1)
+        distance[start:start + step] = np.take_along_axis(chunk, argmin[start:start + step, np.newaxis], axis=1)[:, 0]
+    return distance, argmin
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Range & Line
+# ---------------------------------------------------------------------------------------------------------------------
+def range_offsets(distance: int) -> np.ndarray:
+    """
+    Axial offsets (3 * d * (d + 1) + 1, 2) of all hexagons within `distance` steps of the origin
+    """
+    d = np.arange(-distance, distance + 1)
+    x, z = np.meshgrid(d, d, indexing='ij')
+    inside = np.abs(x + z) <= distance
+    return np.stack((x[inside], z[inside]), axis=-1)
+
+
+def line(cube_a: np.ndarray, cube_b: np.ndarray) -> np.ndarray:
+    """
+    Cube coordinates (d + 1, 3) of the hexagons on the straight line from `cube_a` to `cube_b`, d being their hex
+    distance. The end points are nudged by a tiny epsilon so that points on a hexagon edge always round the same way.
+    """
+    cube_a = np.asarray(cube_a, dtype=float)
+    cube_b = np.asarray(cube_b, dtype=float)
+    n = int(CubeCoordinate.distance_array(cube_a, cube_b))
+    epsilon = np.array([1e-6, 2e-6, -3e-6])
+    t = np.linspace(0, 1, n + 1)[:, np.newaxis] if n > 0 else np.zeros((1, 1))
+    return CubeCoordinate.round_array((cube_a + epsilon) + ((cube_b + epsilon) - (cube_a + epsilon)) * t)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Breadth First Search
+# ---------------------------------------------------------------------------------------------------------------------
+def bfs_distance_field(
+        neighbour_table: np.ndarray,
+        sources: np.ndarray,
+        passable: Optional[np.ndarray] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Multi-source breadth first search over the cells. Every level of the search is expanded with array operations,
+    so the cost is linear in the number of cells and the number of Python iterations equals the largest distance.
+
+    Args:
+        neighbour_table (np.ndarray): (n, 6) neighbour indices of every cell, -1 for a missing neighbour
+        sources (np.ndarray): Indices of the source cells, which are reached even if they are not passable
+        passable (np.ndarray, optional): (n,) bool mask of the cells the search may enter, all cells if None
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (distance, nearest_source), the number of steps to the nearest source and the
+            index of that source for every cell, both -1 for unreachable cells. Ties are resolved deterministically.
+    """
+    n = len(neighbour_table)
+    distance = np.full(n, -1, dtype=np.int64)
+    nearest_source = np.full(n, -1, dtype=np.int64)
+    frontier = np.unique(np.asarray(sources, dtype=np.int64))
+    distance[frontier] = 0
+    nearest_source[frontier] = frontier
+    level = 0
+    while len(frontier):
+        level += 1
+        candidates = neighbour_table[frontier].ravel()
+        owners = np.repeat(nearest_source[frontier], neighbour_table.shape[1])
+        valid = candidates >= 0
+        candidates, owners = candidates[valid], owners[valid]
+        valid = distance[candidates] < 0
+        if passable is not None:
+            valid &= passable[candidates]
+        candidates, owners = candidates[valid], owners[valid]
+        frontier, first = np.unique(candidates, return_index=True)
+        distance[frontier] = level
+        nearest_source[frontier] = owners[first]
+    return distance, nearest_source
+
+
+def lookup_cells(grid: AxialGrid, cube: np.ndarray) -> np.ndarray:
+    """
+    Cell indices of an array of cube coordinates (..., 3), -1 for hexagons which are not cells of the grid
+    """
+    return grid.lookup(CubeCoordinate.to_axial_array(cube))
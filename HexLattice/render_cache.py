@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import types
+import uuid
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Callable, Literal, Optional, TYPE_CHECKING
+
+import matplotlib
+import numpy as np
+
+from .plot_config import PlotConfig
+
+if TYPE_CHECKING:
+    from .categorical import CategoricalField
+    from .hex_lattice import HexLattice
+
+# Bumped whenever the rendering changes, so that images of older versions are not served anymore
+RENDER_CACHE_VERSION = 4
+
+def _function_fingerprint(func: types.FunctionType) -> str:
+    """
+    A hash of the code of a function and of the values it reads: its defaults, its closures and the globals it names.
+    The functions of its own module which it reads are hashed alike; functions, classes and modules from elsewhere,
+    e.g. numpy or matplotlib, count by their name. A function reading a value which is neither JSON serializable, an
+    array nor one of those gets a fresh fingerprint on every call, i.e. its renders are never served from the cache.
+    """
+    digest = hashlib.sha256()
+    hashed: set[types.FunctionType] = set()
+
+    def update_code(code: types.CodeType) -> list[str]:
+        digest.update(code.co_code)
+        digest.update(repr(code.co_names).encode())
+        names = list(code.co_names)
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                names += update_code(const)
+            else:
+                digest.update(repr(const).encode())
+        return names
+
+    def captured_value(value) -> object:
+        if isinstance(value, np.ndarray):
+            return [value.dtype.str, value.shape, hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()]
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, types.ModuleType):
+            return value.__name__
+        if isinstance(value, types.FunctionType) and value.__module__ == func.__module__:
+            update_function(value)
+        if isinstance(value, (types.FunctionType, types.BuiltinFunctionType, type)):
+            return f'{value.__module__}:{value.__qualname__}'
+        raise TypeError(f'Cannot fingerprint {type(value).__name__}')
+
+    def update_function(function: types.FunctionType) -> None:
+        # A recursive function, or helpers calling each other, are hashed once
+        if function in hashed:
+            return
+        hashed.add(function)
+        names = update_code(function.__code__)
+        # Attribute names are among co_names as well, only those naming a global are looked up
+        global_values = {name: function.__globals__[name] for name in sorted(set(names)) if name in function.__globals__}
+        captured = [
+            function.__defaults__,
+            function.__kwdefaults__,
+            [cell.cell_contents for cell in function.__closure__ or ()],
+            global_values
+        ]
+        digest.update(json.dumps(captured, sort_keys=True, default=captured_value).encode())
+
+    try:
+        update_function(func)
+    except TypeError:
+        return uuid.uuid4().hex
+    return digest.hexdigest()
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Render Cache
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class CacheStats:
+    """
+    Counters of a RenderCache
+
+    Attributes:
+        hits (int): Requests served from the cache
+        misses (int): Requests which had to be rendered
+        stores (int): Images added to the cache
+        evictions (int): Images removed to stay within the size limit
+    """
+    hits:       int = 0
+    misses:     int = 0
+    stores:     int = 0
+    evictions:  int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.
+
+
+class RenderCache:
+    """
+    An on-disk cache of rendered images, addressed by a hash of everything the image depends on: the cell geometry,
+    the values and texts, the PlotConfig (except where the image is saved) and the matplotlib version. The least
+    recently used images are evicted when the cache grows over max_bytes. Several threads may share one cache.
+
+    Example:
+        cache = RenderCache(Path('~/.cache/hexlattice').expanduser(), max_bytes=2 * 2 ** 30)
+        for pc, lattice in jobs:
+            lattice.export(pc, cache=cache)
+        print(cache.stats)
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 2 ** 30) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._size = sum(path.stat().st_size for path in self._entries())
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Key
+    # -----------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def key(
+            lattice: 'HexLattice',
+            pc: PlotConfig,
+            shape: Literal['hex', 'circle'] = 'hex',
+            plot_type: Literal['value', 'text'] = 'value',
+            values: Optional[np.ndarray] = None,
+            zones: Optional[np.ndarray] = None,
+            categories: Optional['CategoricalField'] = None
+        ) -> str:
+        """
+        The stable hash of a render request, see HexLattice.export
+        """
+        digest = hashlib.sha256()
+
+        def update(name: str, data) -> None:
+            digest.update(name.encode())
+            if isinstance(data, np.ndarray):
+                digest.update(str((data.dtype.str, data.shape)).encode())
+                digest.update(np.ascontiguousarray(data).tobytes())
+            else:
+                digest.update(json.dumps(data, sort_keys=True, default=str).encode())
+
+        update('version', [RENDER_CACHE_VERSION, matplotlib.__version__, shape, plot_type])
+        update('pitch', float(lattice.pitch))
+        update('axial', lattice.axial_array)
+        update('centre', lattice.centre_array)
+        update('radius', lattice.radius_array)
+        # Values passed to the render colour and label every cell by value, even cells with a text
+        update('field', values is not None)
+        if values is None:
+            values = [np.nan if hex_cell.value is None else hex_cell.value for hex_cell in lattice.HexCells]
+        update('value', np.asarray(values, dtype=float))
+        update('text', [hex_cell.text for hex_cell in lattice.HexCells])
+        if zones is not None:
+            update('zones', lattice.label_regions(zones))
+        if categories is not None:
+            update('category_codes', categories.codes)
+            update('category_palette', categories.palette)
+            update('category_names', categories.names)
+        config = pc.to_dict()
+        config.pop('image_root_dir')
+        update('config', config)
+        # to_dict names every lambda of a module alike, so functions are also told apart by their code
+        for f in fields(pc):
+            value = getattr(pc, f.name)
+            if isinstance(value, types.FunctionType):
+                update(f.name, _function_fingerprint(value))
+        update('color_map', pc.color_map(np.linspace(0, 1, 256)))
+        return digest.hexdigest()
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Storage
+    # -----------------------------------------------------------------------------------------------------------------
+    def _path(self, key: str, image_type: str) -> Path:
+        return self.root / key[:2] / f'{key}.{image_type}'
+
+    def _entries(self) -> list[Path]:
+        return [path for path in self.root.glob('??/*') if path.is_file() and not path.name.startswith('.')]
+
+    def get(self, key: str, image_type: str) -> Optional[Path]:
+        """
+        Path of the cached image, None on a miss. A hit marks the image as recently used.
+        """
+        path = self._path(key, image_type)
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+        return path
+
+    def fetch(self, key: str, image_type: str, destination: Path) -> bool:
+        """
+        Copy the cached image to destination
+
+        Returns:
+            bool: False on a miss
+        """
+        path = self.get(key, image_type)
+        if path is None:
+            return False
+        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            # Evicted by another thread between get and copy
+            with self._lock:
+                self.stats.hits -= 1
+                self.stats.misses += 1
+            return False
+        return True
+
+    def put(self, key: str, image_type: str, source: Path) -> Path:
+        """
+        Add a copy of an image to the cache and evict the least recently used images beyond max_bytes
+        """
+        return self._store(key, image_type, lambda tmp_name: shutil.copyfile(source, tmp_name))
+
+    def put_bytes(self, key: str, image_type: str, data: bytes) -> Path:
+        """
+        Add an encoded image to the cache, see put
+        """
+        return self._store(key, image_type, lambda tmp_name: Path(tmp_name).write_bytes(data))
+
+    def _store(self, key: str, image_type: str, write: Callable[[str], object]) -> Path:
+        path = self._path(key, image_type)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first, so that no reader ever sees a partial image
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        os.close(fd)
+        write(tmp_name)
+        with self._lock:
+            replaced = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_name, path)
+            self._size += path.stat().st_size - replaced
+            self.stats.stores += 1
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _evict(self) -> None:
+        entries = list()
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self._entries():
+                path.unlink(missing_ok=True)
+            self._size = 0
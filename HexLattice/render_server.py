@@ -0,0 +1,565 @@
+"""
+A long-running render service, which keeps the interpreter, matplotlib, the font cache and the cell geometry warm
+between jobs. Jobs are sent over a local Unix socket or a localhost TCP port as frames of
+
+    >IQ     length of the JSON header, length of the binary payload
+    header  JSON object, e.g. {"op": "render", "plot_config": {...}, "n_cells": 7, ...}
+    payload raw little-endian arrays, for a render job the values (float64) followed by the axial coordinates (int64)
+
+and are rendered by a thread pool through the pyplot-free HexLattice.render. Start a server with
+
+    python -m HexLattice.render_server --socket /tmp/hexlattice.sock
+
+and send jobs with RenderClient.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, replace
+from pathlib import Path
+from typing import Literal, Optional, Union
+
+import numpy as np
+
+from .coordinates import AxialCoordinate
+from .hex_lattice import HexCell, HexLattice
+from .plot_config import PlotConfig
+from .render_cache import RenderCache
+
+_FRAME_PREFIX = struct.Struct('>IQ')
+_VALUE_DTYPE = np.dtype('<f8')
+_AXIAL_DTYPE = np.dtype('<i8')
+
+# Number of latencies kept for the percentiles of the metrics
+LATENCY_WINDOW = 1024
+
+# Default limit of the header and payload of a frame received by the server, 24 bytes per cell
+MAX_FRAME_BYTES = 2 ** 28
+
+Address = Union[Path, str, tuple[str, int]]
+
+class RenderServerError(RuntimeError):
+    """
+    A job failed on the server, the message is the error raised there
+    """
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Framing
+# ---------------------------------------------------------------------------------------------------------------------
+def _encode_frame(header: dict, payload: bytes = b'') -> bytes:
+    header_bytes = json.dumps(header).encode()
+    return _FRAME_PREFIX.pack(len(header_bytes), len(payload)) + header_bytes + payload
+
+
+def _decode_header(header_bytes: bytes) -> dict:
+    header = json.loads(header_bytes)
+    if not isinstance(header, dict):
+        raise ValueError(f'Expected a JSON object as frame header, received {type(header).__name__}.')
+    return header
+
+
+class _OversizedFrame(ValueError):
+    """
+    A frame over the size limit, which is not read: the rest of the stream cannot be trusted
+    """
+
+
+async def _read_frame(reader: asyncio.StreamReader, max_bytes: int) -> tuple[dict, bytes]:
+    """
+    Read a whole frame before decoding its header, so that the stream stays in step after a malformed header
+
+    Raises:
+        ValueError: If the header is not a JSON object, _OversizedFrame if the frame is larger than max_bytes
+    """
+    header_size, payload_size = _FRAME_PREFIX.unpack(await reader.readexactly(_FRAME_PREFIX.size))
+    if header_size + payload_size > max_bytes:
+        raise _OversizedFrame(f'The frame of {header_size + payload_size} bytes exceeds the limit of {max_bytes} bytes.')
+    header_bytes = await reader.readexactly(header_size)
+    payload = await reader.readexactly(payload_size)
+    return _decode_header(header_bytes), payload
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 2 ** 20))
+        if not chunk:
+            raise ConnectionError('The render server closed the connection.')
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _is_tcp(address: Address) -> bool:
+    return isinstance(address, tuple)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Metrics
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class ServerMetrics:
+    """
+    A snapshot of the state of a RenderServer
+
+    Attributes:
+        queued (int): Jobs accepted and waiting for a worker
+        running (int): Jobs being rendered
+        completed (int): Jobs finished successfully
+        failed (int): Jobs which raised an error
+        cache_hits (int): Jobs served from the RenderCache
+        geometry_hits (int): Jobs which reused a cached lattice
+        latency_p50 (float): Median seconds from receiving a job to sending its image, over the last LATENCY_WINDOW jobs
+        latency_p90 (float): 90th percentile of the latency
+        latency_p99 (float): 99th percentile of the latency
+        uptime (float): Seconds since the server started
+    """
+    queued:         int     = 0
+    running:        int     = 0
+    completed:      int     = 0
+    failed:         int     = 0
+    cache_hits:     int     = 0
+    geometry_hits:  int     = 0
+    latency_p50:    float   = 0.
+    latency_p90:    float   = 0.
+    latency_p99:    float   = 0.
+    uptime:         float   = 0.
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Server
+# ---------------------------------------------------------------------------------------------------------------------
+class RenderServer:
+    """
+    Accepts render jobs with asyncio and renders them on a thread pool. Lattices are cached by their geometry, so a
+    job only sends the values of the cells and reuses the cached coordinates, patch vertices and cell lookups.
+    At most max_queue jobs are rendered or waiting for a worker; further jobs wait for a slot, and their connections
+    are not read meanwhile, which slows down the clients.
+
+    Args:
+        address (Path | tuple[str, int]): Path of a Unix socket, or (host, port) of a TCP socket, port 0 picks a
+            free port, see `address` once started
+        workers (int): Number of render threads
+        max_queue (int): Maximal number of accepted jobs, rendering or waiting
+        cache (RenderCache, optional): Serve repeated jobs from the cache instead of rendering them
+        geometry_cache_size (int): Number of lattices kept
+        warm_up (PlotConfig, optional): Render a small lattice with this configuration before accepting jobs, which
+            loads the fonts and, with text_usetex, starts TeX once
+        output_root (Path, optional): Directory of the images saved by jobs with output='path', which are refused if
+            None. The image_root_dir sent by a client is ignored; its image_name may hold subdirectories but must
+            stay inside output_root
+        max_frame_bytes (int): Largest accepted request; the connection of a larger one is answered with an
+            error and closed
+
+    Example:
+        server = RenderServer(Path('/tmp/hexlattice.sock'), workers=4, warm_up=PlotConfig('warm-up'), output_root=Path('plot'))
+        server.run()
+    """
+
+    def __init__(
+            self,
+            address: Address,
+            workers: int = os.cpu_count() or 1,
+            max_queue: int = 64,
+            cache: Optional[RenderCache] = None,
+            geometry_cache_size: int = 32,
+            warm_up: Optional[PlotConfig] = None,
+            output_root: Optional[Path] = None,
+            max_frame_bytes: int = MAX_FRAME_BYTES
+        ) -> None:
+        self.address = tuple(address) if _is_tcp(address) else Path(address)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.cache = cache
+        self.geometry_cache_size = geometry_cache_size
+        self.warm_up = warm_up
+        self.output_root = None if output_root is None else Path(output_root).resolve()
+        self.max_frame_bytes = max_frame_bytes
+        self._metrics = ServerMetrics()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lattices: OrderedDict[str, HexLattice] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._started = time.perf_counter()
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Lifecycle
+    # -----------------------------------------------------------------------------------------------------------------
+    async def start(self) -> None:
+        """
+        Start the workers, warm up and listen on address
+        """
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='hexlattice-render')
+        self._slots = asyncio.Semaphore(self.max_queue)
+        loop = asyncio.get_running_loop()
+        if self.warm_up is not None:
+            await loop.run_in_executor(self._executor, self._warm_up)
+
+        if _is_tcp(self.address):
+            self._server = await asyncio.start_server(self._handle_connection, *self.address)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        else:
+            self.address.unlink(missing_ok=True)
+            self._server = await asyncio.start_unix_server(self._handle_connection, self.address)
+        self._started = time.perf_counter()
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if not _is_tcp(self.address):
+            self.address.unlink(missing_ok=True)
+
+    def run(self) -> None:
+        """
+        Serve until interrupted
+        """
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
+    def _warm_up(self) -> None:
+        lattice = HexLattice([HexCell(AxialCoordinate(x, z)) for x in range(-1, 2) for z in range(-1, 2) if abs(x + z) <= 1])
+        self.warm_up.figure_to_bytes(lattice.render(self.warm_up, values=np.arange(len(lattice.HexCells), dtype=float)))
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Metrics
+    # -----------------------------------------------------------------------------------------------------------------
+    def metrics(self) -> ServerMetrics:
+        with self._lock:
+            metrics = ServerMetrics(**asdict(self._metrics))
+            latencies = np.array(self._latencies)
+        if len(latencies):
+            metrics.latency_p50, metrics.latency_p90, metrics.latency_p99 = np.percentile(latencies, [50, 90, 99]).tolist()
+        metrics.uptime = time.perf_counter() - self._started
+        return metrics
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Jobs
+    # -----------------------------------------------------------------------------------------------------------------
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    header, payload = await _read_frame(reader, self.max_frame_bytes)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except _OversizedFrame as error:
+                    writer.write(_encode_frame({'ok': False, 'error': f'ValueError: {error}'}))
+                    await writer.drain()
+                    break
+                except ValueError as error:
+                    response, data = {'ok': False, 'error': f'ValueError: Malformed frame header, {error}'}, b''
+                else:
+                    response, data = await self._dispatch(header, payload)
+                writer.write(_encode_frame(response, data))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, header: dict, payload: bytes) -> tuple[dict, bytes]:
+        op = header.get('op')
+        if op == 'ping':
+            return {'ok': True}, b''
+        if op == 'metrics':
+            return {'ok': True, 'metrics': asdict(self.metrics())}, b''
+        if op != 'render':
+            return {'ok': False, 'error': f'ValueError: Unknown operation {op!r}'}, b''
+
+        start = time.perf_counter()
+        # Set by the worker once the job leaves the queue; a job cancelled or refused by the executor before that
+        # leaves the queue here
+        started = threading.Event()
+        with self._lock:
+            self._metrics.queued += 1
+        try:
+            async with self._slots:
+                response, data = await asyncio.get_running_loop().run_in_executor(self._executor, self._render_job, started, header, payload)
+        except Exception as error:
+            with self._lock:
+                self._metrics.failed += 1
+            return {'ok': False, 'error': f'{type(error).__name__}: {error}'}, b''
+        finally:
+            if not started.is_set():
+                with self._lock:
+                    self._metrics.queued -= 1
+        with self._lock:
+            self._metrics.completed += 1
+            self._latencies.append(time.perf_counter() - start)
+        return response, data
+
+    def _render_job(self, started: threading.Event, header: dict, payload: bytes) -> tuple[dict, bytes]:
+        with self._lock:
+            self._metrics.queued -= 1
+            self._metrics.running += 1
+            started.set()
+        try:
+            return self._render(header, payload)
+        finally:
+            with self._lock:
+                self._metrics.running -= 1
+
+    def _render(self, header: dict, payload: bytes) -> tuple[dict, bytes]:
+        n_cells = int(header['n_cells'])
+        has_values = bool(header.get('values', True))
+        value_bytes = n_cells * _VALUE_DTYPE.itemsize if has_values else 0
+        if len(payload) != value_bytes + 2 * n_cells * _AXIAL_DTYPE.itemsize:
+            raise ValueError(f'The payload of {len(payload)} bytes does not match {n_cells} cells.')
+        values = np.frombuffer(payload, _VALUE_DTYPE, n_cells) if has_values else None
+        axial = np.frombuffer(payload, _AXIAL_DTYPE, 2 * n_cells, offset=value_bytes).reshape(n_cells, 2)
+
+        pc = PlotConfig.from_dict(header['plot_config'])
+        shape = header.get('shape', 'hex')
+        plot_type = header.get('plot_type', 'value')
+        lattice = self._lattice(axial, float(header.get('pitch', 1)), header.get('radius'), header.get('texts'))
+
+        key = self.cache.key(lattice, pc, shape, plot_type, values) if self.cache is not None else None
+        if header.get('output', 'bytes') == 'path':
+            pc = self._output_config(pc)
+            # As HexLattice.export, but fetch tells whether this job hit, unlike the cache statistics shared by all
+            hit = key is not None and self.cache.fetch(key, pc.image_type, pc.image_path)
+            if not hit:
+                pc.image_path.parent.mkdir(parents=True, exist_ok=True)
+                pc.save_figure(lattice.render(pc, shape, plot_type, values=values))
+                if key is not None:
+                    self.cache.put(key, pc.image_type, pc.image_path)
+            self._count_cache_hit(hit)
+            return {'ok': True, 'path': str(pc.image_path)}, b''
+
+        cached = self.cache.get(key, pc.image_type) if key is not None else None
+        if cached is not None:
+            try:
+                data = cached.read_bytes()
+            except FileNotFoundError:
+                cached = None
+        if cached is None:
+            data = pc.figure_to_bytes(lattice.render(pc, shape, plot_type, values=values))
+            if key is not None:
+                self.cache.put_bytes(key, pc.image_type, data)
+        self._count_cache_hit(cached is not None)
+        return {'ok': True, 'image_type': pc.image_type}, data
+
+    def _output_config(self, pc: PlotConfig) -> PlotConfig:
+        """
+        The configuration of a job saving its image, moved into output_root
+
+        Raises:
+            ValueError: If the server saves no images, or the image would be saved outside of output_root
+        """
+        if self.output_root is None:
+            raise ValueError('The server does not save images, start it with an output root.')
+        pc = replace(pc, image_root_dir=self.output_root)
+        if not pc.image_path.resolve().is_relative_to(self.output_root):
+            raise ValueError(f'The image {pc.image_name!r} is outside of the output root.')
+        return pc
+
+    def _count_cache_hit(self, hit: bool) -> None:
+        if hit:
+            with self._lock:
+                self._metrics.cache_hits += 1
+
+    def _lattice(self, axial: np.ndarray, pitch: float, radius: Optional[float], texts: Optional[list]) -> HexLattice:
+        """
+        The cached lattice of a geometry, built on a miss
+        """
+        digest = hashlib.sha256(np.ascontiguousarray(axial).tobytes())
+        digest.update(json.dumps([pitch, radius, texts]).encode())
+        key = digest.hexdigest()
+        with self._lock:
+            lattice = self._lattices.get(key)
+            if lattice is not None:
+                self._lattices.move_to_end(key)
+                self._metrics.geometry_hits += 1
+                return lattice
+
+        texts = [None] * len(axial) if texts is None else texts
+        if len(texts) != len(axial):
+            raise ValueError(f'Expected {len(axial)} texts, one per cell, received {len(texts)}.')
+        cell_radius = {} if radius is None else {'radius': float(radius)}
+        lattice = HexLattice(
+            [HexCell(AxialCoordinate(int(x), int(z)), text=text, **cell_radius) for (x, z), text in zip(axial.tolist(), texts)],
+            pitch
+        )
+        if len(lattice.HexCells) != len(axial):
+            raise ValueError('The axial coordinates of the cells must be unique.')
+        with self._lock:
+            self._lattices[key] = lattice
+            while len(self._lattices) > self.geometry_cache_size:
+                self._lattices.popitem(last=False)
+        return lattice
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Client
+# ---------------------------------------------------------------------------------------------------------------------
+class RenderClient:
+    """
+    A blocking client of a RenderServer, keeping one connection open for all its jobs. Use one client per thread.
+
+    Example:
+        with RenderClient(Path('/tmp/hexlattice.sock')) as client:
+            png = client.render_lattice(lattice, PlotConfig('flux'), values=flux)
+            path = client.render_lattice(lattice, PlotConfig('power'), values=power, output='path')
+            print(client.metrics())
+    """
+
+    def __init__(self, address: Address, timeout: Optional[float] = None) -> None:
+        if _is_tcp(address):
+            self._socket = socket.create_connection(tuple(address), timeout)
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(str(address))
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self) -> 'RenderClient':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _request(self, header: dict, payload: bytes = b'') -> tuple[dict, bytes]:
+        self._socket.sendall(_encode_frame(header, payload))
+        header_size, payload_size = _FRAME_PREFIX.unpack(_recv_exactly(self._socket, _FRAME_PREFIX.size))
+        response = _decode_header(_recv_exactly(self._socket, header_size))
+        data = _recv_exactly(self._socket, payload_size)
+        if not response.get('ok'):
+            raise RenderServerError(response.get('error'))
+        return response, data
+
+    def ping(self) -> float:
+        """
+        Round trip time in seconds
+        """
+        start = time.perf_counter()
+        self._request({'op': 'ping'})
+        return time.perf_counter() - start
+
+    def metrics(self) -> ServerMetrics:
+        return ServerMetrics(**self._request({'op': 'metrics'})[0]['metrics'])
+
+    def render(
+            self,
+            axial: np.ndarray,
+            pc: PlotConfig,
+            values: Optional[np.ndarray] = None,
+            pitch: float = 1,
+            radius: Optional[float] = None,
+            texts: Optional[list[str]] = None,
+            shape: Literal['hex', 'circle'] = 'hex',
+            plot_type: Literal['value', 'text'] = 'value',
+            output: Literal['bytes', 'path'] = 'bytes'
+        ) -> Union[bytes, Path]:
+        """
+        Render the cells at axial coordinates `axial` (n, 2), see HexLattice.render for the other arguments
+
+        Args:
+            output ('bytes' | 'path'): Receive the encoded image, or let the server save it as pc.image_name under its
+                output root and receive the absolute path
+
+        Raises:
+            RenderServerError: If the job failed on the server
+        """
+        axial = np.asarray(axial).reshape(-1, 2)
+        header = {
+            'op'            : 'render',
+            'n_cells'       : len(axial),
+            'values'        : values is not None,
+            'plot_config'   : pc.to_dict(),
+            'pitch'         : float(pitch),
+            'radius'        : None if radius is None else float(radius),
+            'texts'         : None if texts is None else list(texts),
+            'shape'         : shape,
+            'plot_type'     : plot_type,
+            'output'        : output,
+        }
+        payload = b'' if values is None else np.asarray(values, dtype=_VALUE_DTYPE).tobytes()
+        response, data = self._request(header, payload + axial.astype(_AXIAL_DTYPE).tobytes())
+        return Path(response['path']) if output == 'path' else data
+
+    def render_lattice(
+            self,
+            lattice: HexLattice,
+            pc: PlotConfig,
+            values: Optional[np.ndarray] = None,
+            shape: Literal['hex', 'circle'] = 'hex',
+            plot_type: Literal['value', 'text'] = 'value',
+            output: Literal['bytes', 'path'] = 'bytes'
+        ) -> Union[bytes, Path]:
+        """
+        Render a lattice, with the values of its cells unless `values` is given
+
+        Raises:
+            ValueError: If the cells have different radii, which the server does not support
+        """
+        radius = np.unique(lattice.radius_array / lattice.pitch)
+        if len(radius) > 1:
+            raise ValueError('Only lattices whose cells have the same radius can be rendered by the server.')
+        texts = [hex_cell.text for hex_cell in lattice.HexCells]
+        if values is None and not (shape == 'hex' and all(text is not None for text in texts)):
+            # Values passed to render always label the hexagons by value, see HexLattice.plot_hex
+            values = lattice.value_list
+        return self.render(
+            lattice.axial_array,
+            pc,
+            values,
+            lattice.pitch,
+            float(radius[0]) if len(radius) else None,
+            None if all(text is None for text in texts) else texts,
+            shape,
+            plot_type,
+            output
+        )
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Command Line
+# ---------------------------------------------------------------------------------------------------------------------
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m HexLattice.render_server', description='Serve HexLattice renders.')
+    listen = parser.add_mutually_exclusive_group(required=True)
+    listen.add_argument('--socket', type=Path, help='path of the Unix socket')
+    listen.add_argument('--port', type=int, help='localhost TCP port')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of render threads')
+    parser.add_argument('--max-queue', type=int, default=64, help='maximal number of accepted jobs')
+    parser.add_argument('--cache-dir', type=Path, help='directory of a render cache')
+    parser.add_argument('--cache-bytes', type=int, default=2 ** 30, help='size limit of the render cache')
+    parser.add_argument('--no-usetex', action='store_true', help='warm up without TeX')
+    parser.add_argument('--output-root', type=Path, help='directory of the images saved by the jobs, none are saved if omitted')
+    parser.add_argument('--max-frame-bytes', type=int, default=MAX_FRAME_BYTES, help='size limit of a request')
+    args = parser.parse_args(argv)
+
+    server = RenderServer(
+        args.socket if args.socket is not None else ('127.0.0.1', args.port),
+        workers=args.workers,
+        max_queue=args.max_queue,
+        cache=None if args.cache_dir is None else RenderCache(args.cache_dir, args.cache_bytes),
+        warm_up=PlotConfig('warm-up', text_usetex=not args.no_usetex),
+        output_root=args.output_root,
+        max_frame_bytes=args.max_frame_bytes
+    )
+    server.run()
+
+
+if __name__ == '__main__':
+    main()
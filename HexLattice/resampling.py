@@ -0,0 +1,297 @@
+from dataclasses import dataclass, field
+from typing import Literal, Optional
+
+import numpy as np
+
+from .coordinates import CubeCoordinate
+from .hex_lattice import HexLattice
+from .queries import range_offsets
+
+ValidResampleMethods = Literal['area', 'nearest', 'linear']
+ValidQuantities = Literal['intensive', 'extensive']
+
+# Overlaps smaller than this fraction of the smaller cell are round-off of touching hexagons
+AREA_TOLERANCE = 1e-9
+
+# Upper bound of the number of candidate (target, source) pairs processed at once
+CHUNK_SIZE = 2 ** 20
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Resample Operator
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class ResampleOperator:
+    """
+    A sparse (n_target, n_source) matrix in compressed row form, which transfers fields from a source lattice to a
+    target lattice. It is built once per pair of geometries by `build_resampler`; applying it is a sparse mat-vec.
+
+    Attributes:
+        indptr (np.ndarray): (n_target + 1,) row pointers, the entries of target t are indptr[t]:indptr[t + 1]
+        indices (np.ndarray): Source cell index of every entry
+        weights (np.ndarray): Weight of every entry
+        source_area (np.ndarray): Areas of the source cells
+        target_area (np.ndarray): Areas of the target cells
+        method (ValidResampleMethods): 'area', 'nearest' or 'linear'
+        quantity (ValidQuantities): 'intensive' for densities (e.g. power density), 'extensive' for integrals per
+            cell (e.g. assembly power)
+        coverage (np.ndarray): (n_target,) Fraction of every target cell covered by source cells, 'area' method only
+        fill_value (float): Value of the target cells without any source
+    """
+    indptr:         np.ndarray
+    indices:        np.ndarray
+    weights:        np.ndarray
+    source_area:    np.ndarray = field(repr=False)
+    target_area:    np.ndarray = field(repr=False)
+    method:         ValidResampleMethods = 'area'
+    quantity:       ValidQuantities = 'intensive'
+    coverage:       np.ndarray = field(default=None, repr=False)
+    fill_value:     float = np.nan
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (len(self.indptr) - 1, len(self.source_area))
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.shape)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        np.add.at(dense, (rows, self.indices), self.weights)
+        return dense
+
+    def apply(self, source_field: np.ndarray) -> np.ndarray:
+        """
+        Transfer a field (..., n_source) to the target lattice, e.g. a stack of time steps (n_steps, n_source)
+
+        Returns:
+            np.ndarray: (..., n_target) transferred field, fill_value where no source reaches the target
+        """
+        source_field = np.asarray(source_field)
+        if source_field.shape[-1] != self.shape[1]:
+            raise ValueError(f'The field has {source_field.shape[-1]} values, the source lattice has {self.shape[1]} cells.')
+        products = source_field[..., self.indices] * self.weights
+        res = np.full(source_field.shape[:-1] + (self.shape[0],), self.fill_value, dtype=np.result_type(products, self.fill_value))
+        nonempty = np.diff(self.indptr) > 0
+        if self.nnz:
+            res[..., nonempty] = np.add.reduceat(products, self.indptr[:-1][nonempty], axis=-1)
+        return res
+
+    __call__ = apply
+
+    def integral(self, values: np.ndarray, side: Literal['source', 'target']) -> np.ndarray:
+        """
+        Integral of a field over its lattice: the area weighted sum of an intensive field, the sum of an extensive one
+        """
+        values = np.asarray(values)
+        if self.quantity == 'extensive':
+            return np.nansum(values, axis=-1)
+        return np.nansum(values * (self.source_area if side == 'source' else self.target_area), axis=-1)
+
+    def conservation_error(self, source_field: np.ndarray) -> np.ndarray:
+        """
+        Relative difference between the integrals of the transferred and of the source field. It is zero up to round-off
+        for the 'area' method when the target lattice covers the source lattice (extensive) or the other way around
+        (intensive).
+        """
+        source_integral = self.integral(source_field, 'source')
+        target_integral = self.integral(self.apply(source_field), 'target')
+        return (target_integral - source_integral) / np.where(source_integral == 0, 1, np.abs(source_integral))
+
+    def check_conservation(self, source_field: np.ndarray, rtol: float = 1e-9) -> None:
+        """
+        Raises:
+            ValueError: If the integral of the field is not conserved within rtol
+        """
+        error = np.max(np.abs(self.conservation_error(source_field)))
+        if error > rtol:
+            raise ValueError(f'The integral is not conserved by the transfer: relative error {error:.3e} > {rtol:.1e}.')
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Building
+# ---------------------------------------------------------------------------------------------------------------------
+def build_resampler(
+        source: HexLattice,
+        target: HexLattice,
+        method: ValidResampleMethods = 'area',
+        quantity: ValidQuantities = 'intensive',
+        fill_value: Optional[float] = None
+    ) -> ResampleOperator:
+    """
+    Build the operator transferring fields from `source` to `target`. Both lattices may differ in pitch and in cell
+    radius; the source cells are expected on the lattice of its pitch, as built by HexLattice.
+
+    Args:
+        method: 'area' weights by the overlap area of the hexagons (conservative), 'nearest' takes the source cell
+            containing the target centre, 'linear' interpolates linearly between the three source centres around the
+            target centre (the triangles of the dual mesh), falling back to 'nearest' at the boundary
+        quantity: 'intensive' fields are averaged, 'extensive' fields are split by the fraction of the source area.
+            Only 'area' supports 'extensive'
+        fill_value: Value of target cells without any source, NaN for intensive and 0 for extensive fields by default
+
+    Raises:
+        ValueError: If the method or the quantity is invalid
+    """
+    if quantity not in ('intensive', 'extensive'):
+        raise ValueError(f'Invalid quantity \'{quantity}\'. The valid quantities are {ValidQuantities}')
+    if method == 'area':
+        rows, cols, weights, coverage = _area_entries(source, target, quantity)
+    elif method in ('nearest', 'linear'):
+        if quantity == 'extensive':
+            raise ValueError(f'The method \'{method}\' interpolates values and only supports intensive quantities.')
+        rows, cols, weights = _nearest_entries(source, target) if method == 'nearest' else _linear_entries(source, target)
+        coverage = None
+    else:
+        raise ValueError(f'Invalid method \'{method}\'. The valid methods are {ValidResampleMethods}')
+
+    if fill_value is None:
+        fill_value = np.nan if quantity == 'intensive' else 0.
+    order = np.lexsort((cols, rows))
+    rows, cols, weights = rows[order], cols[order], weights[order]
+    indptr = np.zeros(len(target.HexCells) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(target.HexCells)), out=indptr[1:])
+    return ResampleOperator(indptr, cols, weights, source.area_array, target.area_array, method, quantity, coverage, fill_value)
+
+
+def _fractional_axial(points: np.ndarray, pitch: float) -> np.ndarray:
+    """
+    Fractional axial coordinates (..., 2) of cartesian points on a lattice of the given pitch, the inverse of the
+    conversion of CartesianCoordinate.converted_from_axial
+    """
+    z = - 2 * points[..., 1] / (np.sqrt(3) * pitch)
+    x = points[..., 0] / pitch - z / 2
+    return np.stack((x, z), axis=-1)
+
+
+def _containing_axial(points: np.ndarray, pitch: float) -> np.ndarray:
+    """
+    Axial coordinates of the hexagons of a lattice of the given pitch containing the points
+    """
+    return CubeCoordinate.to_axial_array(CubeCoordinate.round_array(CubeCoordinate.from_axial_array(_fractional_axial(points, pitch))))
+
+
+def _nearest_entries(source: HexLattice, target: HexLattice) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    cols = source.axial_grid.lookup(_containing_axial(target.centre_array, source.pitch))
+
+    # Target centres outside of the source lattice take the source cell with the nearest centre
+    outside = np.flatnonzero(cols < 0)
+    step = max(1, CHUNK_SIZE // max(1, len(source.HexCells)))
+    for start in range(0, len(outside), step):
+        chunk = outside[start:start + step]
+        squared = np.sum((target.centre_array[chunk, np.newaxis, :] - source.centre_array[np.newaxis, :, :]) ** 2, axis=-1)
+        cols[chunk] = np.argmin(squared, axis=1)
+    return np.arange(len(target.HexCells)), cols, np.ones(len(target.HexCells))
+
+
+def _linear_entries(source: HexLattice, target: HexLattice) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    frac = _fractional_axial(target.centre_array, source.pitch)
+    base = np.floor(frac).astype(np.int64)
+    a, b = (frac - base).T
+    upper = a + b > 1
+
+    # The rhombus (i, j), (i + 1, j), (i, j + 1), (i + 1, j + 1) is split along its short diagonal into two triangles
+    corners = np.stack((
+        np.where(upper[:, np.newaxis], base + (1, 1), base),
+        base + (1, 0),
+        base + (0, 1)
+    ), axis=1)
+    weights = np.stack((
+        np.where(upper, a + b - 1, 1 - a - b),
+        np.where(upper, 1 - b, a),
+        np.where(upper, 1 - a, b)
+    ), axis=1)
+    cols = source.axial_grid.lookup(corners)
+
+    # Targets whose triangle is not complete fall back to the nearest source cell
+    complete = np.all(cols >= 0, axis=1)
+    n_rows, n_cols, n_weights = _nearest_entries(source, target)
+    rows = np.concatenate((np.repeat(np.flatnonzero(complete), 3), n_rows[~complete]))
+    return rows, np.concatenate((cols[complete].ravel(), n_cols[~complete])), np.concatenate((weights[complete].ravel(), n_weights[~complete]))
+
+
+def _area_entries(source: HexLattice, target: HexLattice, quantity: ValidQuantities) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Candidates: source cells within the sum of the circumradii, searched around the source hexagon of the target centre
+    reach = target.radius_array.max(initial=0) + source.radius_array.max(initial=0) + source.pitch / np.sqrt(3)
+    offsets = range_offsets(int(np.ceil(reach / (source.pitch * np.sqrt(3) / 2))))
+    nearest_axial = _containing_axial(target.centre_array, source.pitch)
+
+    rows_list, cols_list, areas_list = list(), list(), list()
+    step = max(1, CHUNK_SIZE // len(offsets))
+    for start in range(0, len(target.HexCells), step):
+        rows = np.arange(start, min(start + step, len(target.HexCells)))
+        cols = source.axial_grid.lookup(nearest_axial[rows, np.newaxis, :] + offsets[np.newaxis, :, :])
+        rows = np.broadcast_to(rows[:, np.newaxis], cols.shape)
+        valid = cols >= 0
+        rows, cols = rows[valid], cols[valid]
+        distance = np.linalg.norm(target.centre_array[rows] - source.centre_array[cols], axis=-1)
+        close = distance < target.radius_array[rows] + source.radius_array[cols]
+        rows, cols = rows[close], cols[close]
+        areas = convex_intersection_area(source.vertex_array[cols], target.vertex_array[rows])
+        overlap = areas > AREA_TOLERANCE * np.minimum(source.area_array[cols], target.area_array[rows])
+        rows_list.append(rows[overlap])
+        cols_list.append(cols[overlap])
+        areas_list.append(areas[overlap])
+
+    rows = np.concatenate(rows_list) if rows_list else np.empty(0, dtype=np.int64)
+    cols = np.concatenate(cols_list) if cols_list else np.empty(0, dtype=np.int64)
+    areas = np.concatenate(areas_list) if areas_list else np.empty(0)
+    covered = np.bincount(rows, weights=areas, minlength=len(target.HexCells))
+    coverage = covered / target.area_array
+    if quantity == 'intensive':
+        weights = areas / covered[rows]
+    else:
+        weights = areas / source.area_array[cols]
+    return rows, cols, weights, coverage
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Polygon Clipping
+# ---------------------------------------------------------------------------------------------------------------------
+def convex_intersection_area(subject: np.ndarray, clip: np.ndarray) -> np.ndarray:
+    """
+    Areas of the intersections of pairs of convex polygons, with the Sutherland-Hodgman algorithm vectorized over
+    the pairs.
+
+    Args:
+        subject (np.ndarray): (m, k, 2) vertexes of the first polygons, counterclockwise
+        clip (np.ndarray): (m, l, 2) vertexes of the second polygons, counterclockwise
+
+    Returns:
+        np.ndarray: (m,) intersection areas
+    """
+    m, k, _ = subject.shape
+    size = k + clip.shape[1]
+    polygon = np.zeros((m, size, 2))
+    polygon[:, :k] = subject
+    count = np.full(m, k)
+    slots = np.arange(size)
+
+    for e in range(clip.shape[1]):
+        edge_start = clip[:, e, np.newaxis, :]
+        edge = clip[:, (e + 1) % clip.shape[1], np.newaxis, :] - edge_start
+
+        # Every edge p -> q of the polygon emits the crossing point if it crosses the clip edge, then q if q is inside
+        next_slot = np.where(slots[np.newaxis, :] + 1 < count[:, np.newaxis], slots[np.newaxis, :] + 1, 0)
+        p = polygon
+        q = np.take_along_axis(polygon, next_slot[..., np.newaxis], axis=1)
+        side_p = edge[..., 0] * (p[..., 1] - edge_start[..., 1]) - edge[..., 1] * (p[..., 0] - edge_start[..., 0])
+        side_q = edge[..., 0] * (q[..., 1] - edge_start[..., 1]) - edge[..., 1] * (q[..., 0] - edge_start[..., 0])
+        inside_p, inside_q = side_p >= 0, side_q >= 0
+        existing = slots[np.newaxis, :] < count[:, np.newaxis]
+
+        crossing = existing & (inside_p != inside_q)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(crossing, side_p / (side_p - side_q), 0)
+        emitted = np.stack((p + t[..., np.newaxis] * (q - p), q), axis=2).reshape(m, 2 * size, 2)
+        keep = np.stack((crossing, existing & inside_q), axis=2).reshape(m, 2 * size)
+
+        # Compact the kept points to the front of every row
+        order = np.argsort(~keep, axis=1, kind='stable')[:, :size]
+        polygon = np.take_along_axis(emitted, order[..., np.newaxis], axis=1)
+        count = np.minimum(keep.sum(axis=1), size)
+
+    next_slot = np.where(slots[np.newaxis, :] + 1 < count[:, np.newaxis], slots[np.newaxis, :] + 1, 0)
+    q = np.take_along_axis(polygon, next_slot[..., np.newaxis], axis=1)
+    cross = polygon[..., 0] * q[..., 1] - polygon[..., 1] * q[..., 0]
+    cross = np.where(slots[np.newaxis, :] < count[:, np.newaxis], cross, 0)
+    return np.where(count >= 3, np.abs(cross.sum(axis=1)) / 2, 0.)
@@ -0,0 +1,150 @@
+from typing import Literal, Optional, Sequence, Union
+
+import numpy as np
+from matplotlib.collections import PathCollection
+from matplotlib.colors import Normalize
+from matplotlib.cm import ScalarMappable
+from matplotlib.figure import Figure
+from matplotlib.path import Path as MplPath
+
+from .hex_lattice import HexLattice
+from .plot_config import PlotConfig
+from .profiling import RenderTimer, resolve_timer, profile_render
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Small Multiples
+# ---------------------------------------------------------------------------------------------------------------------
+def hexagon_paths(lattice: HexLattice) -> list[MplPath]:
+    """
+    One closed path per cell, built once from lattice.vertex_array and shared by the collections of every panel
+    """
+    vertexes = lattice.vertex_array
+    closed = np.concatenate((vertexes, vertexes[:, :1]), axis=1)
+    codes = np.array([MplPath.MOVETO] + [MplPath.LINETO] * 5 + [MplPath.CLOSEPOLY], dtype=MplPath.code_type)
+    return [MplPath(polygon, codes, readonly=True) for polygon in closed]
+
+
+def _grid_fields(fields: Union[np.ndarray, Sequence[np.ndarray]], n_cells: int, ncols: Optional[int]) -> np.ndarray:
+    """
+    The fields as an array (nrows, ncols, n) padded with nan panels
+    """
+    fields = np.asarray(fields, dtype=float)
+    if fields.ndim == 3 and fields.shape[-1] == n_cells:
+        return fields
+    if fields.ndim != 2 or fields.shape[-1] != n_cells:
+        raise ValueError(f'Expected fields of shape (k, {n_cells}) or (nrows, ncols, {n_cells}), received {fields.shape}.')
+    ncols = int(np.ceil(np.sqrt(len(fields)))) if ncols is None else ncols
+    nrows = int(np.ceil(len(fields) / ncols))
+    padded = np.full((nrows * ncols, n_cells), np.nan)
+    padded[:len(fields)] = fields
+    return padded.reshape(nrows, ncols, n_cells)
+
+
+def _row_norms(grid: np.ndarray, norm: Union[Literal['common', 'row'], Normalize]) -> list[Normalize]:
+    """
+    The normalisation of every row of panels
+    """
+    if isinstance(norm, Normalize):
+        return [norm] * len(grid)
+    if norm == 'common':
+        return [Normalize(np.nanmin(grid), np.nanmax(grid))] * len(grid)
+    if norm == 'row':
+        return [Normalize(np.nanmin(row), np.nanmax(row)) for row in grid]
+    raise ValueError(f'Invalid norm {norm!r}. The valid norms are \'common\', \'row\' and a Normalize instance.')
+
+
+def plot_grid(
+        lattice: HexLattice,
+        pc: PlotConfig,
+        fields: Union[np.ndarray, Sequence[np.ndarray]],
+        ncols: Optional[int] = None,
+        titles: Optional[Sequence[str]] = None,
+        norm: Union[Literal['common', 'row'], Normalize] = 'common',
+        colorbar: bool = True,
+        label: Optional[str] = None,
+        fig: Optional[Figure] = None,
+        timer: Optional[RenderTimer] = None
+    ) -> Figure:
+    """
+    Plot many fields of one lattice side by side, e.g. versions, burnup steps or axial planes. The hexagons are built
+    once and every panel is a single collection of those shared paths, coloured through one normalisation, so that a
+    large grid costs little more than one panel. The cells are not labelled.
+
+    Args:
+        lattice (HexLattice): The geometry shared by all panels
+        pc (PlotConfig): Plot configuration, pc.image_name is the title of the figure
+        fields (np.ndarray): (k, n) fields in the order of HexCells, laid out row by row in ncols columns, or
+            (nrows, ncols, n) fields, e.g. versions by burnup step. nan cells take the 'bad' colour of the colour map
+        ncols (int, optional): Number of columns of (k, n) fields, about sqrt(k) if None
+        titles (Sequence[str], optional): Title of every panel, row by row
+        norm ('common' | 'row' | Normalize): One colour scale for all panels, one per row of panels, or a given one
+        colorbar (bool): Add one colorbar for the common scale, or one per row
+        label (str, optional): Label of the colorbars
+        fig (Figure, optional): Target figure, pc.new_figure() if None
+        timer (RenderTimer, optional): Records the 'setup', 'colour mapping' and 'artist creation' stages
+
+    Returns:
+        Figure: The figure of the grid
+
+    Raises:
+        ValueError: If the fields do not match the lattice, or the norm is invalid
+    """
+    timer = resolve_timer(timer)
+    with profile_render(f'plot_grid-{pc.image_name}'):
+        with timer.stage('setup'):
+            grid = _grid_fields(fields, len(lattice.HexCells), ncols)
+            nrows, ncols = grid.shape[:2]
+            fig = pc.new_figure() if fig is None else fig
+            # A fixed layout: a layout engine would measure every panel at every draw, which costs more than the panels
+            axes = fig.subplots(
+                nrows, ncols, sharex=True, sharey=True, squeeze=False,
+                gridspec_kw={'left': 0.02, 'right': 0.98, 'bottom': 0.02, 'top': 0.92, 'wspace': 0.05, 'hspace': 0.15}
+            )
+            vertexes = lattice.vertex_array
+            axes[0, 0].set_xlim((np.min(vertexes[..., 0]) - pc.figure_expand, np.max(vertexes[..., 0]) + pc.figure_expand))
+            axes[0, 0].set_ylim((np.min(vertexes[..., 1]) - pc.figure_expand, np.max(vertexes[..., 1]) + pc.figure_expand))
+            for ax in axes.ravel():
+                ax.set_aspect('equal')
+                ax.axis('off')
+            paths = hexagon_paths(lattice)
+
+        with timer.stage('colour mapping'):
+            norms = _row_norms(grid, norm)
+            cmap = pc.color_map
+
+        with timer.stage('artist creation'):
+            patch_props = pc.patch_props
+            titles = list() if titles is None else list(titles)
+            title_props = {**pc.title_props, 'fontsize': pc.text_size}
+            for index, (ax, values) in enumerate(zip(axes.ravel(), grid.reshape(nrows * ncols, -1))):
+                if np.all(np.isnan(values)) and index >= len(titles):
+                    ax.set_visible(False)
+                    continue
+                collection = PathCollection(
+                    paths,
+                    array=np.ma.masked_invalid(values),
+                    cmap=cmap,
+                    norm=norms[index // ncols],
+                    edgecolors=pc.hex_edge_color,
+                    **patch_props
+                )
+                ax.add_collection(collection, autolim=False)
+                if index < len(titles):
+                    ax.set_title(titles[index], **title_props)
+
+            if colorbar:
+                # One colorbar per distinct scale, beside the rows sharing it
+                rows_of_norm: dict[int, list[int]] = dict()
+                for row, row_norm in enumerate(norms):
+                    rows_of_norm.setdefault(id(row_norm), list()).append(row)
+                for rows in rows_of_norm.values():
+                    bar = fig.colorbar(
+                        ScalarMappable(norms[rows[0]], cmap),
+                        ax=axes[rows].ravel().tolist(),
+                        label=label,
+                        fraction=0.03,
+                        pad=0.02
+                    )
+                    bar.ax.tick_params(labelsize=pc.text_size)
+            fig.suptitle(pc.image_name, **{key: value for key, value in pc.title_props.items() if key != 'y'})
+    return fig
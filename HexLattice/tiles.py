@@ -0,0 +1,465 @@
+"""
+A tile pyramid of one field of a large lattice, e.g. the pin powers of a whole core, and a small local web viewer
+to pan and zoom it. Tiles are PNG images of tile_size pixels addressed as z/x/y like web maps: zoom level z covers
+the lattice with 2^z by 2^z tiles, x counts from the left and y from the top. A tile is rendered when it is first
+requested and kept in a RenderCache, so that opening the viewer costs a few tiles rather than the full map.
+
+    pyramid = TilePyramid(core, pc, power, cache='/tmp/tiles')
+    with TileServer(pyramid) as server:
+        print(server.url)
+        server.serve_forever()
+"""
+import hashlib
+import io
+import json
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+from matplotlib.collections import PolyCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import Normalize, to_rgba
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+
+from .hex_lattice import HexLattice
+from .plot_config import PlotConfig
+from .render_cache import RenderCache
+from .resampling import _containing_axial
+
+# Version of the tile images, part of the cache keys
+TILE_VERSION = 1
+
+# Cells smaller than this many pixels are averaged into the pixels containing their centres
+AGGREGATE_PIXELS = 1.
+
+# Cells of at least this many pixels are outlined
+EDGE_PIXELS = 8.
+
+# Cells of at least this many pixels are labelled with their values, the finest zoom level by default
+LABEL_PIXELS = 48.
+
+# Font size of the labels as a fraction of the width of a cell
+LABEL_FONT_FRACTION = 0.25
+
+# Tiles are drawn at this dpi, their size is set in pixels
+TILE_DPI = 100
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Pyramid
+# ---------------------------------------------------------------------------------------------------------------------
+class TilePyramid:
+    """
+    Lazily rendered z/x/y tiles of one field of a lattice. The levels are drawn according to the size of the cells
+    on screen:
+
+        - cells below AGGREGATE_PIXELS are averaged per pixel, a pixel takes the mean value of the cell centres in it
+        - larger cells are rasterized by looking up the cell under every pixel, outlined from EDGE_PIXELS on
+        - cells of LABEL_PIXELS and more are drawn as hexagons by matplotlib and labelled with their values
+
+    All levels share one colour scale. Pixels outside of the lattice are transparent.
+
+    Args:
+        lattice (HexLattice): The geometry, a regular lattice of hexagons of the pitch
+        pc (PlotConfig): Colour map, edge colour and width, text colours and fonts of the tiles
+        values (np.ndarray, optional): (n,) values of the cells in the order of HexCells, lattice.value_list if
+            None; nan cells take the 'bad' colour of the colour map
+        cache (RenderCache | Path, optional): Cache of the rendered tiles, or its directory; tiles are rendered
+            every time if None
+        tile_size (int): Width and height of a tile in pixels
+        max_zoom (int, optional): Finest zoom level, the first one with labelled cells if None
+        norm (Normalize, optional): Colour scale, from the minimum to the maximum of the values if None
+
+    Example:
+        pyramid = TilePyramid(core, pc, core.fields['power'], cache=Path('cache/tiles'), norm=Normalize(0, 2))
+        Path('tile.png').write_bytes(pyramid.tile(3, 2, 5))
+    """
+
+    def __init__(
+            self,
+            lattice: HexLattice,
+            pc: PlotConfig,
+            values: Optional[np.ndarray] = None,
+            cache: Union[RenderCache, str, Path, None] = None,
+            tile_size: int = 256,
+            max_zoom: Optional[int] = None,
+            norm: Optional[Normalize] = None
+        ) -> None:
+        self.lattice = lattice
+        self.pc = pc
+        self.values = np.asarray(lattice._field_values(values), dtype=float)
+        self.cache = cache if cache is None or isinstance(cache, RenderCache) else RenderCache(Path(cache))
+        self.tile_size = tile_size
+        self.norm = Normalize(np.nanmin(self.values), np.nanmax(self.values)) if norm is None else norm
+        self.cmap = pc.color_map
+
+        # The world is the square around the hexagons, its top left corner is the origin of the tiles
+        vertexes = lattice.vertex_array.reshape(-1, 2)
+        low, high = vertexes.min(axis=0), vertexes.max(axis=0)
+        self.extent = float(np.max(high - low))
+        self.origin = np.array(((low[0] + high[0] - self.extent) / 2, (low[1] + high[1] + self.extent) / 2))
+        if max_zoom is None:
+            max_zoom = int(np.ceil(np.log2(max(1., LABEL_PIXELS * self.extent / (lattice.pitch * tile_size)))))
+        self.max_zoom = max_zoom
+        self.key = self._key()
+        self._locks: dict[tuple[int, int, int], threading.Lock] = dict()
+        self._locks_lock = threading.Lock()
+
+    def _key(self) -> str:
+        """
+        Hash of everything a tile depends on but its address
+        """
+        digest = hashlib.sha256()
+        digest.update(RenderCache.key(self.lattice, self.pc, values=self.values).encode())
+        digest.update(json.dumps([TILE_VERSION, self.tile_size, float(self.norm.vmin), float(self.norm.vmax)]).encode())
+        return digest.hexdigest()
+
+    def cell_pixels(self, z: int) -> float:
+        """
+        Distance in pixels between the centres of neighbouring cells at zoom level z
+        """
+        return self.lattice.pitch * self.tile_size * 2 ** z / self.extent
+
+    def tile_bounds(self, z: int, x: int, y: int) -> tuple[float, float, float, float]:
+        """
+        Cartesian bounds (left, right, bottom, top) of a tile
+        """
+        size = self.extent / 2 ** z
+        left, top = self.origin[0] + x * size, self.origin[1] - y * size
+        return left, left + size, top - size, top
+
+    @property
+    def metadata(self) -> dict:
+        """
+        The description of the pyramid read by the viewer
+        """
+        return {
+            'title': self.pc.image_name,
+            'tile_size': self.tile_size,
+            'max_zoom': self.max_zoom,
+            'vmin': float(self.norm.vmin),
+            'vmax': float(self.norm.vmax),
+        }
+
+    # -----------------------------------------------------------------------------------------------------------------
+    #                                                       Tiles
+    # -----------------------------------------------------------------------------------------------------------------
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        """
+        The PNG image of a tile, rendered on the first request and read from the cache afterwards. Concurrent
+        requests of one tile render it once.
+
+        Raises:
+            IndexError: If the tile is not in the pyramid
+        """
+        if not 0 <= z <= self.max_zoom or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise IndexError(f'No tile {z}/{x}/{y}, the zoom levels are 0 to {self.max_zoom} with 2^z by 2^z tiles.')
+        if self.cache is None:
+            return self.render_tile(z, x, y)
+
+        key = f'{self.key}-{z}-{x}-{y}'
+        with self._locks_lock:
+            lock = self._locks.setdefault((z, x, y), threading.Lock())
+        try:
+            with lock:
+                path = self.cache.get(key, 'png')
+                if path is not None:
+                    try:
+                        return path.read_bytes()
+                    except FileNotFoundError:
+                        # Evicted between get and read
+                        pass
+                data = self.render_tile(z, x, y)
+                self.cache.put_bytes(key, 'png', data)
+                return data
+        finally:
+            with self._locks_lock:
+                self._locks.pop((z, x, y), None)
+
+    def render_tile(self, z: int, x: int, y: int) -> bytes:
+        """
+        Render the PNG image of a tile, bypassing the cache
+        """
+        cell_pixels = self.cell_pixels(z)
+        if cell_pixels < AGGREGATE_PIXELS:
+            rgba = self._aggregated_tile(z, x, y)
+        elif cell_pixels < LABEL_PIXELS:
+            rgba = self._rasterized_tile(z, x, y, outline=cell_pixels >= EDGE_PIXELS)
+        else:
+            return self._drawn_tile(z, x, y, cell_pixels)
+        buffer = io.BytesIO()
+        imsave(buffer, rgba, format='png')
+        return buffer.getvalue()
+
+    def _pixel_centres(self, z: int, x: int, y: int) -> np.ndarray:
+        """
+        Cartesian coordinates (tile_size, tile_size, 2) of the pixel centres of a tile, rows from the top
+        """
+        left, right, bottom, top = self.tile_bounds(z, x, y)
+        steps = (np.arange(self.tile_size) + 0.5) / self.tile_size
+        xs, ys = np.meshgrid(left + steps * (right - left), top - steps * (top - bottom))
+        return np.stack((xs, ys), axis=-1)
+
+    def _aggregated_tile(self, z: int, x: int, y: int) -> np.ndarray:
+        left, right, bottom, top = self.tile_bounds(z, x, y)
+        scale = self.tile_size / (right - left)
+        centres = self.lattice.centre_array
+        columns = np.floor((centres[:, 0] - left) * scale).astype(np.int64)
+        rows = np.floor((top - centres[:, 1]) * scale).astype(np.int64)
+        valid = (columns >= 0) & (columns < self.tile_size) & (rows >= 0) & (rows < self.tile_size) & ~np.isnan(self.values)
+        pixels = rows[valid] * self.tile_size + columns[valid]
+        counts = np.bincount(pixels, minlength=self.tile_size ** 2)
+        sums = np.bincount(pixels, weights=self.values[valid], minlength=self.tile_size ** 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (sums / counts).reshape(self.tile_size, self.tile_size)
+        rgba = self.cmap(self.norm(means))
+        rgba[counts.reshape(self.tile_size, self.tile_size) == 0] = 0
+        return rgba
+
+    def _rasterized_tile(self, z: int, x: int, y: int, outline: bool) -> np.ndarray:
+        cells = self.lattice.axial_grid.lookup(_containing_axial(self._pixel_centres(z, x, y), self.lattice.pitch))
+        rgba = self.cmap(self.norm(np.ma.masked_invalid(self.values)))[cells]
+        rgba[cells < 0] = 0
+        if outline:
+            # A pixel whose cell differs from the one to its right or below lies on an edge
+            edges = np.zeros(cells.shape, dtype=bool)
+            edges[:, :-1] |= cells[:, :-1] != cells[:, 1:]
+            edges[:-1] |= cells[:-1] != cells[1:]
+            rgba[edges & (cells >= 0)] = to_rgba(self.pc.hex_edge_color)
+        return rgba
+
+    def _drawn_tile(self, z: int, x: int, y: int, cell_pixels: float) -> bytes:
+        pc = self.pc
+        left, right, bottom, top = self.tile_bounds(z, x, y)
+        margin = float(np.max(self.lattice.radius_array))
+        centres = self.lattice.centre_array
+        inside = np.flatnonzero(
+            (centres[:, 0] > left - margin) & (centres[:, 0] < right + margin)
+            & (centres[:, 1] > bottom - margin) & (centres[:, 1] < top + margin)
+        )
+
+        fig = Figure(figsize=(self.tile_size / TILE_DPI,) * 2, dpi=TILE_DPI)
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes((0, 0, 1, 1))
+        ax.set_xlim(left, right)
+        ax.set_ylim(bottom, top)
+        ax.axis('off')
+        values = np.ma.masked_invalid(self.values[inside])
+        colors = self.cmap(self.norm(values))
+        ax.add_collection(PolyCollection(
+            self.lattice.vertex_array[inside],
+            facecolors=colors,
+            edgecolors=pc.hex_edge_color,
+            **pc.patch_props
+        ), autolim=False)
+        if pc.show_text:
+            fontsize = LABEL_FONT_FRACTION * cell_pixels * 72 / TILE_DPI
+            text_props = pc.text_props
+            for (cx, cy), value, color in zip(centres[inside].tolist(), self.values[inside].tolist(), colors):
+                ax.text(cx, cy, round(value, 2), ha='center', va='center', fontsize=fontsize, color=pc.text_color_func(color), **text_props)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=TILE_DPI, transparent=True)
+        return buffer.getvalue()
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Viewer
+# ---------------------------------------------------------------------------------------------------------------------
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{{TITLE}}</title>
+<style>
+  html, body { margin: 0; height: 100%; overflow: hidden; background: #fff; font-family: sans-serif; }
+  #map { position: absolute; inset: 0; cursor: grab; touch-action: none; }
+  #map img { position: absolute; image-rendering: auto; user-select: none; -webkit-user-drag: none; }
+  #info { position: absolute; left: 8px; top: 8px; padding: 4px 8px; background: rgba(255, 255, 255, .8); }
+</style>
+</head>
+<body>
+<div id="map"></div>
+<div id="info"></div>
+<script>
+const META = {{META}};
+const map = document.getElementById('map');
+const info = document.getElementById('info');
+// The view is the zoom (continuous) and the position of the world origin on screen in pixels
+let view = { zoom: 0, x: 0, y: 0 };
+const tiles = new Map();
+
+function fit() {
+  const size = Math.min(map.clientWidth, map.clientHeight);
+  view.zoom = Math.log2(size / META.tile_size);
+  view.x = (map.clientWidth - size) / 2;
+  view.y = (map.clientHeight - size) / 2;
+}
+
+function draw() {
+  const level = Math.max(0, Math.min(META.max_zoom, Math.round(view.zoom)));
+  const size = META.tile_size * Math.pow(2, view.zoom - level);
+  const count = Math.pow(2, level);
+  const wanted = new Set();
+  const x0 = Math.max(0, Math.floor(-view.x / size)), x1 = Math.min(count - 1, Math.floor((map.clientWidth - view.x) / size));
+  const y0 = Math.max(0, Math.floor(-view.y / size)), y1 = Math.min(count - 1, Math.floor((map.clientHeight - view.y) / size));
+  for (let x = x0; x <= x1; x++) {
+    for (let y = y0; y <= y1; y++) {
+      const key = level + '/' + x + '/' + y;
+      wanted.add(key);
+      let img = tiles.get(key);
+      if (!img) {
+        img = document.createElement('img');
+        img.src = 'tiles/' + key + '.png';
+        tiles.set(key, img);
+        map.appendChild(img);
+      }
+      img.style.left = (view.x + x * size) + 'px';
+      img.style.top = (view.y + y * size) + 'px';
+      img.style.width = img.style.height = size + 'px';
+    }
+  }
+  for (const [key, img] of tiles) {
+    if (!wanted.has(key)) { img.remove(); tiles.delete(key); }
+  }
+  info.textContent = META.title + '  zoom ' + level + '/' + META.max_zoom + '  [' + META.vmin.toPrecision(4) + ', ' + META.vmax.toPrecision(4) + ']';
+}
+
+map.addEventListener('wheel', event => {
+  event.preventDefault();
+  const factor = Math.pow(2, -event.deltaY / 500);
+  const zoom = Math.max(-2, Math.min(META.max_zoom + 1, view.zoom + Math.log2(factor)));
+  const scale = Math.pow(2, zoom - view.zoom);
+  // Zoom about the cursor
+  view.x = event.clientX - (event.clientX - view.x) * scale;
+  view.y = event.clientY - (event.clientY - view.y) * scale;
+  view.zoom = zoom;
+  draw();
+}, { passive: false });
+
+let drag = null;
+map.addEventListener('pointerdown', event => { drag = { x: event.clientX, y: event.clientY }; map.setPointerCapture(event.pointerId); map.style.cursor = 'grabbing'; });
+map.addEventListener('pointermove', event => {
+  if (!drag) return;
+  view.x += event.clientX - drag.x;
+  view.y += event.clientY - drag.y;
+  drag = { x: event.clientX, y: event.clientY };
+  draw();
+});
+map.addEventListener('pointerup', () => { drag = null; map.style.cursor = 'grab'; });
+window.addEventListener('resize', draw);
+fit();
+draw();
+</script>
+</body>
+</html>
+"""
+
+def viewer_html(pyramid: TilePyramid) -> str:
+    """
+    The static page of the viewer of a pyramid, which loads its tiles from tiles/z/x/y.png relative to itself
+    """
+    metadata = pyramid.metadata
+    title = str(metadata['title']).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return VIEWER_HTML.replace('{{TITLE}}', title).replace('{{META}}', json.dumps(metadata).replace('</', '<\\/'))
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Server
+# ---------------------------------------------------------------------------------------------------------------------
+class _TileRequestHandler(BaseHTTPRequestHandler):
+    pyramid: TilePyramid
+
+    def do_GET(self) -> None:
+        path = self.path.split('?', 1)[0]
+        if path in ('/', '/index.html'):
+            self._send(HTTPStatus.OK, 'text/html; charset=utf-8', viewer_html(self.pyramid).encode())
+            return
+        if path == '/metadata.json':
+            self._send(HTTPStatus.OK, 'application/json', json.dumps(self.pyramid.metadata).encode())
+            return
+        parts = path.strip('/').split('/')
+        if len(parts) == 4 and parts[0] == 'tiles' and parts[3].endswith('.png'):
+            try:
+                z, x, y = int(parts[1]), int(parts[2]), int(parts[3][:-4])
+                data = self.pyramid.tile(z, x, y)
+            except (ValueError, IndexError):
+                pass
+            else:
+                # Tiles are immutable, the page of another field has another address
+                self._send(HTTPStatus.OK, 'image/png', data, {'Cache-Control': 'max-age=86400'})
+                return
+        self._send(HTTPStatus.NOT_FOUND, 'text/plain', b'Not found')
+
+    def _send(self, status: HTTPStatus, content_type: str, body: bytes, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class TileServer:
+    """
+    Serve the viewer of a pyramid at / and its tiles at /tiles/z/x/y.png over HTTP, rendering the tiles on a
+    thread per request. Meant for localhost: there is neither authentication nor encryption.
+
+    Args:
+        pyramid (TilePyramid): The tiles
+        address (tuple[str, int]): (host, port) to listen on, port 0 picks a free port, see `url`
+
+    Example:
+        with TileServer(pyramid, ('127.0.0.1', 8000)) as server:
+            server.serve_forever()
+    """
+
+    def __init__(self, pyramid: TilePyramid, address: tuple[str, int] = ('127.0.0.1', 0)) -> None:
+        self.pyramid = pyramid
+        handler = type('TileRequestHandler', (_TileRequestHandler,), {'pyramid': pyramid})
+        self._server = ThreadingHTTPServer(tuple(address), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._server.server_address[:2]
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f'http://{host}:{port}/'
+
+    def __enter__(self) -> 'TileServer':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """
+        Serve in a background thread
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name='tile-server', daemon=True)
+            self._thread.start()
+
+    def serve_forever(self) -> None:
+        """
+        Serve in the calling thread until close is called from another thread or the process is interrupted
+        """
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
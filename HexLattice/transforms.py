@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Lattice Transform
+# ---------------------------------------------------------------------------------------------------------------------
+# Rotation by 60 degrees clockwise in axial coordinates, the same rotation as AxialCoordinate.get_new_by_rotating(1):
+# cube [x, y, z] --> [-z, -x, -y], i.e. axial (x, z) --> (-z, x + z)
+_ROTATION = ((0, -1), (1, 1))
+
+# Reflection across the horizontal axis through the origin: cartesian (x, y) --> (x, -y), i.e. axial (x, z) --> (x + z, -z)
+_REFLECTION = ((1, 1), (0, -1))
+
+def _matmul(a: tuple, b: tuple) -> tuple:
+    return tuple(tuple(sum(a[i][k] * b[k][j] for k in range(2)) for j in range(2)) for i in range(2))
+
+def _matvec(a: tuple, v: tuple) -> tuple:
+    return tuple(a[i][0] * v[0] + a[i][1] * v[1] for i in range(2))
+
+def _matpow(a: tuple, n: int) -> tuple:
+    res = ((1, 0), (0, 1))
+    for _ in range(n):
+        res = _matmul(res, a)
+    return res
+
+
+@dataclass(frozen=True)
+class LatticeTransform:
+    """
+    A symmetry of the infinite hexagonal lattice, acting on axial coordinates as: axial' = matrix @ axial + offset.
+    Transforms are immutable and hashable, so two compositions giving the same map share one cached permutation.
+
+    Attributes:
+        matrix (tuple): 2x2 integer matrix, a rotation or a reflection
+        offset (tuple): Axial translation (dx, dz) applied after the matrix
+
+    Example:
+        # Rotate by 120 degrees clockwise, then mirror left to right
+        transform = LatticeTransform.rotation(2).then(LatticeTransform.reflection(3))
+    """
+    matrix: tuple[tuple[int, int], tuple[int, int]] = ((1, 0), (0, 1))
+    offset: tuple[int, int]                         = (0, 0)
+
+    @staticmethod
+    def identity() -> 'LatticeTransform':
+        return LatticeTransform()
+
+    @staticmethod
+    def translation(dx: int, dz: int) -> 'LatticeTransform':
+        """
+        Translation by an axial offset (dx, dz)
+        """
+        return LatticeTransform(offset=(int(dx), int(dz)))
+
+    @staticmethod
+    def rotation(num_of_rotation: int, centre: Sequence[int] = (0, 0)) -> 'LatticeTransform':
+        """
+        Rotation clockwise by num_of_rotation * 60 degrees around the hexagon at axial `centre`
+
+        Raises:
+            ValueError: If num_of_rotation is not an integer
+        """
+        if not isinstance(num_of_rotation, (int, np.integer)):
+            raise ValueError(f'Invalid number of rotaion {num_of_rotation}')
+        return LatticeTransform(_matpow(_ROTATION, int(num_of_rotation) % 6))._around(centre)
+
+    @staticmethod
+    def reflection(axis: int, centre: Sequence[int] = (0, 0)) -> 'LatticeTransform':
+        """
+        Reflection across one of the six symmetry axes through the hexagon at axial `centre`. Axis k makes an angle of
+        k * 30 degrees counterclockwise with the positive x-axis: the even axes pass through the centres of opposite
+        neighbours and the odd axes through the midpoints of opposite edges.
+
+        Raises:
+            ValueError: If axis is not an integer in [0, 6)
+        """
+        if not isinstance(axis, (int, np.integer)) or not 0 <= axis < 6:
+            raise ValueError(f'Invalid reflection axis {axis}, the valid axes are 0 to 5.')
+
+        # A reflection across an axis at angle t is the horizontal reflection followed by a rotation of 2t counterclockwise
+        return LatticeTransform(_matmul(_matpow(_ROTATION, -int(axis) % 6), _REFLECTION))._around(centre)
+
+    def _around(self, centre: Sequence[int]) -> 'LatticeTransform':
+        """
+        Conjugate a linear transform by the translation to `centre`
+        """
+        centre = (int(centre[0]), int(centre[1]))
+        moved = _matvec(self.matrix, centre)
+        return LatticeTransform(self.matrix, (centre[0] - moved[0] + self.offset[0], centre[1] - moved[1] + self.offset[1]))
+
+    def then(self, other: 'LatticeTransform') -> 'LatticeTransform':
+        """
+        The transform applying self first and other second
+        """
+        moved = _matvec(other.matrix, self.offset)
+        return LatticeTransform(_matmul(other.matrix, self.matrix), (moved[0] + other.offset[0], moved[1] + other.offset[1]))
+
+    def __matmul__(self, other: 'LatticeTransform') -> 'LatticeTransform':
+        """
+        Composition as functions: (a @ b)(p) == a(b(p))
+        """
+        return other.then(self)
+
+    def inverse(self) -> 'LatticeTransform':
+        (a, b), (c, d) = self.matrix
+        det = a * d - b * c
+        inverse_matrix = ((d * det, -b * det), (-c * det, a * det))
+        moved = _matvec(inverse_matrix, self.offset)
+        return LatticeTransform(inverse_matrix, (-moved[0], -moved[1]))
+
+    @property
+    def is_reflection(self) -> bool:
+        (a, b), (c, d) = self.matrix
+        return a * d - b * c < 0
+
+    def apply(self, axial: np.ndarray) -> np.ndarray:
+        """
+        Transform an array of axial coordinates (..., 2)
+        """
+        axial = np.asarray(axial)
+        return axial @ np.array(self.matrix).T + np.array(self.offset)
+
+
+# The twelve rotations and reflections around the origin
+POINT_SYMMETRIES = tuple(LatticeTransform.rotation(k) for k in range(6)) + tuple(LatticeTransform.reflection(k) for k in range(6))
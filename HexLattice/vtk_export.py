@@ -0,0 +1,330 @@
+"""
+Export of lattices and their fields for ParaView and other VTK based viewers. A HexLattice is written as hexagonal
+polygons, a HexZLattice as hexagonal prisms, one per cell and plane, with shared points. Two formats are supported:
+
+    .vtu    VTK XML unstructured grid with the arrays in a raw appended binary block, see write_vtu and write_pvd
+    .xmf    XDMF 3 with the arrays in flat binary files next to it, see XdmfWriter. The geometry is written once and
+            every timestep appends its fields, so campaigns of many timesteps only hold one timestep in memory.
+"""
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from .categorical import CategoricalField
+from .hex_lattice import HexLattice
+from .hex_z import HexZLattice
+from .zones import vertex_ids
+
+# VTK cell types
+VTK_POLYGON = 7
+VTK_HEXAGONAL_PRISM = 16
+
+# XDMF mixed topology type of a polyhedron, given by its faces
+XDMF_POLYHEDRON = 16
+
+_VTK_TYPES = {
+    'f4': 'Float32', 'f8': 'Float64',
+    'i1': 'Int8', 'i2': 'Int16', 'i4': 'Int32', 'i8': 'Int64',
+    'u1': 'UInt8', 'u2': 'UInt16', 'u4': 'UInt32', 'u8': 'UInt64',
+}
+_XDMF_TYPES = {'f': 'Float', 'i': 'Int', 'u': 'UInt'}
+
+FieldData = Union[np.ndarray, CategoricalField, str]
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Mesh
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class VtkMesh:
+    """
+    The unstructured grid of a lattice
+
+    Attributes:
+        points (np.ndarray): (p, 3) coordinates of the points, shared between the cells
+        connectivity (np.ndarray): (m, k) point indices of every cell, 6 for polygons and 12 for prisms
+        cell_type (int): VTK_POLYGON or VTK_HEXAGONAL_PRISM
+        shape (tuple): Shape of the fields of the source, (n_cells,) or (n_planes, n_cells); m is their product
+    """
+    points:         np.ndarray = field(repr=False)
+    connectivity:   np.ndarray = field(repr=False)
+    cell_type:      int
+    shape:          tuple
+
+    @property
+    def n_points(self) -> int:
+        return len(self.points)
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.connectivity)
+
+    @staticmethod
+    def from_lattice(lattice: HexLattice, plane_boundaries: Optional[Sequence[float]] = None) -> 'VtkMesh':
+        """
+        Hexagons at z = 0, or prisms between the plane boundaries, ordered plane after plane
+        """
+        vertex_id = vertex_ids(lattice.vertex_array, lattice.pitch)
+        n_vertexes = int(vertex_id.max()) + 1 if vertex_id.size else 0
+        points_2d = np.empty((n_vertexes, 2))
+        points_2d[vertex_id.reshape(-1)] = lattice.vertex_array.reshape(-1, 2)
+
+        if plane_boundaries is None:
+            points = np.column_stack((points_2d, np.zeros(n_vertexes)))
+            return VtkMesh(points, vertex_id, VTK_POLYGON, (len(vertex_id),))
+
+        boundaries = np.asarray(plane_boundaries, dtype=float)
+        points = np.column_stack((
+            np.tile(points_2d, (len(boundaries), 1)),
+            np.repeat(boundaries, n_vertexes)
+        ))
+        level = np.arange(len(boundaries) - 1)[:, np.newaxis, np.newaxis] * n_vertexes
+        connectivity = np.concatenate((vertex_id + level, vertex_id + level + n_vertexes), axis=-1)
+        return VtkMesh(points, connectivity.reshape(-1, 12), VTK_HEXAGONAL_PRISM, (len(boundaries) - 1, len(vertex_id)))
+
+    @staticmethod
+    def from_source(source: Union[HexLattice, HexZLattice, 'VtkMesh']) -> 'VtkMesh':
+        if isinstance(source, VtkMesh):
+            return source
+        if isinstance(source, HexZLattice):
+            return VtkMesh.from_lattice(source.lattice, source.plane_boundaries)
+        return VtkMesh.from_lattice(source)
+
+    def polyhedra(self) -> np.ndarray:
+        """
+        The prisms as XDMF mixed topology: [16, 8, 6, bottom face, 6, top face, 4, side face, ...] per cell, the faces
+        oriented outwards
+        """
+        bottom, top = self.connectivity[:, :6], self.connectivity[:, 6:]
+        following = np.roll(np.arange(6), -1)
+        sides = np.stack((bottom, bottom[:, following], top[:, following], top), axis=-1)
+        m = self.n_cells
+        return np.concatenate((
+            np.full((m, 1), XDMF_POLYHEDRON), np.full((m, 1), 8),
+            np.full((m, 1), 6), bottom[:, ::-1],
+            np.full((m, 1), 6), top,
+            np.concatenate((np.full((m, 6, 1), 4), sides), axis=-1).reshape(m, -1)
+        ), axis=1).reshape(-1)
+
+    def cell_data(self, values: np.ndarray) -> np.ndarray:
+        """
+        A field flattened in the order of the cells of the mesh
+
+        Raises:
+            ValueError: If the field does not have the shape of the source
+        """
+        values = np.asarray(values)
+        if values.shape != self.shape:
+            raise ValueError(f'Expected a field of shape {self.shape}, received {values.shape}.')
+        if values.dtype == bool:
+            values = values.astype(np.uint8)
+        elif values.dtype == np.float16:
+            # VTK and XDMF have no half precision
+            values = values.astype(np.float32)
+        return np.ascontiguousarray(values.reshape(-1), dtype=values.dtype.newbyteorder('<'))
+
+
+def _resolve_fields(source, fields: Optional[Mapping[str, FieldData]], shape: tuple) -> dict[str, np.ndarray]:
+    """
+    Field arrays by name: names of the fields of the source are looked up, categorical fields give their ids and
+    encoded fields are decoded. Stacked fields (..., *shape) are split into the arrays name[0] ... name[k - 1], as the
+    columns of frames.to_frame.
+    """
+    if fields is None:
+        fields = {name: name for name in source.fields} if isinstance(source, (HexLattice, HexZLattice)) else dict()
+    res_dict = dict()
+    for name, values in fields.items():
+        if isinstance(values, str):
+            values = source.fields[values]
+        if isinstance(values, CategoricalField):
+            values = values.values
+        values = np.asarray(values)
+        if values.ndim > len(shape) and values.shape[values.ndim - len(shape):] == tuple(shape):
+            res_dict.update({f'{name}[{i}]': array for i, array in enumerate(values.reshape((-1,) + tuple(shape)))})
+        else:
+            res_dict[name] = values
+    return res_dict
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           VTU
+# ---------------------------------------------------------------------------------------------------------------------
+def _write_block(stream: BinaryIO, array: np.ndarray) -> None:
+    stream.write(np.uint64(array.nbytes).tobytes())
+    stream.write(memoryview(np.ascontiguousarray(array)).cast('B'))
+
+
+def write_vtu(
+        path: Union[str, Path],
+        source: Union[HexLattice, HexZLattice, VtkMesh],
+        fields: Optional[Mapping[str, FieldData]] = None
+    ) -> Path:
+    """
+    Write the mesh of a lattice and its cell fields as a VTK XML unstructured grid with appended raw binary data.
+    The arrays are streamed to the file one after the other, without assembling the file in memory.
+
+    Args:
+        path (Path): Path of the .vtu file, its directory is created if needed
+        source (HexLattice | HexZLattice | VtkMesh): The lattice, or its mesh to reuse it between timesteps
+        fields (Mapping, optional): Arrays of the shape of the source, CategoricalFields or names of fields of the
+            source; all fields of the source if None. Stacked fields become the arrays name[0] ... name[k - 1]
+
+    Returns:
+        Path: path
+    """
+    mesh = VtkMesh.from_source(source)
+    fields = _resolve_fields(source, fields, mesh.shape)
+    arrays = [
+        ('Points', mesh.points.astype('<f8'), 3),
+        ('connectivity', mesh.connectivity.reshape(-1).astype('<i8'), 1),
+        ('offsets', np.arange(1, mesh.n_cells + 1, dtype='<i8') * mesh.connectivity.shape[1], 1),
+        ('types', np.full(mesh.n_cells, mesh.cell_type, dtype=np.uint8), 1),
+    ]
+    cell_arrays = [(name, mesh.cell_data(values), 1) for name, values in fields.items()]
+
+    root = ET.Element('VTKFile', type='UnstructuredGrid', version='1.0', byte_order='LittleEndian', header_type='UInt64')
+    piece = ET.SubElement(ET.SubElement(root, 'UnstructuredGrid'), 'Piece', NumberOfPoints=str(mesh.n_points), NumberOfCells=str(mesh.n_cells))
+    parents = {
+        'Points': ET.SubElement(piece, 'Points'),
+        'connectivity': (cells := ET.SubElement(piece, 'Cells')), 'offsets': cells, 'types': cells,
+    }
+    cell_data = ET.SubElement(piece, 'CellData')
+    offset = 0
+    for name, array, components in arrays + cell_arrays:
+        ET.SubElement(
+            parents.get(name, cell_data),
+            'DataArray',
+            type=_VTK_TYPES[array.dtype.str[1:]],
+            Name=name,
+            NumberOfComponents=str(components),
+            format='appended',
+            offset=str(offset)
+        )
+        offset += 8 + array.nbytes
+    ET.SubElement(root, 'AppendedData', encoding='raw').text = '_'
+
+    # Split the document where the raw data goes
+    head, tail = ET.tostring(root, encoding='unicode').split('_</AppendedData>')
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as stream:
+        stream.write(b'<?xml version="1.0"?>\n' + head.encode() + b'_')
+        for _, array, _ in arrays + cell_arrays:
+            _write_block(stream, array)
+        stream.write(('\n</AppendedData>' + tail + '\n').encode())
+    return path
+
+
+def write_pvd(path: Union[str, Path], timesteps: Sequence[tuple[float, Union[str, Path]]]) -> Path:
+    """
+    Write a ParaView collection of .vtu files, one per timestep, referenced relative to the .pvd file
+    """
+    path = Path(path)
+    root = ET.Element('VTKFile', type='Collection', version='1.0', byte_order='LittleEndian')
+    collection = ET.SubElement(root, 'Collection')
+    for time, file in timesteps:
+        file = Path(file)
+        reference = file.relative_to(path.parent) if file.is_absolute() == path.is_absolute() and file.is_relative_to(path.parent) else file
+        ET.SubElement(collection, 'DataSet', timestep=repr(float(time)), part='0', file=reference.as_posix())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(root).write(path, encoding='unicode', xml_declaration=True)
+    return path
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           XDMF
+# ---------------------------------------------------------------------------------------------------------------------
+class XdmfWriter:
+    """
+    Write a campaign of timesteps as XDMF 3 with binary heavy data: `<stem>.geometry.bin` holds the points and the
+    topology once, `<stem>.fields.bin` the fields of all timesteps one after the other. The XML is rewritten after
+    every timestep, so an interrupted campaign is readable up to its last complete timestep.
+
+    Args:
+        path (Path): Path of the .xmf file
+        source (HexLattice | HexZLattice | VtkMesh): The lattice whose fields are written
+
+    Example:
+        with XdmfWriter('campaign/core.xmf', core) as writer:
+            for time, power in solver.steps():
+                writer.write_timestep(time, {'power': power})
+    """
+
+    def __init__(self, path: Union[str, Path], source: Union[HexLattice, HexZLattice, VtkMesh]) -> None:
+        self.path = Path(path)
+        self.source = source
+        self.mesh = VtkMesh.from_source(source)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.geometry_path = self.path.with_name(f'{self.path.stem}.geometry.bin')
+        self.fields_path = self.path.with_name(f'{self.path.stem}.fields.bin')
+
+        points = self.mesh.points.astype('<f8')
+        topology = (self.mesh.polyhedra() if self.mesh.cell_type == VTK_HEXAGONAL_PRISM else self.mesh.connectivity).astype('<i8')
+        with open(self.geometry_path, 'wb') as stream:
+            stream.write(memoryview(np.ascontiguousarray(points)).cast('B'))
+            stream.write(memoryview(np.ascontiguousarray(topology)).cast('B'))
+        self._topology_item = (topology.dtype, len(topology), points.nbytes)
+        self._stream = open(self.fields_path, 'wb')
+        self._timesteps: list[tuple[float, list[tuple[str, np.dtype, int]]]] = list()
+
+    def __enter__(self) -> 'XdmfWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if not self._stream.closed:
+            self._stream.close()
+            self._write_xml()
+
+    def write_timestep(self, time: float, fields: Optional[Mapping[str, FieldData]] = None) -> None:
+        """
+        Append the fields of one timestep, see write_vtu for the accepted fields
+        """
+        entries = list()
+        for name, values in _resolve_fields(self.source, fields, self.mesh.shape).items():
+            data = self.mesh.cell_data(values)
+            entries.append((name, data.dtype, self._stream.tell()))
+            self._stream.write(memoryview(data).cast('B'))
+        self._stream.flush()
+        self._timesteps.append((float(time), entries))
+        self._write_xml()
+
+    def _data_item(self, parent: ET.Element, dtype: np.dtype, dimensions: str, seek: int, file: Path) -> None:
+        item = ET.SubElement(
+            parent,
+            'DataItem',
+            Dimensions=dimensions,
+            NumberType='UChar' if dtype == np.uint8 else _XDMF_TYPES[dtype.kind],
+            Precision=str(dtype.itemsize),
+            Format='Binary',
+            Endian='Little',
+            Seek=str(seek)
+        )
+        item.text = file.name
+
+    def _write_xml(self) -> None:
+        root = ET.Element('Xdmf', Version='3.0')
+        collection = ET.SubElement(ET.SubElement(root, 'Domain'), 'Grid', Name=self.path.stem, GridType='Collection', CollectionType='Temporal')
+        topology_dtype, topology_length, topology_seek = self._topology_item
+        for i, (time, entries) in enumerate(self._timesteps):
+            grid = ET.SubElement(collection, 'Grid', Name=f'{self.path.stem}-{i}', GridType='Uniform')
+            ET.SubElement(grid, 'Time', Value=repr(time))
+            if self.mesh.cell_type == VTK_HEXAGONAL_PRISM:
+                element = ET.SubElement(grid, 'Topology', TopologyType='Mixed', NumberOfElements=str(self.mesh.n_cells))
+                self._data_item(element, topology_dtype, str(topology_length), topology_seek, self.geometry_path)
+            else:
+                element = ET.SubElement(grid, 'Topology', TopologyType='Polygon', NodesPerElement='6', NumberOfElements=str(self.mesh.n_cells))
+                self._data_item(element, topology_dtype, f'{self.mesh.n_cells} 6', topology_seek, self.geometry_path)
+            element = ET.SubElement(grid, 'Geometry', GeometryType='XYZ')
+            self._data_item(element, np.dtype('<f8'), f'{self.mesh.n_points} 3', 0, self.geometry_path)
+            for name, dtype, seek in entries:
+                element = ET.SubElement(grid, 'Attribute', Name=name, AttributeType='Scalar', Center='Cell')
+                self._data_item(element, dtype, str(self.mesh.n_cells), seek, self.fields_path)
+
+        # Write next to the file and rename, so that readers never see a partial document
+        ET.indent(root)
+        tmp_path = self.path.with_name(f'.{self.path.name}.tmp')
+        ET.ElementTree(root).write(tmp_path, encoding='unicode', xml_declaration=True)
+        tmp_path.replace(self.path)
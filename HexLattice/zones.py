@@ -0,0 +1,210 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Edge k of a pointy hexagon joins its vertexes k and k + 1, see POINTY_UNIT_VERTEXES, and faces the neighbour in
+# direction EDGE_DIRECTIONS[k] of DIRACTIONS: edge 0 at 60 degrees faces top-right, edge 5 at 0 degrees faces right
+EDGE_DIRECTIONS = np.array([5, 4, 3, 2, 1, 0])
+
+# Vertexes closer than this fraction of the pitch are the same vertex
+VERTEX_TOLERANCE = 1e-6
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Edges
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class EdgeSet:
+    """
+    The edges of a lattice, each shared edge once.
+
+    Attributes:
+        cells (np.ndarray): (m, 2) indices of the two cells of every edge, the second is -1 on the outer boundary
+        segments (np.ndarray): (m, 2, 2) end points of every edge
+    """
+    cells:      np.ndarray = field(repr=False)
+    segments:   np.ndarray = field(repr=False)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    @property
+    def is_outer(self) -> np.ndarray:
+        return self.cells[:, 1] < 0
+
+    def borders(self, categories: np.ndarray) -> np.ndarray:
+        """
+        (m,) bool mask of the edges between cells of different categories, and of the outer edges
+        """
+        categories = np.asarray(categories)
+        other = categories[np.maximum(self.cells[:, 1], 0)]
+        return self.is_outer | (categories[self.cells[:, 0]] != other)
+
+
+def unique_edges(vertex_array: np.ndarray, neighbour_table: np.ndarray) -> EdgeSet:
+    """
+    The edges of the cells with vertexes `vertex_array` (n, 6, 2) and neighbours `neighbour_table` (n, 6). An edge
+    between two cells is taken from the cell of the lower index.
+    """
+    neighbours = neighbour_table[:, EDGE_DIRECTIONS]
+    cell = np.arange(len(neighbour_table))[:, np.newaxis]
+    keep = (neighbours < 0) | (cell < neighbours)
+    cell_index, edge_index = np.nonzero(keep)
+    cells = np.stack((cell_index, neighbours[cell_index, edge_index]), axis=-1)
+    segments = np.stack((vertex_array[cell_index, edge_index], vertex_array[cell_index, (edge_index + 1) % 6]), axis=1)
+    return EdgeSet(cells, segments)
+
+
+def vertex_ids(points: np.ndarray, pitch: float) -> np.ndarray:
+    """
+    Number the points (..., 2), equal numbers for the points closer than VERTEX_TOLERANCE * pitch
+    """
+    quantized = np.round(points / (VERTEX_TOLERANCE * pitch)).astype(np.int64).reshape(-1, 2)
+    if len(quantized) == 0:
+        return np.zeros(points.shape[:-1], dtype=np.int64)
+    _, ids = np.unique(quantized, axis=0, return_inverse=True)
+    return ids.reshape(points.shape[:-1])
+
+
+def chain_segments(segments: np.ndarray, pitch: float = 1) -> list[np.ndarray]:
+    """
+    Join segments (m, 2, 2) at their shared end points into polylines, so that every point is written once per
+    polyline instead of once per segment. The walks start from the points with an odd number of segments, where
+    polylines have to end anyway, which keeps the number of polylines low.
+
+    Returns:
+        list[np.ndarray]: Polylines (k, 2), together covering every segment once
+    """
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+    ids = vertex_ids(segments, pitch)
+    n_vertexes = int(ids.max()) + 1 if len(segments) else 0
+    points = np.empty((n_vertexes, 2))
+    points[ids.ravel()] = segments.reshape(-1, 2)
+
+    # The segments of every vertex, as compressed rows
+    ends = ids.ravel()
+    order = np.argsort(ends, kind='stable')
+    incident = (order // 2).tolist()
+    row_start = np.searchsorted(ends[order], np.arange(n_vertexes + 1)).tolist()
+    next_slot = row_start[:-1]
+    degree = np.diff(row_start)
+    segment_ends = ids.tolist()
+    used = [False] * len(segments)
+
+    def next_segment(vertex: int) -> int:
+        slot = next_slot[vertex]
+        while slot < row_start[vertex + 1] and used[incident[slot]]:
+            slot += 1
+        next_slot[vertex] = slot
+        return incident[slot] if slot < row_start[vertex + 1] else -1
+
+    polylines = list()
+    for start in np.concatenate((np.flatnonzero(degree % 2 == 1), np.flatnonzero(degree % 2 == 0))).tolist():
+        segment = next_segment(start)
+        while segment >= 0:
+            walk = [start]
+            vertex = start
+            while segment >= 0:
+                used[segment] = True
+                first, second = segment_ends[segment]
+                vertex = second if first == vertex else first
+                walk.append(vertex)
+                segment = next_segment(vertex)
+            polylines.append(points[walk])
+            segment = next_segment(start)
+    return polylines
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Regions
+# ---------------------------------------------------------------------------------------------------------------------
+def label_regions(neighbour_table: np.ndarray, categories: np.ndarray) -> np.ndarray:
+    """
+    Label the connected regions of cells of equal category. Every cell starts with its own index as label, then the
+    labels are lowered to the smallest label among the neighbours of the same category and shortcut by pointer
+    jumping, until nothing changes; the number of iterations grows with the logarithm of the region diameter.
+
+    Args:
+        neighbour_table (np.ndarray): (n, 6) neighbour indices of every cell, -1 for a missing neighbour
+        categories (np.ndarray): (n,) category of every cell, e.g. a material id
+
+    Returns:
+        np.ndarray: (n,) region of every cell, numbered from 0 in the order of the first cell of each region
+    """
+    categories = np.asarray(categories)
+    if categories.shape != (len(neighbour_table),):
+        raise ValueError(f'Expected {len(neighbour_table)} categories, one per cell, received an array of shape {categories.shape}.')
+    cell, direction = np.nonzero(neighbour_table >= 0)
+    other = neighbour_table[cell, direction]
+    same = categories[cell] == categories[other]
+    cell, other = cell[same], other[same]
+
+    labels = np.arange(len(neighbour_table))
+    while True:
+        lowered = labels.copy()
+        np.minimum.at(lowered, cell, labels[other])
+        lowered = lowered[lowered]
+        while True:
+            jumped = lowered[lowered]
+            if np.array_equal(jumped, lowered):
+                break
+            lowered = jumped
+        if np.array_equal(lowered, labels):
+            break
+        labels = lowered
+
+    # Every label is now the smallest cell index of its region
+    _, regions = np.unique(labels, return_inverse=True)
+    return regions.reshape(-1)
+
+
+def boundary_polylines(
+        vertex_array: np.ndarray,
+        neighbour_table: np.ndarray,
+        regions: np.ndarray,
+        pitch: float = 1
+    ) -> dict[int, list[np.ndarray]]:
+    """
+    The closed outlines of every region: the edges of its cells which do not face a cell of the same region, chained
+    at shared vertexes. Outer outlines run counterclockwise and the outlines of holes clockwise.
+
+    Args:
+        vertex_array (np.ndarray): (n, 6, 2) vertexes of the cells
+        neighbour_table (np.ndarray): (n, 6) neighbour indices of every cell, -1 for a missing neighbour
+        regions (np.ndarray): (n,) region of every cell, see label_regions
+        pitch (float): Pitch of the lattice, which scales the tolerance of shared vertexes
+
+    Returns:
+        dict[int, list[np.ndarray]]: The outlines (k + 1, 2) of every region, the first point repeated at the end
+    """
+    regions = np.asarray(regions)
+    neighbours = neighbour_table[:, EDGE_DIRECTIONS]
+    other = np.where(neighbours >= 0, regions[np.maximum(neighbours, 0)], -1)
+    cell_index, edge_index = np.nonzero((neighbours < 0) | (other != regions[:, np.newaxis]))
+
+    # Number the vertexes, so that the edges of neighbouring cells meet at the same number
+    vertex_id = vertex_ids(vertex_array, pitch)
+    start = vertex_id[cell_index, edge_index]
+    end = vertex_id[cell_index, (edge_index + 1) % 6]
+    edge_region = regions[cell_index]
+
+    # The successor of an edge is the edge of the same region starting where it ends
+    n_vertexes = int(vertex_id.max()) + 1 if vertex_id.size else 0
+    start_key = edge_region * n_vertexes + start
+    order = np.argsort(start_key, kind='stable')
+    successor = order[np.searchsorted(start_key[order], edge_region * n_vertexes + end)]
+
+    points = vertex_array[cell_index, edge_index]
+    res_dict: dict[int, list[np.ndarray]] = {int(region): list() for region in np.unique(regions)}
+    visited = np.zeros(len(cell_index), dtype=bool)
+    for first in range(len(cell_index)):
+        if visited[first]:
+            continue
+        loop = [first]
+        visited[first] = True
+        edge = successor[first]
+        while edge != first:
+            loop.append(edge)
+            visited[edge] = True
+            edge = successor[edge]
+        outline = points[loop]
+        res_dict[int(edge_region[first])].append(np.concatenate((outline, outline[:1])))
+    return res_dict
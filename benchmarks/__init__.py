@@ -0,0 +1,6 @@
+"""
+Benchmark suite of HexLatticePlot. Run it from the repository root with
+
+    python -m benchmarks run -o benchmarks/results/<commit>.json
+    python -m benchmarks compare benchmarks/results/<base>.json benchmarks/results/<head>.json
+"""
@@ -0,0 +1,46 @@
+"""
+Command line entry of the benchmark suite, see `python -m benchmarks --help`
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from . import bench_coordinates, bench_lattice, bench_render, bench_codecs
+from .harness import run, compare
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='HexLatticePlot benchmark suite')
+    sub_parsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub_parsers.add_parser('run', help='run the benchmarks and write a JSON report')
+    run_parser.add_argument('-k', '--pattern', default=None, help='only run benchmarks whose name contains PATTERN')
+    run_parser.add_argument('-o', '--output', type=Path, default=None, help='path of the JSON report')
+    run_parser.add_argument('-r', '--repeat', type=int, default=None, help='override the number of repeats')
+    run_parser.add_argument('--quick', action='store_true', help='smallest parameters only, one repeat')
+
+    compare_parser = sub_parsers.add_parser('compare', help='compare two JSON reports')
+    compare_parser.add_argument('base', type=Path)
+    compare_parser.add_argument('head', type=Path)
+    compare_parser.add_argument('--time-threshold', type=float, default=0.1, help='allowed relative slow down')
+    compare_parser.add_argument('--memory-threshold', type=float, default=0.1, help='allowed relative memory growth')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args.pattern, args.quick, args.repeat, args.output)
+        return 0
+
+    comparisons = compare(json.loads(args.base.read_text()), json.loads(args.head.read_text()))
+    regressions = 0
+    for c in comparisons:
+        is_regression = c.is_regression(args.time_threshold, args.memory_threshold)
+        regressions += is_regression
+        print(f'{"!" if is_regression else " "} {c.name:<40} {c.param:<12} '
+              f'time x{c.time_ratio:6.3f}   memory x{c.memory_ratio:6.3f}')
+    print(f'{regressions} regression(s) in {len(comparisons)} comparison(s)')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Benchmarks of the compact field encodings: encoded size, encode and decode throughput and the decoding errors
+"""
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from HexLattice import FieldCodec, EncodedField
+
+from .bench_lattice import valued_lattice
+from .harness import benchmark
+
+CODEC_RING = 20
+CODEC_STEPS = 64
+CODEC_PLANES = 8
+
+CODECS = {
+    'float64':          FieldCodec('float64'),
+    'float32':          FieldCodec('float32'),
+    'float16':          FieldCodec('float16'),
+    'float32-delta':    FieldCodec('float32', delta=True),
+    'quantized':        FieldCodec(tolerance=5e-4),
+    'quantized-delta':  FieldCodec(tolerance=5e-4, delta=True),
+}
+
+@lru_cache(maxsize=None)
+def campaign_field() -> np.ndarray:
+    """
+    A power map (steps, planes, n) as in a depletion campaign: a smooth radial and axial shape, a slow drift over
+    the steps and a little noise
+    """
+    lattice = valued_lattice(CODEC_RING)
+    radius = np.linalg.norm(lattice.centre_array, axis=-1) / CODEC_RING
+    axial = np.sin(np.linspace(0.2, np.pi - 0.2, CODEC_PLANES))
+    drift = 1 + 0.002 * np.arange(CODEC_STEPS)
+    rng = np.random.default_rng(CODEC_RING)
+    shape = drift[:, np.newaxis, np.newaxis] * axial[np.newaxis, :, np.newaxis] * np.cos(0.9 * radius)[np.newaxis, np.newaxis, :]
+    return shape + 1e-4 * rng.standard_normal(shape.shape)
+
+
+def _encoded(name: str) -> tuple[np.ndarray, EncodedField]:
+    values = campaign_field()
+    return values, CODECS[name].encode(values)
+
+
+@lru_cache(maxsize=None)
+def codec_metrics(name: str) -> dict:
+    """
+    The size and the errors of an encoding, measured outside of the timed runs
+    """
+    values, encoded = _encoded(name)
+    return {
+        'ratio': encoded.compression_ratio,
+        'max_error': float(np.max(np.abs(np.asarray(encoded) - values))),
+        'error_bound': CODECS[name].error_bound(values),
+    }
+
+
+@benchmark(params=tuple(CODECS), setup=lambda name: (campaign_field(), CODECS[name], codec_metrics(name)), repeat=3, quick_params=('quantized-delta',))
+def encode(codec_args):
+    values, codec, metrics = codec_args
+    start = time.perf_counter()
+    codec.encode(values)
+    return {'mb_per_s': values.nbytes / (time.perf_counter() - start) / 2 ** 20, **metrics}
+
+
+@benchmark(params=tuple(CODECS), setup=_encoded, repeat=3, quick_params=('quantized-delta',))
+def decode_all(encoded_args):
+    values, encoded = encoded_args
+    start = time.perf_counter()
+    np.asarray(encoded)
+    return {'mb_per_s': values.nbytes / (time.perf_counter() - start) / 2 ** 20}
+
+
+@benchmark(params=tuple(CODECS), setup=_encoded, repeat=10, quick_params=('quantized-delta',))
+def decode_one_step(encoded_args):
+    _, encoded = encoded_args
+    encoded[CODEC_STEPS // 2]
@@ -0,0 +1,85 @@
+"""
+Benchmarks of the coordinate conversions in HexLattice/coordinates.py
+"""
+from HexLattice.coordinates import (
+    AxialCoordinate, RingCoordinate, CubeCoordinate, DoubleWidthCoordinate, CartesianCoordinate, Coordinate
+)
+
+from .harness import benchmark
+
+COORD_CLASSES = {
+    'ring'          : RingCoordinate,
+    'cube'          : CubeCoordinate,
+    'double_width'  : DoubleWidthCoordinate,
+    'cartesian'     : CartesianCoordinate,
+}
+BATCH_SIZES = (100, 1000, 10000)
+
+def _axial_batch(size: int) -> list[AxialCoordinate]:
+    """
+    The first `size` axial coordinates of a hexagonal lattice, ordered ring by ring
+    """
+    r_max = 0
+    while 3 * r_max * (r_max + 1) + 1 < size:
+        r_max += 1
+    coords = [AxialCoordinate(x, z) for x in range(-r_max, r_max + 1) for z in range(-r_max, r_max + 1) if abs(x + z) <= r_max]
+    coords.sort(key=lambda c: max(abs(c.x), abs(c.z), abs(c.x + c.z)))
+    return coords[:size]
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Scalar
+# ---------------------------------------------------------------------------------------------------------------------
+@benchmark(params=tuple(COORD_CLASSES), setup=lambda name: (COORD_CLASSES[name], AxialCoordinate(3, -2)), repeat=20)
+def scalar_from_axial(args):
+    coord_class, axial = args
+    for _ in range(100):
+        coord_class.converted_from_axial(axial)
+
+
+@benchmark(
+    params=('ring', 'cube', 'double_width'),
+    setup=lambda name: COORD_CLASSES[name].converted_from_axial(AxialCoordinate(3, -2)),
+    repeat=20
+)
+def scalar_to_axial(coord):
+    for _ in range(100):
+        coord.convert_to_axial()
+
+
+@benchmark(setup=lambda _: AxialCoordinate(3, -2), repeat=20)
+def scalar_rotate(axial):
+    for k in range(100):
+        axial.get_new_by_rotating(k)
+
+
+@benchmark(setup=lambda _: AxialCoordinate(3, -2), repeat=20)
+def scalar_coordinate_all(axial):
+    for _ in range(100):
+        Coordinate(axial)
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Batch
+# ---------------------------------------------------------------------------------------------------------------------
+@benchmark(params=BATCH_SIZES, setup=_axial_batch, repeat=5)
+def batch_ring_from_axial(axials):
+    [RingCoordinate.converted_from_axial(axial) for axial in axials]
+
+
+@benchmark(params=BATCH_SIZES, setup=lambda size: [RingCoordinate.converted_from_axial(a) for a in _axial_batch(size)], repeat=5)
+def batch_ring_to_axial(rings):
+    [ring.convert_to_axial() for ring in rings]
+
+
+@benchmark(params=BATCH_SIZES, setup=_axial_batch, repeat=5)
+def batch_cartesian_from_axial(axials):
+    [CartesianCoordinate.converted_from_axial(axial) for axial in axials]
+
+
+@benchmark(params=BATCH_SIZES, setup=_axial_batch, repeat=5)
+def batch_coordinate_all(axials):
+    [Coordinate(axial) for axial in axials]
+
+
+@benchmark(params=(5, 10, 25, 50, 100), repeat=3, quick_params=(5, 10))
+def get_all_coord_by_r(r_max):
+    RingCoordinate.get_all_coord_by_r(r_max)
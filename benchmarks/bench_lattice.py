@@ -0,0 +1,76 @@
+"""
+Benchmarks of HexLattice construction and its value properties
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from HexLattice import RingCoordinate, HexCell, HexLattice
+
+from .harness import benchmark
+
+LATTICE_RINGS = (5, 10, 20)
+
+@lru_cache(maxsize=None)
+def ring_cells(r_max: int) -> tuple[HexCell]:
+    return tuple(HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(r_max))
+
+
+@lru_cache(maxsize=None)
+def valued_lattice(r_max: int) -> HexLattice:
+    """
+    A lattice of all cells with r <= r_max, valued with reproducible random numbers
+    """
+    lattice = HexLattice(list(ring_cells(r_max)))
+    rng = np.random.default_rng(r_max)
+    for hex_cell, value in zip(lattice.HexCells, rng.random(len(lattice.HexCells))):
+        hex_cell.value = float(value)
+    return lattice
+
+
+@benchmark(params=LATTICE_RINGS, setup=lambda r_max: list(ring_cells(r_max)), repeat=3, quick_params=(5,))
+def hex_lattice_init(cells):
+    HexLattice(cells)
+
+
+@benchmark(params=LATTICE_RINGS, setup=valued_lattice, repeat=10)
+def value_list(lattice):
+    lattice.value_list
+
+
+@benchmark(params=LATTICE_RINGS, setup=valued_lattice, repeat=10)
+def normed_value_list(lattice):
+    lattice.normed_value_list
+
+
+def valued_grid(r_max: int) -> tuple[HexLattice, np.ndarray]:
+    lattice = valued_lattice(r_max)
+    lattice.axial_grid.neighbour_count
+    return lattice, lattice.to_grid()
+
+
+@benchmark(params=LATTICE_RINGS, setup=valued_grid, repeat=10)
+def smooth_10_iterations(grid_args):
+    lattice, dense = grid_args
+    lattice.axial_grid.smooth(dense, iterations=10)
+
+
+@benchmark(params=LATTICE_RINGS, setup=valued_grid, repeat=10)
+def gradient(grid_args):
+    lattice, dense = grid_args
+    lattice.axial_grid.gradient(dense, lattice.pitch)
+
+
+def smooth_field(r_max: int) -> tuple[HexLattice, np.ndarray]:
+    """
+    A lattice with its dual mesh built and a smooth field, whose isolines are long polylines as in a power map
+    """
+    lattice = valued_lattice(r_max)
+    lattice.dual_triangles
+    return lattice, np.cos(np.linalg.norm(lattice.centre_array, axis=-1) / r_max * np.pi)
+
+
+@benchmark(params=LATTICE_RINGS, setup=smooth_field, repeat=10)
+def contour_lines_10_levels(field_args):
+    lattice, values = field_args
+    lattice.contour_lines(values, levels=10)
@@ -0,0 +1,125 @@
+"""
+Benchmarks of the matplotlib rendering and the file export
+"""
+import logging
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import get_args
+
+import numpy as np
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.axes._axes import Axes
+from matplotlib.figure import Figure
+
+from HexLattice import HexLattice, PlotConfig, plot_grid
+from HexLattice.plot_config import AllowedImageType
+
+from .bench_lattice import valued_lattice
+from .harness import benchmark
+
+RENDER_RINGS = (5, 10, 20)
+EXPORT_RING = 10
+
+# PlotConfig asks for 'Times New Roman', which is missing on most benchmark machines
+logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+@dataclass
+class RenderCase:
+    lattice:    HexLattice
+    pc:         PlotConfig
+    fig:        Figure
+    ax:         Axes
+
+
+def bench_plot_config(image_name: str, show_text: bool = True, **kwargs) -> PlotConfig:
+    """
+    A PlotConfig which renders without a TeX installation, so that the benchmarks run everywhere
+    """
+    return PlotConfig(image_name, text_usetex=False, show_text=show_text, figure_dpi=100, **kwargs)
+
+
+def _render_case(r_max: int, show_text: bool = True, **kwargs) -> RenderCase:
+    fig = plt.figure()
+    ax = fig.subplots()
+    return RenderCase(valued_lattice(r_max), bench_plot_config(f'r{r_max}', show_text, **kwargs), fig, ax)
+
+
+def _close(case: RenderCase) -> None:
+    plt.close(case.fig)
+
+
+@benchmark(params=RENDER_RINGS, setup=_render_case, teardown=_close, repeat=5)
+def setup_ax(case):
+    case.lattice._setup_ax(case.pc, case.ax)
+
+
+@benchmark(params=RENDER_RINGS, setup=_render_case, teardown=_close, repeat=3, quick_params=(5,))
+def plot_hex_labels(case):
+    case.lattice.plot_hex(case.pc, case.ax)
+    case.fig.canvas.draw()
+
+
+@benchmark(params=RENDER_RINGS, setup=lambda r: _render_case(r, False), teardown=_close, repeat=3, quick_params=(5,))
+def plot_hex_no_labels(case):
+    case.lattice.plot_hex(case.pc, case.ax)
+    case.fig.canvas.draw()
+
+
+@benchmark(params=RENDER_RINGS, setup=_render_case, teardown=_close, repeat=3, quick_params=(5,))
+def plot_circle_labels(case):
+    case.lattice.plot_circle(case.pc, case.ax)
+    case.fig.canvas.draw()
+
+
+@benchmark(params=RENDER_RINGS, setup=lambda r: _render_case(r, False), teardown=_close, repeat=3, quick_params=(5,))
+def plot_circle_no_labels(case):
+    case.lattice.plot_circle(case.pc, case.ax)
+    case.fig.canvas.draw()
+
+
+def _export_case(image_type: AllowedImageType) -> RenderCase:
+    case = _render_case(EXPORT_RING, image_type=image_type, image_root_dir=Path(tempfile.mkdtemp()))
+    case.lattice.plot_hex(case.pc, case.ax)
+    return case
+
+
+def _close_export(case: RenderCase) -> None:
+    case.pc.image_path.unlink(missing_ok=True)
+    case.pc.image_root_dir.rmdir()
+    _close(case)
+
+
+@benchmark(
+    params=get_args(AllowedImageType),
+    setup=_export_case,
+    teardown=_close_export,
+    repeat=3,
+    quick_params=get_args(AllowedImageType)
+)
+def export(case):
+    case.fig.savefig(case.pc.image_path)
+
+
+@benchmark(params=RENDER_RINGS, setup=lambda r: (valued_lattice(r), bench_plot_config(f'r{r}')), repeat=3, quick_params=(5,))
+def render_isolated(args):
+    lattice, pc = args
+    lattice.render(pc).canvas.draw()
+
+
+# Number of panels of the small-multiples benchmark
+GRID_PANELS = 48
+
+def _grid_case(r_max: int) -> tuple[HexLattice, PlotConfig, np.ndarray]:
+    lattice = valued_lattice(r_max)
+    fields = np.random.default_rng(r_max).random((GRID_PANELS, len(lattice.HexCells)))
+    return lattice, bench_plot_config(f'grid-r{r_max}', figure_size=(16, 12)), fields
+
+
+@benchmark(params=RENDER_RINGS, setup=_grid_case, repeat=3, quick_params=(5,))
+def plot_grid_48_panels(args):
+    lattice, pc, fields = args
+    plot_grid(lattice, pc, fields, ncols=8).canvas.draw()
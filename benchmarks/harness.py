@@ -0,0 +1,234 @@
+"""
+A small, dependency free benchmark harness.
+
+Benchmarks are plain functions registered with the `benchmark` decorator. Every benchmark is timed with
+`time.perf_counter` over several repeats and then run once more under `tracemalloc` to record the peak
+memory. A benchmark may return a dict of further JSON serializable metrics, e.g. a
+compression ratio, which is recorded with its timings. Results are written as JSON so that two runs (e.g. two commits) can be compared with `compare`.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Registry
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class Benchmark:
+    """
+    A registered benchmark
+
+    Attributes:
+        name (str): Unique name of the benchmark, e.g. 'coordinates.ring_to_axial'
+        func (Callable): The timed function. It receives the object returned by `setup`
+        params (Sequence): Parameters the benchmark is run with, one result per parameter
+        setup (Callable): Untimed preparation, called with the parameter. Defaults to returning the parameter
+        teardown (Callable): Untimed clean-up, called with the object returned by `setup` after every run
+        repeat (int): Number of timed runs per parameter
+        quick_params (Sequence): Parameters used by a quick run. Defaults to the first parameter
+    """
+    name:           str
+    func:           Callable[[Any], Any]
+    params:         Sequence[Any]                   = (None,)
+    setup:          Optional[Callable[[Any], Any]]  = None
+    teardown:       Optional[Callable[[Any], Any]]  = None
+    repeat:         int                             = 5
+    quick_params:   Optional[Sequence[Any]]         = None
+
+    def prepare(self, param: Any) -> Any:
+        return param if self.setup is None else self.setup(param)
+
+    def clean(self, prepared: Any) -> None:
+        if self.teardown is not None:
+            self.teardown(prepared)
+
+
+BENCHMARKS: dict[str, Benchmark] = dict()
+
+def benchmark(
+        name:           Optional[str]                   = None,
+        params:         Sequence[Any]                   = (None,),
+        setup:          Optional[Callable[[Any], Any]]  = None,
+        teardown:       Optional[Callable[[Any], Any]]  = None,
+        repeat:         int                             = 5,
+        quick_params:   Optional[Sequence[Any]]         = None
+    ) -> Callable:
+    """
+    Register the decorated function as a benchmark.
+
+    Example:
+        @benchmark(params=(5, 10), setup=build_lattice)
+        def value_list(lattice):
+            lattice.value_list
+    """
+    def decorator(func: Callable) -> Callable:
+        bench_name = f'{func.__module__.split(".")[-1].removeprefix("bench_")}.{func.__name__}' if name is None else name
+        if bench_name in BENCHMARKS:
+            raise KeyError(f'The benchmark \'{bench_name}\' is registered twice.')
+        BENCHMARKS[bench_name] = Benchmark(bench_name, func, tuple(params), setup, teardown, repeat, quick_params)
+        return func
+    return decorator
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Running
+# ---------------------------------------------------------------------------------------------------------------------
+def run_one(bench: Benchmark, param: Any, repeat: Optional[int] = None) -> dict:
+    """
+    Time a benchmark for one parameter and measure its peak traced memory.
+
+    Returns:
+        dict: A JSON serializable result record
+    """
+    repeat = bench.repeat if repeat is None else repeat
+    times = list()
+    metrics = None
+    for _ in range(repeat):
+        prepared = bench.prepare(param)
+        start = time.perf_counter()
+        metrics = bench.func(prepared)
+        times.append(time.perf_counter() - start)
+        bench.clean(prepared)
+
+    # The memory run is separated from the timed runs because tracing slows the interpreter down
+    prepared = bench.prepare(param)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        bench.func(prepared)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        bench.clean(prepared)
+
+    res_dict = {
+        'name'              : bench.name,
+        'param'             : repr(param),
+        'repeat'            : repeat,
+        'times'             : times,
+        'min'               : min(times),
+        'median'            : statistics.median(times),
+        'mean'              : statistics.fmean(times),
+        'stdev'             : statistics.stdev(times) if len(times) > 1 else 0.,
+        'peak_memory_bytes' : peak,
+    }
+    if isinstance(metrics, dict):
+        res_dict['metrics'] = metrics
+    return res_dict
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        res = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return res.stdout.strip()
+
+
+def _metadata() -> dict:
+    import matplotlib
+    import numpy as np
+    return {
+        'commit'        : _git_commit(),
+        'timestamp'     : datetime.now(timezone.utc).isoformat(),
+        'python'        : platform.python_version(),
+        'platform'      : platform.platform(),
+        'numpy'         : np.__version__,
+        'matplotlib'    : matplotlib.__version__,
+    }
+
+
+def run(
+        pattern:    Optional[str]           = None,
+        quick:      bool                    = False,
+        repeat:     Optional[int]           = None,
+        output:     Optional[Path]          = None,
+        log:        Optional[Callable]      = print
+    ) -> dict:
+    """
+    Run all registered benchmarks whose name contains `pattern`.
+
+    Args:
+        pattern (str, optional): Substring filter on benchmark names
+        quick (bool): Only run the quick parameters with a single repeat, useful as a smoke test
+        repeat (int, optional): Override the number of repeats of every benchmark
+        output (Path, optional): Write the JSON report to this file
+        log (Callable, optional): Called with one line of progress per result
+
+    Returns:
+        dict: The report, {'meta': {...}, 'results': [...]}
+    """
+    results = list()
+    for bench in BENCHMARKS.values():
+        if pattern is not None and pattern not in bench.name:
+            continue
+        params = bench.params
+        if quick:
+            params = bench.params[:1] if bench.quick_params is None else bench.quick_params
+            repeat = 1 if repeat is None else repeat
+        for param in params:
+            res = run_one(bench, param, repeat)
+            results.append(res)
+            if log is not None:
+                log(f'{res["name"]:<40} {res["param"]:<12} median {res["median"] * 1e3:10.3f} ms   '
+                    f'peak {res["peak_memory_bytes"] / 2 ** 20:9.3f} MiB'
+                    + ''.join(f'   {key} {value:.4g}' for key, value in res.get('metrics', dict()).items()))
+
+    report = {'meta': _metadata(), 'results': results}
+    if output is not None:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(json.dumps(report, indent=2))
+    return report
+
+# ---------------------------------------------------------------------------------------------------------------------
+#                                                           Comparing
+# ---------------------------------------------------------------------------------------------------------------------
+@dataclass
+class Comparison:
+    """
+    The comparison of one benchmark result between a base and a head report
+
+    Attributes:
+        time_ratio (float): head median time / base median time
+        memory_ratio (float): head peak memory / base peak memory
+    """
+    name:           str
+    param:          str
+    base_median:    float
+    head_median:    float
+    base_memory:    int
+    head_memory:    int
+    time_ratio:     float = field(init=False)
+    memory_ratio:   float = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.time_ratio   = self.head_median / self.base_median if self.base_median > 0 else float('inf')
+        self.memory_ratio = self.head_memory / self.base_memory if self.base_memory > 0 else 1.
+
+    def is_regression(self, time_threshold: float, memory_threshold: float) -> bool:
+        return self.time_ratio > 1 + time_threshold or self.memory_ratio > 1 + memory_threshold
+
+
+def compare(base: dict, head: dict) -> list[Comparison]:
+    """
+    Pair the results of two reports by (name, param). Results only present in one report are skipped.
+    """
+    base_results = {(res['name'], res['param']): res for res in base['results']}
+    comparisons = list()
+    for res in head['results']:
+        key = (res['name'], res['param'])
+        if key not in base_results:
+            continue
+        base_res = base_results[key]
+        comparisons.append(Comparison(
+            res['name'], res['param'],
+            base_res['median'], res['median'],
+            base_res['peak_memory_bytes'], res['peak_memory_bytes']
+        ))
+    return comparisons
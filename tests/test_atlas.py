@@ -0,0 +1,44 @@
+import re
+
+import numpy as np
+import pytest
+from matplotlib.colors import Normalize
+from matplotlib.image import imread
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig, AtlasWriter
+
+def _lattice() -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(3)])
+
+def _plot_config() -> PlotConfig:
+    return PlotConfig('atlas', text_usetex=False, figure_dpi=20, figure_size=(3, 3), text_size=4)
+
+def test_pages_and_contact_sheet(tmp_path):
+    lattice = _lattice()
+    rng = np.random.default_rng(0)
+    with AtlasWriter(tmp_path / 'atlas.pdf', lattice, _plot_config(), contact_sheet=tmp_path / 'sheet.png', thumbnail_size=32, sheet_columns=3) as atlas:
+        for page in range(7):
+            values = rng.random(len(lattice.HexCells)) * (page + 1)
+            atlas.add_page(values, title=f'assembly {page}')
+            # Every page is scaled to its own values and the artists are reused
+            assert atlas._collection.norm.vmax == pytest.approx(values.max())
+            assert atlas._labels[0].get_text() == str(round(values[0], 2))
+        artists = len(atlas.fig.axes[0].get_children())
+        atlas.add_page(np.full(len(lattice.HexCells), np.nan))
+        assert len(atlas.fig.axes[0].get_children()) == artists
+
+    assert atlas.stats.pages == 8 and atlas.stats.pages_per_second > 0
+    assert len(re.findall(rb'/Type\s*/Page\b', (tmp_path / 'atlas.pdf').read_bytes())) == 8
+    assert imread(tmp_path / 'sheet.png').shape[:2] == (3 * 32, 3 * 32)
+    with pytest.raises(ValueError):
+        atlas.add_page(np.zeros(len(lattice.HexCells)))
+
+def test_fixed_norm(tmp_path):
+    lattice = _lattice()
+    atlas = AtlasWriter(tmp_path / 'atlas.pdf', lattice, _plot_config(), norm=Normalize(0, 2), colorbar=False)
+    atlas.add_page(np.linspace(0, 1, len(lattice.HexCells)), labels=['x'] * len(lattice.HexCells))
+    assert (atlas._collection.norm.vmin, atlas._collection.norm.vmax) == (0, 2)
+    assert atlas._labels[3].get_text() == 'x'
+    with pytest.raises(ValueError):
+        atlas.add_page(np.zeros(3))
+    assert atlas.close().pages == 1
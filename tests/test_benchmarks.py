@@ -0,0 +1,25 @@
+from benchmarks.harness import Benchmark, run_one, compare
+
+def test_run_and_compare():
+    """
+    A result records the timings and the peak memory, and identical reports compare without regression
+    """
+    bench = Benchmark('test.allocate', lambda n: bytearray(n), params=(2 ** 20,), repeat=3)
+    res = run_one(bench, 2 ** 20)
+    assert len(res['times']) == 3
+    assert res['min'] <= res['median']
+    assert res['peak_memory_bytes'] >= 2 ** 20
+    
+    slower = dict(res, median=res['median'] * 2)
+    comparisons = compare({'results': [res]}, {'results': [slower]})
+    assert len(comparisons) == 1
+    assert comparisons[0].is_regression(time_threshold=0.1, memory_threshold=0.1)
+    assert not compare({'results': [res]}, {'results': [res]})[0].is_regression(0.1, 0.1)
+    assert 'metrics' not in res
+
+def test_metrics():
+    """
+    A dict returned by a benchmark is recorded as its metrics
+    """
+    bench = Benchmark('test.metrics', lambda n: {'size': n}, params=(3,), repeat=2)
+    assert run_one(bench, 3)['metrics'] == {'size': 3}
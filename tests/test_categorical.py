@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig, CategoricalField
+
+def _lattice() -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(3)])
+
+def test_encoding(tmp_path):
+    ids = np.array([7, 3, 3, 12, 7])
+    field = CategoricalField.from_ids(ids, names={3: 'fuel'}, colors={12: 'red'})
+    assert field.codes.dtype == np.uint8
+    assert field.ids.tolist() == [3, 7, 12] and field.names == ['fuel', '7', '12']
+    assert np.array_equal(field.values, ids)
+    assert np.allclose(field.rgba()[3], [1, 0, 0, 1])
+    assert field.counts().tolist() == [2, 2, 1]
+    assert [handle.get_label() for handle in field.legend_handles()] == ['fuel', '7', '12']
+
+    variant = field.variant([12, 12, 3, 3, 3])
+    assert variant.names == field.names and variant.counts().tolist() == [3, 0, 2]
+    with pytest.raises(ValueError):
+        field.variant([1, 3, 3, 3, 3])
+
+    field.save(tmp_path / 'field.npz')
+    loaded = CategoricalField.load(tmp_path / 'field.npz')
+    assert np.array_equal(loaded.codes, field.codes) and loaded.names == field.names
+    assert CategoricalField.from_ids(np.arange(1000)).codes.dtype == np.uint16
+
+def test_stacked_variants():
+    patterns = np.random.default_rng(0).integers(0, 5, (100, 37))
+    field = CategoricalField.from_ids(patterns)
+    assert field.codes.shape == (100, 37) and field.codes.nbytes == 3700
+    assert np.array_equal(field[42].values, patterns[42])
+
+def test_plot_categories():
+    hl = _lattice()
+    ring = np.max(np.abs(hl.cube_array), axis=1)
+    hl.add_field('material', CategoricalField.from_ids(ring, names={0: 'centre'}))
+    pc = PlotConfig('material', text_usetex=False, figure_dpi=30, figure_size=(4, 4))
+    fig = hl.render(pc, categories='material')
+    ax = fig.axes[0]
+    assert [text.get_text() for text in ax.get_legend().get_texts()] == ['centre', '1', '2', '3']
+    assert len(ax.patches) == 0 and np.allclose(ax.collections[0].get_facecolors(), hl.fields['material'].rgba())
+    assert ax.texts[0].get_text() == hl.fields['material'].names[hl.fields['material'].codes[0]]
+    with pytest.raises(ValueError):
+        hl.add_field('bad', np.zeros(5))
+
+def test_large_map_is_one_collection():
+    """
+    A load-pattern map of tens of thousands of cells is drawn by one collection, in both shapes
+    """
+    hl = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(60)])
+    assert len(hl.HexCells) > 10000
+    field = CategoricalField.from_ids(np.random.default_rng(0).integers(0, 7, (8, len(hl.HexCells))))
+    pc = PlotConfig('pattern', text_usetex=False, show_text=False, figure_dpi=20)
+    for shape in ('hex', 'circle'):
+        ax = hl.render(pc, shape=shape, categories=field[3]).axes[0]
+        assert len(ax.patches) == 0 and len(ax.texts) == 0 and len(ax.collections) == 1
+        assert np.allclose(ax.collections[0].get_facecolors(), field[3].rgba())
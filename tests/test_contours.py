@@ -0,0 +1,63 @@
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig
+
+def _lattice() -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(6)], pitch=1.5)
+
+def test_dual_mesh():
+    lattice = _lattice()
+    triangles = lattice.dual_triangles
+    # A hexagon of rings 0..r has 6 r^2 triangles between its centres
+    assert len(triangles) == 6 * 6 ** 2
+    assert len(np.unique(np.sort(triangles, axis=-1), axis=0)) == len(triangles)
+    sides = np.linalg.norm(lattice.centre_array[triangles] - lattice.centre_array[np.roll(triangles, 1, axis=-1)], axis=-1)
+    assert np.allclose(sides, 1.5)
+
+def test_linear_field():
+    lattice = _lattice()
+    values = lattice.centre_array[:, 0]
+    lines = lattice.contour_lines(values, levels=[-2.1, 0.4, 3.3])
+    for level, polylines in lines.items():
+        # A straight line across the lattice, merged into one polyline
+        assert len(polylines) == 1
+        assert np.allclose(polylines[0][:, 0], level)
+
+def test_closed_loops():
+    lattice = _lattice()
+    values = np.linalg.norm(lattice.centre_array, axis=-1)
+    lines = lattice.contour_lines(values, levels=3)
+    assert len(lines) == 3
+    for level, polylines in lines.items():
+        assert len(polylines) == 1
+        assert np.allclose(polylines[0][0], polylines[0][-1])
+        assert np.all(np.abs(np.linalg.norm(polylines[0], axis=-1) - level) < 0.1 * level)
+
+def test_nan_and_plot():
+    lattice = _lattice()
+    values = lattice.centre_array[:, 1].copy()
+    values[0] = np.nan
+    pc = PlotConfig('contours', text_usetex=False, show_text=False, figure_dpi=20, figure_size=(3, 3))
+    fig, ax = plt.subplots()
+    lattice.plot_hex(pc, ax, values=np.nan_to_num(values))
+    collection = lattice.plot_contours(pc, ax, values=values, levels=[-3., 0., 3.], colors=['red', 'green', 'blue'])
+    assert len(collection.get_segments()) >= 3
+    assert np.allclose(collection.get_colors()[0], [1, 0, 0, 1])
+    plt.close(fig)
+
+def test_rgb_tuple_is_one_color():
+    """
+    An RGB tuple colours every line, even with as many levels as the tuple has components
+    """
+    lattice = _lattice()
+    pc = PlotConfig('contours', text_usetex=False, show_text=False, figure_dpi=20, figure_size=(3, 3))
+    fig, ax = plt.subplots()
+    # |y| has two lines per level
+    levels = [1.5, 3., 4.5]
+    collection = lattice.plot_contours(pc, ax, values=np.abs(lattice.centre_array[:, 1]), levels=levels, colors=(0., 0., 1.))
+    assert len(collection.get_segments()) > len(levels)
+    assert np.allclose(collection.get_colors(), [0, 0, 1, 1])
+    plt.close(fig)
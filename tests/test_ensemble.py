@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, EnsembleAccumulator
+
+def _runs(n_runs: int = 300) -> tuple[HexLattice, np.ndarray, np.ndarray]:
+    hl = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(2)])
+    rng = np.random.default_rng(0)
+    keff = 1 + 0.01 * rng.standard_normal(n_runs)
+    runs = 1e3 + 5 * rng.standard_normal((n_runs, len(hl.HexCells))) + 300 * np.outer(keff, np.linspace(-1, 1, len(hl.HexCells)))
+    return hl, runs, keff
+
+def test_moments_match_numpy():
+    """
+    Single runs and chunks give the moments and correlations of the whole ensemble, despite the large mean
+    """
+    hl, runs, keff = _runs()
+    acc = EnsembleAccumulator(hl, reservoir_size=1000, seed=0)
+    for run, reference in zip(runs[:50], keff[:50]):
+        acc.add(run, reference)
+    acc.add_chunk(runs[50:], keff[50:])
+    assert acc.count == len(runs)
+    assert np.allclose(acc.mean, runs.mean(axis=0))
+    assert np.allclose(acc.std, runs.std(axis=0, ddof=1))
+    assert np.array_equal(acc.min, runs.min(axis=0)) and np.array_equal(acc.max, runs.max(axis=0))
+    expected = [np.corrcoef(runs[:, i], keff)[0, 1] for i in range(runs.shape[1])]
+    assert np.allclose(acc.correlation(), expected)
+
+    # Exact while every run fits in the reservoir
+    assert np.allclose(acc.quantile([0.1, 0.9]), np.quantile(runs, [0.1, 0.9], axis=0))
+
+def test_merge_and_storage(tmp_path):
+    hl, runs, keff = _runs()
+    parts = list()
+    for i, (chunk, references) in enumerate(zip(np.array_split(runs, 3), np.array_split(keff, 3))):
+        acc = EnsembleAccumulator(hl, reservoir_size=64, seed=i)
+        acc.add_chunk(chunk, references)
+        acc.save(tmp_path / f'{i}.npz')
+        parts.append(EnsembleAccumulator.load(tmp_path / f'{i}.npz', hl, seed=i))
+    total = parts[0].merge(parts[1]).merge(parts[2])
+    assert total.count == len(runs)
+    assert np.allclose(total.mean, runs.mean(axis=0)) and np.allclose(total.variance(), runs.var(axis=0, ddof=1))
+    assert np.allclose(total.correlation(), [np.corrcoef(runs[:, i], keff)[0, 1] for i in range(runs.shape[1])])
+
+    # The reservoir is a sample of the runs, and its median is close to the ensemble median
+    assert np.abs(total.quantile(0.5) - np.median(runs, axis=0)).max() < 3 * runs.std(axis=0).max() / np.sqrt(64)
+
+    fields = total.add_to_lattice('power ')
+    assert set(fields) == {'power mean', 'power std', 'power min', 'power max', 'power p05', 'power p50', 'power p95', 'power correlation'}
+    assert np.array_equal(hl.fields['power mean'], total.mean)
+
+def test_reference_must_be_consistent():
+    hl, runs, keff = _runs(4)
+    acc = EnsembleAccumulator(hl)
+    acc.add(runs[0], keff[0])
+    with pytest.raises(ValueError):
+        acc.add(runs[1])
+    with pytest.raises(ValueError):
+        acc.add(runs[1, :3], keff[1])
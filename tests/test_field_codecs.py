@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, CategoricalField, FieldCodec, EncodedField
+
+def _steps(n_steps: int = 20, n: int = 37) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    values = np.cos(np.linspace(0, 3, n)) * (1 + 0.01 * np.arange(n_steps))[:, np.newaxis] + 1e-3 * rng.standard_normal((n_steps, n))
+    values[4, 7] = np.nan
+    return values
+
+@pytest.mark.parametrize('codec', [
+    FieldCodec('float64', level=0),
+    FieldCodec('float32'),
+    FieldCodec('float16', delta=True),
+    FieldCodec(tolerance=1e-3),
+    FieldCodec(tolerance=1e-3, delta=True, chunk_steps=3),
+])
+def test_round_trip(codec):
+    values = _steps()
+    encoded = codec.encode(values)
+    decoded = np.asarray(encoded)
+    assert decoded.shape == values.shape and np.array_equal(np.isnan(decoded), np.isnan(values))
+    assert np.nanmax(np.abs(decoded - values)) <= codec.error_bound(values) * (1 + 1e-9)
+    assert np.array_equal(encoded[5], decoded[5])
+    assert np.array_equal(encoded[-1, 3:9], decoded[-1, 3:9])
+    assert np.array_equal(encoded[2:17:4], decoded[2:17:4], equal_nan=True)
+    with pytest.raises(IndexError):
+        encoded[20]
+
+def test_lazy_chunks():
+    encoded = FieldCodec(tolerance=1e-3, delta=True, chunk_steps=4).encode(_steps(n_steps=40))
+    assert encoded.n_chunks == 10 and encoded.compression_ratio > 4
+    encoded[13]
+    assert list(encoded._cache) == [3]
+    blocks = list(encoded.iter_chunks())
+    assert [start for start, _ in blocks] == list(range(0, 40, 4))
+    with pytest.raises(ValueError):
+        blocks[0][1][0, 0] = 1
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        FieldCodec('int8')
+    with pytest.raises(ValueError):
+        FieldCodec(tolerance=0)
+    with pytest.raises(ValueError):
+        FieldCodec('float16').encode(np.array([1e6]))
+    with pytest.raises(ValueError):
+        FieldCodec().encode(np.array([np.inf]))
+    # Fluence-like values with a fine tolerance would overflow the quantized codes
+    with pytest.raises(ValueError):
+        FieldCodec(tolerance=1e-6).encode(np.array([0., 1e15]))
+    values = np.array([0., 1e15])
+    assert np.allclose(np.asarray(FieldCodec(tolerance=1.).encode(values)), values, rtol=0, atol=1.)
+
+def test_lattice_field(tmp_path):
+    lattice = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(3)])
+    values = _steps()
+    lattice.add_field('power', values)
+    encoded = lattice.encode_field('power', FieldCodec(tolerance=1e-3))
+    assert lattice.fields['power'] is encoded and encoded.shape == values.shape
+    lattice.add_field('single', FieldCodec('float32').encode(values[0]))
+    assert np.allclose(lattice.fields['single'][:], values[0], equal_nan=True, atol=1e-6)
+
+    encoded.save(tmp_path / 'power.npz')
+    with EncodedField.load(tmp_path / 'power.npz') as loaded:
+        assert loaded.codec == encoded.codec and np.array_equal(np.asarray(loaded), np.asarray(encoded), equal_nan=True)
+    # The decoded chunks stay cached, the file is closed
+    assert np.array_equal(loaded[-1], encoded[-1], equal_nan=True)
+    with pytest.raises(ValueError):
+        loaded.nbytes
+    encoded.close()
+
+    lattice.add_field('material', CategoricalField.from_ids(np.arange(37) % 2))
+    with pytest.raises(TypeError):
+        lattice.encode_field('material', FieldCodec())
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from HexLattice import RingCoordinate, AxialCoordinate, HexCell, HexLattice, CategoricalField
+
+def _lattice() -> HexLattice:
+    lattice = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(3)], pitch=2)
+    n = len(lattice.HexCells)
+    lattice.add_field('power', np.linspace(0, 1, n))
+    lattice.add_field('material', CategoricalField.from_ids(np.arange(n) % 3, names={0: 'fuel', 1: 'reflector'}))
+    lattice.add_field('history', np.arange(2 * n, dtype=float).reshape(2, n))
+    return lattice
+
+def test_ring_arrays():
+    axial = np.array([(x, z) for x in range(-6, 7) for z in range(-6, 7) if abs(x + z) <= 6])
+    ring = RingCoordinate.from_axial_array(axial)
+    expected = [RingCoordinate.converted_from_axial(AxialCoordinate(x, z)).as_tuple() for x, z in axial.tolist()]
+    assert ring.tolist() == [list(coord) for coord in expected]
+    assert np.array_equal(RingCoordinate.to_axial_array(ring), axial)
+
+def test_frame_round_trip():
+    pd = pytest.importorskip('pandas')
+    lattice = _lattice()
+    frame = lattice.to_frame()
+    assert frame.index.names == ['x', 'z'] and len(frame) == len(lattice.HexCells)
+    assert {'r', 'k', 'cartesian_x', 'cartesian_y', 'power', 'material', 'history[0]', 'history[1]'} <= set(frame.columns)
+    assert np.shares_memory(frame['power'].to_numpy(), lattice.fields['power'])
+    assert isinstance(frame['material'].dtype, pd.CategoricalDtype)
+    assert np.allclose(frame[['cartesian_x', 'cartesian_y']].to_numpy(), lattice.centre_array)
+
+    copy = HexLattice.from_frame(frame, pitch=2)
+    assert np.array_equal(copy.axial_array, lattice.axial_array)
+    assert np.allclose(copy.centre_array, lattice.centre_array)
+    assert np.array_equal(copy.fields['power'], lattice.fields['power'])
+    assert np.array_equal(copy.fields['material'].codes, lattice.fields['material'].codes)
+    assert copy.fields['material'].names == ['fuel', 'reflector', '2']
+
+    by_ring = HexLattice.from_frame(frame.reset_index(drop=True), pitch=2, value='power', coordinates='ring')
+    assert np.array_equal(by_ring.axial_array, lattice.axial_array)
+    assert np.allclose(by_ring.value_list, lattice.fields['power'])
+
+def test_join_by_coordinates():
+    pd = pytest.importorskip('pandas')
+    lattice = _lattice()
+    axial = lattice.axial_array
+    order = np.random.default_rng(0).permutation(len(axial))[:-3]
+    external = pd.DataFrame({'x': axial[order, 0], 'z': axial[order, 1], 'burnup': order * 10.})
+    external.loc[len(external)] = [99, 99, -1.]
+
+    joined = lattice.join_frame(external, prefix='ext_')['ext_burnup']
+    assert np.array_equal(joined[order], order * 10.)
+    assert np.count_nonzero(np.isnan(joined)) == 3
+    assert 'ext_burnup' in lattice.fields
+
+    with pytest.raises(ValueError):
+        lattice.join_frame(pd.concat((external, external)))
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    lattice = _lattice()
+    table = lattice.to_arrow()
+    assert table.num_rows == len(lattice.HexCells)
+    assert pa.types.is_dictionary(table.column('material').type)
+    assert np.shares_memory(table.column('power').to_numpy(), lattice.fields['power'])
+    copy = HexLattice.from_arrow(table, pitch=2)
+    assert np.array_equal(copy.axial_array, lattice.axial_array)
+    assert np.array_equal(copy.fields['history[1]'], lattice.fields['history'][1])
+    assert copy.fields['material'].names == lattice.fields['material'].names
+
+def test_categorical_ids_round_trip():
+    """
+    Named categories keep their non-contiguous ids through DataFrames and Arrow tables
+    """
+    pytest.importorskip('pandas')
+    pytest.importorskip('pyarrow')
+    lattice = _lattice()
+    n = len(lattice.HexCells)
+    ids = np.array([3, 7, 42])[np.arange(n) % 3]
+    lattice.add_field('assembly', CategoricalField.from_ids(ids, names={3: 'inner', 7: 'outer', 42: 'control'}))
+
+    for copy in (HexLattice.from_frame(lattice.to_frame(), pitch=2),
+                 HexLattice.from_frame(lattice.to_frame().reset_index(), pitch=2),
+                 HexLattice.from_arrow(lattice.to_arrow(), pitch=2)):
+        assembly = copy.fields['assembly']
+        assert assembly.ids.tolist() == [3, 7, 42]
+        assert assembly.names == ['inner', 'outer', 'control']
+        assert np.array_equal(assembly.values, ids)
+        assert copy.fields['material'].ids.tolist() == [0, 1, 2]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from HexLattice import RingCoordinate, AxialCoordinate, HexCell, HexLattice, HexZLattice, PlotConfig
+
+def _core() -> HexZLattice:
+    hl = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(1)])
+    return HexZLattice(hl, [0, 10, 30, 60])
+
+def test_add_field_orders():
+    """
+    Flat fields in plane order and in cell order give the same (n_planes, n_cells) array
+    """
+    core = _core()
+    field = np.arange(core.n_planes * core.n_cells, dtype=float).reshape(core.shape)
+    assert np.array_equal(core.add_field('plane', field.ravel()), field)
+    assert np.array_equal(core.add_field('cell', field.T.ravel(), order='cell'), field)
+    with pytest.raises(ValueError):
+        core.add_field('bad', np.zeros(5))
+    with pytest.raises(KeyError):
+        core.field('missing')
+
+def test_axial_reductions():
+    core = _core()
+    field = core.add_field('power', np.random.default_rng(0).random(core.shape))
+    assert np.allclose(core.integrate('power'), (field * np.array([10, 20, 30])[:, np.newaxis]).sum(axis=0))
+    assert np.allclose(core.average('power'), core.integrate('power') / 60)
+
+    # Half of the second plane and all of the third
+    assert np.allclose(core.integrate('power', (20, 60)), 10 * field[1] + 30 * field[2])
+    assert np.allclose(core.average('power', (20, 60)), (10 * field[1] + 30 * field[2]) / 40)
+
+    assert np.array_equal(core.axial_profile('power', 3), field[:, 3])
+    assert np.array_equal(core.axial_profile('power', AxialCoordinate(0, 0)), field[:, core.lattice.index_of(AxialCoordinate(0, 0))])
+    assert np.array_equal(core.peak_plane('power'), np.argmax(field, axis=0))
+    plane, cell, value = core.peak('power')
+    assert value == field.max() == field[plane, cell]
+    assert core.plane_at(10) == 1 and core.plane_at(60) == 2
+    assert np.array_equal(core.plane_at([0, 29.9, 30]), [0, 1, 2])
+
+def test_render_plane_matches_lattice_render():
+    """
+    Plotting a plane renders the shared 2D lattice with the values of the plane
+    """
+    core = _core()
+    field = core.add_field('flux', np.random.default_rng(1).random(core.shape))
+    pc = PlotConfig('plane', text_usetex=False, figure_dpi=30, figure_size=(3, 3))
+    assert pc.figure_to_bytes(core.render_plane(pc, 'flux', 1)) == pc.figure_to_bytes(core.lattice.render(pc, values=field[1]))
+    integrated = pc.figure_to_bytes(core.render_plane(pc, 'flux', 'integrated'))
+    assert integrated == pc.figure_to_bytes(core.lattice.render(pc, values=core.integrate('flux')))
+    assert all(hex_cell.value is None for hex_cell in core.lattice.HexCells)
@@ -0,0 +1,88 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+import numpy as np
+import pytest
+
+from HexLattice.pipeline import PipelineJob, Pipeline, PipelineError, build_lattice, evaluate_fields
+
+logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+GEOMETRY = {'rings': 2, 'pitch': 2}
+PLOT = {'text_usetex': False, 'figure_dpi': 20, 'figure_size': [3, 3], 'text_size': 6}
+
+def _job(tmp_path, n_cases: int = 3, **kwargs) -> dict:
+    n = len(build_lattice(GEOMETRY).HexCells)
+    rng = np.random.default_rng(0)
+    cases = list()
+    for i in range(n_cases):
+        for version in ('v1', 'v2'):
+            np.savetxt(tmp_path / f'{i}_{version}.csv', np.c_[np.arange(n), 1 + rng.random(n)], delimiter=',', header='id,flux')
+        cases.append({'name': f'case{i}', 'inputs': {'v1': f'{i}_v1.csv', 'v2': {'path': f'{i}_v2.csv', 'scale': 2}}})
+    return {
+        'geometry': GEOMETRY,
+        'read': {'column': 1, 'skip_rows': 1},
+        'cases': cases,
+        'fields': {'ratio': 'v2 / v1', 'diff': '100 * (ratio - 1)'},
+        'plot': {**PLOT, 'image_root_dir': 'plot'},
+        **kwargs
+    }
+
+def test_expressions():
+    fields = evaluate_fields({'ratio': 'v2 / v1', 'peak': 'where(ratio > 1, ratio, nan_to_num(ratio))'}, {'v1': np.array([1., 2.]), 'v2': np.array([3., 1.])})
+    assert np.allclose(fields['ratio'], [3, 0.5]) and np.allclose(fields['peak'], [3, 0.5])
+    for expression in ('__import__("os")', 'v1.real', 'v1[0]', 'lambda: 1', 'v1 +'):
+        with pytest.raises(ValueError):
+            evaluate_fields({'bad': expression}, {'v1': np.ones(2)})
+
+def test_job_validation(tmp_path):
+    config = _job(tmp_path)
+    job = PipelineJob.from_dict(config, tmp_path)
+    assert job.cases[0].inputs['v2'].scale == 2 and job.cases[0].inputs['v1'].column == 1
+    assert job.cases[0].inputs['v1'].path == tmp_path / '0_v1.csv'
+    with pytest.raises(ValueError):
+        PipelineJob.from_dict({**config, 'fields': {'ratio': 'v3 / v1'}}, tmp_path)
+    with pytest.raises(ValueError):
+        PipelineJob.from_dict({**config, 'plot': {'no_such_option': 1}}, tmp_path)
+
+def test_run_in_threads(tmp_path):
+    (tmp_path / 'job.json').write_text(json.dumps(_job(tmp_path, 6, readers=2, renderers=2, queue_size=1, processes=False)))
+    saved = list()
+    stats = Pipeline(PipelineJob.load(tmp_path / 'job.json'), log=saved.append).run()
+    assert (stats.read.items, stats.compute.items, stats.render.items) == (6, 6, 12)
+    assert sorted(path.name for path in (tmp_path / 'plot').iterdir()) == sorted(f'case{i}_{name}.png' for i in range(6) for name in ('ratio', 'diff'))
+    assert len(saved) == 12 and stats.render.busy > 0 and stats.images_per_second > 0
+    assert 'render' in stats.report()
+
+def test_failures_do_not_stop_the_others(tmp_path):
+    config = _job(tmp_path, processes=False, renderers=1)
+    config['cases'].append({'name': 'missing', 'inputs': {'v1': 'missing.csv', 'v2': 'missing.csv'}})
+    (tmp_path / 'short.csv').write_text('flux\n1\n2\n')
+    config['cases'].append({'name': 'short', 'inputs': {'v1': {'path': 'short.csv', 'column': 0}, 'v2': {'path': 'short.csv', 'column': 0}}})
+    with pytest.raises(PipelineError) as error:
+        Pipeline(PipelineJob.from_dict(config, tmp_path)).run()
+    stats = error.value.stats
+    assert stats.read.failed == 1 and stats.compute.failed == 1 and stats.render.items == 6
+    assert sorted(name for name, _ in stats.errors) == ['missing', 'short']
+
+def test_run_in_processes(tmp_path):
+    stats = Pipeline(PipelineJob.from_dict(_job(tmp_path, 1, renderers=1), tmp_path)).run()
+    assert stats.render.items == 2 and (tmp_path / 'plot' / 'case0_ratio.png').exists()
+
+def test_threaded_pipelines_keep_their_geometry(tmp_path):
+    """
+    Pipelines of different geometries rendering in threads of one process at once each render with their own lattice
+    """
+    small = PipelineJob.from_dict(_job(tmp_path, 4, processes=False, renderers=2), tmp_path)
+    large_geometry = {'rings': 3, 'pitch': 2}
+    np.save(tmp_path / 'large.npy', np.arange(len(build_lattice(large_geometry).HexCells), dtype=float))
+    large = PipelineJob.from_dict({
+        **_job(tmp_path, 0, processes=False, renderers=2),
+        'geometry': large_geometry,
+        'cases': [{'name': f'large{i}', 'inputs': {'v': 'large.npy'}} for i in range(4)],
+        'fields': {'v': 'v'}
+    }, tmp_path)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        stats = list(pool.map(lambda job: Pipeline(job).run(), (small, large)))
+    assert [stats.render.items for stats in stats] == [8, 4]
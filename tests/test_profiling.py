@@ -0,0 +1,96 @@
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig, RenderTimer
+from HexLattice.profiling import PROFILE_ENV, PROFILE_DIR_ENV
+
+def _valued_lattice() -> HexLattice:
+    hl = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(2)])
+    for i, hex_cell in enumerate(hl.HexCells):
+        hex_cell.value = float(i)
+    return hl
+
+def test_render_timer_stages(tmp_path):
+    """
+    Every stage of plot_hex and save_figure is recorded in order
+    """
+    hl = _valued_lattice()
+    pc = PlotConfig('timed', image_root_dir=tmp_path, text_usetex=False, figure_dpi=50)
+    seen = list()
+    timer = RenderTimer(trace_memory=True, callback=lambda record: seen.append(record.name))
+    fig = plt.figure()
+    hl.plot_hex(pc, fig.subplots(), timer=timer)
+    pc.save_figure(fig, timer=timer)
+    plt.close(fig)
+    
+    assert seen == ['setup', 'colour mapping', 'artist creation', 'draw', 'savefig']
+    assert pc.image_path.exists()
+    assert all(record.wall_time >= 0 and record.peak_bytes is not None for record in timer.records)
+    assert 'artist creation' in timer.report()
+
+def test_profile_env(tmp_path, monkeypatch):
+    """
+    $HEXLATTICE_PROFILE dumps one cProfile and one tracemalloc report per render
+    """
+    monkeypatch.setenv(PROFILE_ENV, 'cprofile,tracemalloc')
+    monkeypatch.setenv(PROFILE_DIR_ENV, str(tmp_path / 'profiles'))
+    hl = _valued_lattice()
+    pc = PlotConfig('profiled', image_root_dir=tmp_path, text_usetex=False, figure_dpi=50)
+    fig = plt.figure()
+    hl.plot_circle(pc, fig.subplots())
+    plt.close(fig)
+    
+    assert len(list((tmp_path / 'profiles').glob('plot_circle-profiled-*.prof'))) == 1
+    assert len(list((tmp_path / 'profiles').glob('plot_circle-profiled-*.tracemalloc.txt'))) == 1
+
+def test_render_timer_threads(tmp_path, monkeypatch):
+    """
+    Renders timed and profiled from two threads at once share tracemalloc and skip a second cProfile
+    """
+    import threading
+    import tracemalloc
+    from matplotlib.figure import Figure
+    
+    monkeypatch.setenv(PROFILE_ENV, 'cprofile,tracemalloc')
+    monkeypatch.setenv(PROFILE_DIR_ENV, str(tmp_path / 'profiles'))
+    hl = _valued_lattice()
+    barrier = threading.Barrier(2)
+    timers, errors = [RenderTimer(trace_memory=True) for _ in range(2)], list()
+    
+    def render(i: int):
+        try:
+            pc = PlotConfig(f'thread{i}', image_root_dir=tmp_path, text_usetex=False, figure_dpi=20)
+            barrier.wait()
+            for _ in range(3):
+                fig = Figure()
+                hl.plot_hex(pc, fig.subplots(), timer=timers[i])
+                pc.save_figure(fig, timer=timers[i])
+        except Exception as exc:
+            errors.append(exc)
+    
+    threads = [threading.Thread(target=render, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    assert not tracemalloc.is_tracing()
+    for timer in timers:
+        assert [record.name for record in timer.records] == ['setup', 'colour mapping', 'artist creation', 'draw', 'savefig'] * 3
+        assert all(record.peak_bytes is not None for record in timer.records)
+
+def test_nested_stage_peaks():
+    """
+    A stage measures its own peak even when tracing is already active, and its enclosing stage keeps the earlier peak
+    """
+    outer, inner = RenderTimer(trace_memory=True), RenderTimer(trace_memory=True)
+    with outer.stage('outer'):
+        large = bytearray(8 * 2 ** 20)
+        del large
+        with inner.stage('inner'):
+            small = bytearray(2 ** 20)
+            del small
+    assert 2 ** 20 <= inner.records[0].peak_bytes < 2 * 2 ** 20
+    assert outer.records[0].peak_bytes >= 8 * 2 ** 20
@@ -0,0 +1,60 @@
+import numpy as np
+
+from HexLattice import AxialCoordinate, CubeCoordinate, RingCoordinate, HexCell, HexLattice
+
+def _lattice(r_max: int = 3) -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(r_max)])
+
+def test_cube_round_and_distance():
+    """
+    Cube rounding keeps x + y + z == 0 and the distance is the number of steps
+    """
+    rounded = CubeCoordinate.round_array([[0.4, 0.3, -0.7], [1.8, -0.1, -1.7]])
+    assert np.all(rounded.sum(axis=-1) == 0)
+    assert rounded.tolist() == [[1, 0, -1], [2, 0, -2]]
+    assert CubeCoordinate.distance_array([0, 0, 0], [2, -3, 1]) == 3
+
+def test_distance_and_range():
+    hl = _lattice()
+    centre = hl.index_of(AxialCoordinate(0, 0))
+    ring_r = np.array([hex_cell.ring.r for hex_cell in hl.HexCells])
+    
+    assert np.all(hl.distance_to(centre) == ring_r)
+    assert np.all(hl.distance_matrix([centre])[0] == ring_r)
+    assert np.all(hl.cells_within(centre, 2) == np.flatnonzero(ring_r <= 2))
+    assert len(hl.cells_within(list(range(len(hl.HexCells))), 1)) == len(hl.HexCells)
+
+def test_line_and_sight():
+    """
+    Axial coordinate
+        (0,-1)    (1,-1)  
+    (-1,0)    (0,0)    (1,0)
+        (-1,1)    (0,1)
+    """
+    hl = _lattice()
+    start, end = hl.index_of(AxialCoordinate(-3, 0)), hl.index_of(AxialCoordinate(3, 0))
+    line = hl.line_between(start, end)
+    assert [tuple(axial) for axial in hl.axial_array[line]] == [(x, 0) for x in range(-3, 4)]
+    
+    blocking = np.zeros(len(hl.HexCells), dtype=bool)
+    assert hl.line_of_sight(start, end, blocking)
+    blocking[hl.index_of(AxialCoordinate(0, 0))] = True
+    assert not hl.line_of_sight(start, end, blocking)
+
+def test_distance_field():
+    """
+    Walking around a blocked centre takes longer than the straight hex distance
+    """
+    hl = _lattice()
+    start, end = hl.index_of(AxialCoordinate(-1, 0)), hl.index_of(AxialCoordinate(1, 0))
+    distance, nearest = hl.distance_field([start])
+    assert np.all(distance == hl.distance_to(start)) and np.all(nearest == start)
+    
+    passable = np.ones(len(hl.HexCells), dtype=bool)
+    passable[hl.index_of(AxialCoordinate(0, 0))] = False
+    distance, _ = hl.distance_field(start, passable)
+    assert distance[end] == 3
+    
+    both, nearest = hl.distance_field([start, end])
+    assert np.all(both == np.minimum(hl.distance_to(start), hl.distance_to(end)))
+    assert np.all(hl.distance_to([start, end])[nearest == start] == hl.distance_to(start)[nearest == start])
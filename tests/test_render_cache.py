@@ -0,0 +1,82 @@
+import sys
+
+import numpy as np
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig, RenderCache
+
+def _lattice(seed: int) -> HexLattice:
+    hl = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(2)])
+    for hex_cell, value in zip(hl.HexCells, np.random.default_rng(seed).random(len(hl.HexCells))):
+        hex_cell.value = float(value)
+    return hl
+
+def test_key():
+    """
+    The key depends on the values and the look of the image, not on where it is saved
+    """
+    pc = PlotConfig('cached', text_usetex=False)
+    key = RenderCache.key(_lattice(0), pc)
+    assert key == RenderCache.key(_lattice(0), PlotConfig('cached', image_root_dir=pc.image_root_dir / 'other', text_usetex=False))
+    assert key != RenderCache.key(_lattice(1), pc)
+    assert key != RenderCache.key(_lattice(0), PlotConfig('cached', text_usetex=False, text_size=10))
+    assert key != RenderCache.key(_lattice(0), pc, shape='circle')
+
+def test_key_of_lambdas():
+    """
+    Lambdas and local functions share their to_dict name, the key tells them apart by their code and captured values
+    """
+    def key(func) -> str:
+        return RenderCache.key(_lattice(0), PlotConfig('cached', text_usetex=False, text_color_func=func))
+
+    def threshold(limit):
+        return lambda color: 'black' if sum(color[:3]) > limit else 'white'
+
+    black, white = key(lambda color: 'black'), key(lambda color: 'white')
+    assert black != white
+    assert black == key(lambda color: 'black')
+    assert key(threshold(1.5)) == key(threshold(1.5)) != key(threshold(2.))
+    # A captured object which cannot be hashed is never served from the cache
+    opaque = object()
+    assert key(lambda color: opaque and 'black') != key(lambda color: opaque and 'black')
+
+DARK_LIMIT = 1.5
+
+def _brightness(color) -> float:
+    return sum(color[:3])
+
+def _module_text_color(color) -> str:
+    return 'black' if _brightness(color) > DARK_LIMIT else 'white'
+
+def test_key_follows_globals(monkeypatch):
+    """
+    The key changes with the globals and the helpers read by the text colour function
+    """
+    def key() -> str:
+        return RenderCache.key(_lattice(0), PlotConfig('cached', text_usetex=False, text_color_func=_module_text_color))
+
+    before = key()
+    assert key() == before
+    monkeypatch.setattr(sys.modules[__name__], 'DARK_LIMIT', 2.)
+    changed_limit = key()
+    assert changed_limit != before
+    monkeypatch.setattr(sys.modules[__name__], '_brightness', lambda color: max(color[:3]))
+    assert key() not in (before, changed_limit)
+
+def test_export_hit_and_eviction(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    pc = PlotConfig('cached', image_root_dir=tmp_path / 'out', text_usetex=False, figure_dpi=30)
+    hl = _lattice(0)
+    first = hl.export(pc, cache=cache).read_bytes()
+    pc.image_path.unlink()
+    assert hl.export(pc, cache=cache).read_bytes() == first
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.stores) == (1, 1, 1)
+    
+    # Room for about one image: storing a second one evicts the first
+    cache.max_bytes = int(cache.size_bytes * 1.5)
+    _lattice(1).export(pc, cache=cache)
+    assert cache.stats.evictions == 1
+    assert cache.size_bytes <= cache.max_bytes
+    assert cache.get(RenderCache.key(hl, pc), pc.image_type) is None
+    
+    # A new cache on the same directory picks up the stored images
+    assert RenderCache(tmp_path / 'cache').size_bytes == cache.size_bytes
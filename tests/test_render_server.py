@@ -0,0 +1,128 @@
+import asyncio
+import json
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig, RenderCache
+from HexLattice.render_server import RenderServer, RenderClient, RenderServerError, MAX_FRAME_BYTES
+from HexLattice.plot_config import TEXT_COLOR_FUNCS, register_text_color_func
+
+@pytest.fixture
+def server(tmp_path):
+    server = RenderServer(tmp_path / 'render.sock', workers=2, max_queue=4, cache=RenderCache(tmp_path / 'cache'), output_root=tmp_path / 'out')
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(server.close())
+    loop.close()
+
+def _lattice() -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(2)], pitch=2)
+
+def test_render_matches_local_render(server, tmp_path):
+    """
+    Images rendered by the server are identical to local renders, and repeated jobs reuse the geometry and the cache
+    """
+    hl = _lattice()
+    pc = PlotConfig('served', image_root_dir=tmp_path / 'images', text_usetex=False, figure_dpi=40, figure_size=(4, 4))
+    values = np.random.default_rng(0).random(len(hl.HexCells))
+    expected = pc.figure_to_bytes(hl.render(pc, values=values))
+
+    def job(_) -> bytes:
+        with RenderClient(server.address) as client:
+            return client.render_lattice(hl, pc, values=values)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        assert list(pool.map(job, range(12))) == [expected] * 12
+
+    with RenderClient(server.address) as client:
+        path = client.render_lattice(hl, pc, values=values, output='path')
+        assert path == (tmp_path / 'out' / 'served.png').resolve() and path.read_bytes() == expected
+        assert not (tmp_path / 'images').exists()
+        metrics = client.metrics()
+    assert metrics.completed == 13
+    assert metrics.failed == 0
+    assert metrics.queued == 0 and metrics.running == 0
+    assert metrics.geometry_hits >= 11
+    assert 1 <= metrics.cache_hits == server.cache.stats.hits
+    assert 0 < metrics.latency_p50 <= metrics.latency_p99
+
+def test_failed_job_reports_error(server):
+    """
+    Errors of a job are raised by the client and leave the connection usable
+    """
+    hl = _lattice()
+    with RenderClient(server.address) as client:
+        with pytest.raises(RenderServerError, match='ValueError'):
+            client.render_lattice(hl, PlotConfig('bad', text_usetex=False), values=np.zeros(3))
+        assert client.ping() > 0
+        assert client.metrics().failed == 1
+
+def test_plot_config_functions_are_restricted():
+    """
+    A plot configuration received from a client resolves only registered text colour functions
+    """
+    pc = PlotConfig('restricted', text_usetex=False)
+    assert PlotConfig.from_dict(pc.to_dict()).text_color_func is pc.text_color_func
+    for name in (
+        'HexLattice.pipeline:os.system', 'HexLattice.plot_config:importlib.import_module', 'os:system',
+        'HexLattice.plot_config:missing', 'HexLattice.pipeline:main', 'HexLattice.render_server:main',
+        'HexLattice.render_cache:RenderCache.clear'
+    ):
+        with pytest.raises(ValueError):
+            PlotConfig.from_dict({**pc.to_dict(), 'text_color_func': name})
+
+    @register_text_color_func
+    def always_red(color):
+        return 'red'
+
+    custom = PlotConfig('restricted', text_usetex=False, text_color_func=always_red)
+    assert PlotConfig.from_dict(custom.to_dict()).text_color_func is always_red
+    TEXT_COLOR_FUNCS.pop(custom.to_dict()['text_color_func'])
+
+def _raw_request(sock: socket.socket, header_bytes: bytes, payload_size: int = 0) -> dict:
+    sock.sendall(struct.pack('>IQ', len(header_bytes), payload_size) + header_bytes + b'\0' * min(payload_size, 16))
+    prefix = sock.recv(12, socket.MSG_WAITALL)
+    header_size, data_size = struct.unpack('>IQ', prefix)
+    return json.loads(sock.recv(header_size, socket.MSG_WAITALL))
+
+def test_malformed_frames(server):
+    """
+    A malformed header is answered with an error and the connection stays usable; an oversized frame is refused
+    before its payload is read
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(server.address))
+        for header in (b'{not json', b'[1, 2]', b'\xff'):
+            response = _raw_request(sock, header)
+            assert not response['ok'] and response['error'].startswith('ValueError')
+        assert _raw_request(sock, b'{"op": "ping"}') == {'ok': True}
+
+        response = _raw_request(sock, b'{"op": "render"}', MAX_FRAME_BYTES)
+        assert not response['ok'] and 'exceeds the limit' in response['error']
+        assert sock.recv(1) == b''
+
+def test_saved_images_stay_in_the_output_root(server, tmp_path):
+    """
+    Images are saved under the output root of the server, whatever the image_root_dir or image_name of the client
+    """
+    hl = _lattice()
+    for hex_cell, value in zip(hl.HexCells, range(len(hl.HexCells))):
+        hex_cell.value = float(value)
+    with RenderClient(server.address) as client:
+        for name in ('../escaped', str(tmp_path / 'absolute')):
+            with pytest.raises(RenderServerError, match='outside of the output root'):
+                client.render_lattice(hl, PlotConfig(name, text_usetex=False, figure_dpi=20), output='path')
+        path = client.render_lattice(hl, PlotConfig('sub/image', image_root_dir=tmp_path / 'elsewhere', text_usetex=False, figure_dpi=20), output='path')
+        assert path == (tmp_path / 'out' / 'sub' / 'image.png').resolve() and path.exists()
+        assert client.metrics().queued == 0
+    assert not (tmp_path / 'escaped.png').exists() and not (tmp_path / 'elsewhere').exists()
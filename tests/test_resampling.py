@@ -0,0 +1,45 @@
+import numpy as np
+
+from HexLattice import RingCoordinate, HexCell, HexLattice
+from HexLattice.resampling import build_resampler, convex_intersection_area
+from HexLattice.hex_lattice import POINTY_UNIT_VERTEXES
+
+def _lattice(r_max: int, pitch: float) -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(r_max)], pitch=pitch)
+
+def test_intersection_area():
+    hexagon = POINTY_UNIT_VERTEXES[np.newaxis]
+    areas = convex_intersection_area(
+        np.repeat(hexagon, 3, axis=0),
+        np.concatenate((hexagon, hexagon + (np.sqrt(3), 0), hexagon + (np.sqrt(3) / 2, 0)))
+    )
+    assert np.allclose(areas, [3 * np.sqrt(3) / 2, 0, 5 * np.sqrt(3) / 8])
+
+def test_area_transfer():
+    """
+    The same geometry gives the identity, a coarse lattice covering a fine one conserves extensive fields
+    """
+    fine, coarse = _lattice(8, 1.), _lattice(4, 3.)
+    assert np.allclose(build_resampler(fine, fine).to_dense(), np.eye(len(fine.HexCells)))
+    
+    power = np.random.default_rng(0).random((3, len(fine.HexCells)))
+    to_coarse = build_resampler(fine, coarse, quantity='extensive')
+    assert np.allclose(to_coarse.conservation_error(power), 0)
+    to_coarse.check_conservation(power)
+    assert np.isclose(to_coarse(power).sum(), power.sum())
+    
+    # A constant density stays constant, also on the partially covered coarse cells
+    density = build_resampler(fine, coarse)(np.ones(len(fine.HexCells)))
+    assert np.allclose(density[~np.isnan(density)], 1)
+
+def test_interpolation():
+    """
+    Linear interpolation is exact for linear fields inside the source lattice
+    """
+    fine, coarse = _lattice(8, 1.), _lattice(4, 3.)
+    gradient = np.array([2., -1.])
+    linear = build_resampler(coarse, fine, 'linear')(coarse.centre_array @ gradient)
+    assert np.allclose(linear, fine.centre_array @ gradient)
+    
+    nearest = build_resampler(coarse, fine, 'nearest')
+    assert np.all(nearest.weights == 1) and nearest.nnz == len(fine.HexCells)
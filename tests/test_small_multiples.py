@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from matplotlib.collections import PathCollection
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, HexZLattice, PlotConfig, plot_grid
+
+def _lattice() -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(3)])
+
+def _plot_config() -> PlotConfig:
+    return PlotConfig('grid', text_usetex=False, figure_dpi=20, figure_size=(6, 4))
+
+def _collections(fig) -> list[PathCollection]:
+    return [artist for ax in fig.axes for artist in ax.collections if isinstance(artist, PathCollection)]
+
+def test_common_norm():
+    lattice = _lattice()
+    fields = np.random.default_rng(0).random((7, len(lattice.HexCells))) * np.arange(1, 8)[:, np.newaxis]
+    fig = plot_grid(lattice, _plot_config(), fields, ncols=3, titles=[f'step {i}' for i in range(7)])
+    collections = _collections(fig)
+    assert len(collections) == 7
+    # One shared geometry, one shared scale and one colorbar
+    assert all(collection.get_paths() is collections[0].get_paths() for collection in collections)
+    assert len({id(collection.norm) for collection in collections}) == 1
+    assert collections[0].norm.vmax == pytest.approx(fields.max())
+    assert len(fig.axes) == 3 * 3 + 1
+    assert sum(ax.get_visible() for ax in fig.axes) == 7 + 1
+    fig.canvas.draw()
+
+def test_row_norm():
+    lattice = _lattice()
+    fields = np.random.default_rng(1).random((2, 3, len(lattice.HexCells)))
+    fields[1] *= 10
+    fig = plot_grid(lattice, _plot_config(), fields, norm='row')
+    collections = _collections(fig)
+    assert collections[0].norm is collections[2].norm and collections[0].norm is not collections[3].norm
+    assert collections[3].norm.vmax == pytest.approx(fields[1].max())
+    assert len(fig.axes) == 2 * 3 + 2
+    with pytest.raises(ValueError):
+        plot_grid(lattice, _plot_config(), fields[..., 1:])
+
+def test_hex_z_planes():
+    lattice = _lattice()
+    core = HexZLattice.uniform(lattice, 4, 100)
+    core.add_field('flux', np.arange(4 * len(lattice.HexCells), dtype=float))
+    fig = core.render_planes(_plot_config(), 'flux', ncols=2)
+    assert [ax.get_title() for ax in fig.axes[:4]] == ['z = 87.5', 'z = 62.5', 'z = 37.5', 'z = 12.5']
@@ -0,0 +1,58 @@
+import numpy as np
+
+from HexLattice import RingCoordinate, AxialCoordinate, HexCell, HexLattice
+from HexLattice.coordinates import DIRACTIONS
+
+def _lattice(r: int = 4, pitch: float = 1.5) -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(r)], pitch)
+
+def _neighbour_loop(hl: HexLattice, values: np.ndarray) -> np.ndarray:
+    """
+    The reference sum over the neighbours of every cell, looping over the cell objects
+    """
+    res = np.zeros(len(hl.HexCells))
+    for i, hex_cell in enumerate(hl.HexCells):
+        for direction in DIRACTIONS:
+            j = hl.index_of(hex_cell.get_neighbour(direction))
+            if j >= 0:
+                res[i] += values[j]
+    return res
+
+def test_scatter_gather_roundtrip():
+    hl = _lattice()
+    values = np.random.default_rng(0).random((3, len(hl.HexCells)))
+    dense = hl.to_grid(values)
+    assert dense.shape == (3,) + hl.axial_grid.shape
+    assert np.isnan(dense[:, ~hl.axial_grid.mask]).all()
+    assert np.array_equal(hl.from_grid(dense), values)
+
+def test_neighbour_sum_matches_loop():
+    hl = _lattice()
+    values = np.random.default_rng(1).random(len(hl.HexCells))
+    grid = hl.axial_grid
+    assert np.allclose(grid.gather(grid.neighbour_sum(hl.to_grid(values))), _neighbour_loop(hl, values))
+    assert np.array_equal(grid.gather(grid.neighbour_count), _neighbour_loop(hl, np.ones(len(hl.HexCells))))
+
+def test_stencils_of_polynomials():
+    """
+    The gradient is exact for linear fields and the Laplacian of x^2 + y^2 is 4 away from the boundary
+    """
+    hl = _lattice()
+    x, y = hl.centre_array.T
+    assert np.allclose(hl.gradient(2 * x - 3 * y + 1), [2, -3])
+    interior = hl.axial_grid.gather(hl.axial_grid.neighbour_count) == 6
+    assert np.allclose(hl.laplacian(x ** 2 + y ** 2)[interior], 4)
+    assert np.allclose(hl.laplacian(np.full(len(hl.HexCells), 7.)), 0)
+    assert np.allclose(hl.laplacian(np.full(len(hl.HexCells), 7.), 'dirichlet', 7.), 0)
+
+def test_smooth():
+    hl = _lattice()
+    values = np.random.default_rng(2).random(len(hl.HexCells))
+    assert np.allclose(hl.smooth(np.full(len(hl.HexCells), 3.), iterations=5), 3)
+    once = hl.smooth(values, alpha=1)
+    assert np.allclose(once, _neighbour_loop(hl, values) / _neighbour_loop(hl, np.ones(len(hl.HexCells))))
+    assert hl.smooth(values, iterations=50).std() < values.std() / 10
+
+def test_duplicate_cells_are_dropped():
+    hl = HexLattice([HexCell(AxialCoordinate(0, 0)), HexCell(AxialCoordinate(1, 0)), HexCell(AxialCoordinate(0, 0))])
+    assert hl.axial_array.tolist() == [[0, 0], [1, 0]]
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib as mpl
+import numpy as np
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig
+
+def _jobs() -> list[tuple[HexLattice, PlotConfig, str]]:
+    """
+    Lattices of different sizes, values, shapes and styles, so that any bleeding between renders shows in the bytes
+    """
+    jobs = list()
+    for i in range(8):
+        hl = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(1 + i % 3)])
+        for hex_cell, value in zip(hl.HexCells, np.random.default_rng(i).random(len(hl.HexCells))):
+            hex_cell.value = float(value)
+        pc = PlotConfig(
+            f'lattice {i}',
+            text_usetex=False,
+            figure_dpi=40,
+            figure_size=(4 + i % 2, 4),
+            plot_style='bmh' if i % 2 else 'classic',
+            text_size=8 + i
+        )
+        jobs.append((hl, pc, 'hex' if i % 3 else 'circle'))
+    return jobs
+
+def _render(job: tuple[HexLattice, PlotConfig, str]) -> bytes:
+    hl, pc, shape = job
+    return pc.figure_to_bytes(hl.render(pc, shape))
+
+def test_concurrent_renders_are_identical():
+    """
+    Renders from a thread pool give byte-identical images to serial renders and leave the global rcParams untouched
+    """
+    rc_before = dict(mpl.rcParams)
+    jobs = _jobs()
+    serial = [_render(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(3):
+            concurrent = list(pool.map(_render, jobs * 4))
+            assert concurrent == serial * 4
+    assert len(set(serial)) == len(serial)
+    assert dict(mpl.rcParams) == rc_before
@@ -0,0 +1,75 @@
+import io
+import logging
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+from matplotlib.image import imread
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig, RenderCache, TilePyramid, TileServer
+
+logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+def _pyramid(cache=None, tile_size: int = 64) -> TilePyramid:
+    lattice = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(20)], pitch=2)
+    values = np.hypot(*lattice.centre_array.T)
+    return TilePyramid(lattice, PlotConfig('tiles', text_usetex=False), values, cache=cache, tile_size=tile_size)
+
+def _image(data: bytes) -> np.ndarray:
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    return imread(io.BytesIO(data))
+
+def test_levels():
+    pyramid = _pyramid()
+    assert pyramid.cell_pixels(pyramid.max_zoom) >= 48 > pyramid.cell_pixels(pyramid.max_zoom - 1)
+    for z in range(pyramid.max_zoom + 1):
+        image = _image(pyramid.tile(z, 0, 0))
+        assert image.shape == (64, 64, 4)
+    # The lattice covers the centre of the coarsest tile, not its corners
+    image = _image(pyramid.tile(0, 0, 0))
+    assert image[32, 32, 3] == 1 and image[0, 0, 3] == 0
+    with pytest.raises(IndexError):
+        pyramid.tile(1, 2, 0)
+    with pytest.raises(IndexError):
+        pyramid.tile(pyramid.max_zoom + 1, 0, 0)
+
+def test_aggregated_level():
+    pyramid = _pyramid(tile_size=16)
+    assert pyramid.cell_pixels(0) < 1
+    image = _image(pyramid.tile(0, 0, 0))
+    assert image[8, 8, 3] == 1 and image[0, 0, 3] == 0
+
+def test_cache(tmp_path):
+    pyramid = _pyramid(RenderCache(tmp_path))
+    data = pyramid.tile(2, 1, 2)
+    assert pyramid.tile(2, 1, 2) == data
+    assert (pyramid.cache.stats.hits, pyramid.cache.stats.stores) == (1, 1)
+    assert _pyramid(RenderCache(tmp_path)).key == pyramid.key
+    changed = TilePyramid(pyramid.lattice, pyramid.pc, pyramid.values + 1, tile_size=64)
+    assert changed.key != pyramid.key
+
+def test_tile_locks_are_released(tmp_path, monkeypatch):
+    """
+    The per tile lock is dropped after a cache hit and after a failed render, not only after a successful one
+    """
+    pyramid = _pyramid(RenderCache(tmp_path))
+    pyramid.tile(1, 0, 0)
+    pyramid.tile(1, 0, 0)
+    assert pyramid._locks == {}
+    def fail(z, x, y):
+        raise RuntimeError('render failed')
+    monkeypatch.setattr(pyramid, 'render_tile', fail)
+    with pytest.raises(RuntimeError):
+        pyramid.tile(1, 1, 1)
+    assert pyramid._locks == {}
+
+def test_server():
+    pyramid = _pyramid()
+    with TileServer(pyramid) as server:
+        server.start()
+        html = urllib.request.urlopen(server.url).read().decode()
+        assert '"max_zoom": %d' % pyramid.max_zoom in html
+        assert urllib.request.urlopen(server.url + 'tiles/1/1/0.png').read() == pyramid.render_tile(1, 1, 0)
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(server.url + 'tiles/0/1/0.png')
@@ -0,0 +1,48 @@
+import numpy as np
+
+from HexLattice import AxialCoordinate, RingCoordinate, HexCell, HexLattice, LatticeTransform
+
+def _lattice(r_max: int = 3) -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(r_max)])
+
+def test_rotation_matches_coordinate():
+    """
+    The lattice rotation agrees with AxialCoordinate.get_new_by_rotating
+    """
+    hl = _lattice()
+    for k in range(-6, 7):
+        rotated = LatticeTransform.rotation(k).apply(hl.axial_array)
+        expected = [AxialCoordinate(hex_cell.axial.x, hex_cell.axial.z).get_new_by_rotating(k).as_tuple() for hex_cell in hl.HexCells]
+        assert [tuple(axial) for axial in rotated] == expected
+
+def test_reflection_and_composition():
+    """
+    Reflection axis 0 mirrors top and bottom, axis 3 mirrors left and right
+        (0,-1)    (1,-1)  
+    (-1,0)    (0,0)    (1,0)
+        (-1,1)    (0,1)
+    """
+    assert tuple(LatticeTransform.reflection(0).apply((1, -1))) == (0, 1)
+    assert tuple(LatticeTransform.reflection(3).apply((1, -1))) == (0, -1)
+    for axis in range(6):
+        reflection = LatticeTransform.reflection(axis)
+        assert reflection.then(reflection) == LatticeTransform.identity()
+    
+    transform = LatticeTransform.rotation(2, centre=(1, 0)).then(LatticeTransform.translation(2, -1)).then(LatticeTransform.reflection(1))
+    points = np.array([(0, 0), (3, -2), (-1, 4)])
+    assert np.all(transform.inverse().apply(transform.apply(points)) == points)
+    assert (LatticeTransform.rotation(1) @ LatticeTransform.rotation(1)) == LatticeTransform.rotation(2)
+
+def test_apply_transform():
+    hl = _lattice()
+    assert len(hl.symmetries()) == 12
+    
+    field = np.random.default_rng(0).random((4, len(hl.HexCells)))
+    rotated = hl.apply_transform(field, LatticeTransform.rotation(1))
+    assert np.all(hl.apply_transform(rotated, LatticeTransform.rotation(-1)) == field)
+    
+    # The cell moved to (1, 0) is the centre
+    shifted = hl.apply_transform(field, LatticeTransform.translation(1, 0))
+    assert np.all(shifted[:, hl.index_of(AxialCoordinate(1, 0))] == field[:, hl.index_of(AxialCoordinate(0, 0))])
+    assert np.isnan(shifted).sum() == 4 * 7
+    assert hl.transform_permutation(LatticeTransform.translation(1, 0)) is hl.transform_permutation(LatticeTransform.translation(1, 0))
@@ -0,0 +1,86 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, HexZLattice, CategoricalField, FieldCodec
+from HexLattice.vtk_export import VtkMesh, write_vtu, write_pvd, XdmfWriter, VTK_HEXAGONAL_PRISM
+
+def _core() -> HexZLattice:
+    hl = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(2)], pitch=2)
+    core = HexZLattice(hl, [0, 10, 25])
+    core.add_field('power', np.random.default_rng(0).random(core.shape))
+    return core
+
+def _read_appended(path) -> dict[str, np.ndarray]:
+    """
+    A minimal reader of the appended raw arrays of a .vtu file
+    """
+    raw = path.read_bytes()
+    start = raw.index(b'<AppendedData encoding="raw">') + len(b'<AppendedData encoding="raw">')
+    data = raw[raw.index(b'_', start) + 1:]
+    root = ET.fromstring(raw[:start].decode() + '</AppendedData></VTKFile>')
+    dtypes = {'Float64': '<f8', 'Float32': '<f4', 'Int64': '<i8', 'UInt8': 'u1', 'UInt16': '<u2'}
+    res = dict()
+    for array in root.iter('DataArray'):
+        offset = int(array.get('offset'))
+        size = int(np.frombuffer(data[offset:offset + 8], '<u8')[0])
+        res[array.get('Name')] = np.frombuffer(data[offset + 8:offset + 8 + size], dtypes[array.get('type')])
+    return res
+
+def test_prism_mesh():
+    """
+    Prisms share their points, span their planes and have the cell area as cross section
+    """
+    core = _core()
+    mesh = VtkMesh.from_source(core)
+    assert mesh.cell_type == VTK_HEXAGONAL_PRISM and mesh.n_cells == 2 * 19
+    assert mesh.n_points == 3 * 54
+    prism = mesh.points[mesh.connectivity[19 + 4]]
+    assert np.allclose(prism[:6, 2], 10) and np.allclose(prism[6:, 2], 25)
+    assert np.allclose(prism[:6, :2], core.lattice.vertex_array[4]) and np.allclose(prism[6:, :2], prism[:6, :2])
+    assert len(mesh.polyhedra()) == 46 * mesh.n_cells
+
+def test_write_vtu(tmp_path):
+    core = _core()
+    material = CategoricalField.from_ids(np.tile(np.arange(19) % 3, (2, 1)))
+    path = write_vtu(tmp_path / 'core.vtu', core, {'power': 'power', 'material': material})
+    arrays = _read_appended(path)
+    assert np.array_equal(arrays['power'], core.field('power').ravel())
+    assert np.array_equal(arrays['material'], material.values.ravel())
+    assert np.array_equal(arrays['connectivity'], VtkMesh.from_source(core).connectivity.ravel())
+    assert np.array_equal(arrays['types'], np.full(38, VTK_HEXAGONAL_PRISM))
+
+    pvd = write_pvd(tmp_path / 'core.pvd', [(0., path)])
+    assert ET.parse(pvd).getroot().find('Collection/DataSet').get('file') == 'core.vtu'
+
+def test_write_all_fields(tmp_path):
+    """
+    Without a selection every field is written: stacks split into name[i], encoded fields decoded, float16 upcast
+    """
+    hl = HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(2)], pitch=2)
+    history = np.arange(2 * 19, dtype=float).reshape(2, 19)
+    hl.add_field('history', history)
+    hl.add_field('encoded', FieldCodec('float64').encode(history))
+    hl.add_field('half', np.linspace(0, 1, 19, dtype=np.float16))
+    hl.add_field('patterns', CategoricalField.from_ids(np.array([np.arange(19) % 2, np.arange(19) % 3])))
+    arrays = _read_appended(write_vtu(tmp_path / 'all.vtu', hl))
+    for i in range(2):
+        assert np.array_equal(arrays[f'history[{i}]'], history[i])
+        assert np.array_equal(arrays[f'encoded[{i}]'], history[i])
+        assert np.array_equal(arrays[f'patterns[{i}]'], hl.fields['patterns'].values[i])
+    assert arrays['half'].dtype == np.float32 and np.array_equal(arrays['half'], hl.fields['half'])
+
+def test_xdmf_timesteps(tmp_path):
+    core = _core()
+    with XdmfWriter(tmp_path / 'campaign.xmf', core) as writer:
+        for step in range(3):
+            writer.write_timestep(0.5 * step, {'power': core.field('power') * step})
+
+    root = ET.parse(tmp_path / 'campaign.xmf').getroot()
+    grids = root.findall('Domain/Grid/Grid')
+    assert [grid.find('Time').get('Value') for grid in grids] == ['0.0', '0.5', '1.0']
+    item = grids[2].find('Attribute/DataItem')
+    data = np.fromfile(tmp_path / item.text, '<f8', count=38, offset=int(item.get('Seek')))
+    assert np.array_equal(data, 2 * core.field('power').ravel())
+    topology = grids[0].find('Topology/DataItem')
+    assert int(topology.get('Dimensions')) == 46 * 38
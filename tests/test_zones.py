@@ -0,0 +1,95 @@
+import io
+import logging
+from dataclasses import replace
+
+import numpy as np
+from matplotlib.patches import Polygon
+
+from HexLattice import RingCoordinate, HexCell, HexLattice, PlotConfig
+
+logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+def _lattice(r: int = 4) -> HexLattice:
+    return HexLattice([HexCell(ring_coord) for ring_coord in RingCoordinate.get_all_coord_by_r(r)], pitch=2)
+
+def _shoelace(outline: np.ndarray) -> float:
+    x, y = outline[:-1, 0], outline[:-1, 1]
+    return 0.5 * float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+def test_unique_edges():
+    """
+    A hexagon of r rings has 3 * n + outer edges, n being the number of cells, and every edge has the cell length
+    """
+    hl = _lattice()
+    edges = hl.edge_set
+    n = len(hl.HexCells)
+    assert edges.is_outer.sum() == 6 * (2 * 4 + 1) - 6 + 6
+    assert (len(edges) - edges.is_outer.sum()) * 2 + edges.is_outer.sum() == 6 * n
+    lengths = np.linalg.norm(edges.segments[:, 1] - edges.segments[:, 0], axis=-1)
+    assert np.allclose(lengths, hl.radius_array[0])
+
+def test_label_regions_and_outlines():
+    """
+    The core, an annulus of a different material and the outside ring with the core material give three regions,
+    the annulus with a hole outline
+    """
+    hl = _lattice()
+    ring = np.max(np.abs(hl.cube_array), axis=1)
+    categories = np.where(ring == 2, 7, 1)
+    regions = hl.label_regions(categories)
+    assert len(np.unique(regions)) == 3
+    assert len(np.unique(regions[ring < 2])) == 1 and len(np.unique(regions[ring > 2])) == 1
+
+    outlines = hl.region_outlines(categories)
+    annulus = regions[ring == 2][0]
+    areas = sorted(_shoelace(outline) for outline in outlines[annulus])
+    cell_area = hl.area_array[0]
+    assert np.isclose(areas[0], -7 * cell_area) and np.isclose(areas[1], 19 * cell_area)
+    for region, region_outlines in outlines.items():
+        assert np.isclose(sum(_shoelace(outline) for outline in region_outlines), np.sum(regions == region) * cell_area)
+
+def test_merged_edges():
+    """
+    Merged edges are stroked by one line collection for the grid and one for the zone borders, each edge once
+    """
+    hl = _lattice(6)
+    values = np.random.default_rng(0).random(len(hl.HexCells))
+    zones = np.max(np.abs(hl.cube_array), axis=1) > 3
+    pc = PlotConfig('zones', text_usetex=False, show_text=False, figure_dpi=30, figure_size=(4, 4))
+    fig = hl.render(pc, values=values, zones=zones)
+    cells, grid, borders = fig.axes[0].collections
+    assert len(fig.axes[0].patches) == 0
+    assert len(cells.get_facecolors()) == len(hl.HexCells) and len(cells.get_edgecolor()) == 0
+    assert borders.get_linewidth()[0] == pc.zone_edge_width
+    # Every collection strokes one line, its polylines are separated by nan rows
+    n_segments = [
+        sum(int(np.sum(~np.isnan(path.vertices[1:, 0]) & ~np.isnan(path.vertices[:-1, 0]))) for path in collection.get_paths())
+        for collection in (grid, borders)
+    ]
+    assert n_segments[1] == hl.edge_set.borders(zones).sum()
+    assert sum(n_segments) == len(hl.edge_set)
+
+def _svg_size(fig) -> int:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='svg')
+    return len(buffer.getvalue())
+
+def test_fewer_artists_and_smaller_files():
+    """
+    The fill collection and the merged edges replace a patch per cell, and write a smaller SVG than those patches
+    """
+    hl = _lattice(8)
+    values = np.random.default_rng(0).random(len(hl.HexCells))
+    zones = np.max(np.abs(hl.cube_array), axis=1) > 4
+    pc = PlotConfig('zones', text_usetex=False, show_text=False, figure_dpi=30, figure_size=(4, 4))
+    # A patch per cell outlined by itself, as the cells were drawn before
+    per_cell = pc.new_figure()
+    ax = hl._setup_ax(pc, per_cell.add_subplot(), global_style=False)
+    for vertexes, color in zip(hl.vertex_array, pc.color_map(values)):
+        ax.add_patch(Polygon(vertexes, facecolor=color, edgecolor=pc.hex_edge_color, **pc.patch_props))
+
+    per_cell_size = _svg_size(per_cell)
+    for fig in (hl.render(pc, values=values), hl.render(replace(pc, merge_edges=True), values=values, zones=zones)):
+        assert len(fig.axes[0].patches) == 0 < len(ax.patches)
+        assert len(fig.axes[0].collections) <= 3
+        assert _svg_size(fig) < per_cell_size